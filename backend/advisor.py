@@ -27,7 +27,8 @@ class StockAdvisor:
         user_intent: str = 'analyze',
         quantity: int = None,
         portfolio_type: str = 'balanced',
-        budget: Optional[float] = None
+        budget: Optional[float] = None,
+        news_articles: Optional[List[Dict]] = None
     ) -> Dict:
         """
         Comprehensive investment analysis combining multiple factors
@@ -38,13 +39,17 @@ class StockAdvisor:
             user_intent: User's intent (buy/sell/hold/analyze)
             quantity: Number of shares to consider
             portfolio_type: Risk profile (aggressive/balanced/long_term)
+            news_articles: Articles already fetched by the caller (fetched here if omitted)
             
         Returns:
             Comprehensive analysis with recommendation
         """
         try:
+            # Every step below reads from one context: one quote, one model load, one indicator pass
+            context = self.predictor.context(symbol)
+            
             # 1. Get current price and quote data
-            quote = self.data_fetcher.get_quote(symbol)
+            quote = context.quote()
             if not quote:
                 return {
                     'success': False,
@@ -52,24 +57,21 @@ class StockAdvisor:
                 }
             
             # 2. Get technical analysis and prediction
-            prediction = self.predictor.predict_next_day(symbol)
-            signal = self.predictor.generate_signal(symbol, portfolio_type)
+            prediction = context.prediction()
+            signal = context.signal(portfolio_type)
             
             # 3. Get news and sentiment
-            news_articles = self.news_analyzer.get_stock_news(symbol, company_name)
+            if news_articles is None:
+                news_articles = self.news_analyzer.get_stock_news(symbol, company_name)
             news_sentiment = self.news_analyzer.get_overall_sentiment(news_articles)
             
             # 4. Calculate trading strategy if budget provided
             trading_plan = None
             if budget and budget > 0:
-                trading_plan = self.trading_strategy.calculate_position(
-                    symbol=symbol,
+                trading_plan = self.trading_strategy.calculate_position_from_context(
+                    context,
                     strategy_type=portfolio_type,
-                    current_price=quote['price'],
-                    predicted_price=prediction['predicted_price'],
-                    budget=budget,
-                    rsi=prediction['features']['rsi_14'],
-                    technical_signal=signal['signal']
+                    budget=budget
                 )
             
             # 5. Generate comprehensive analysis
@@ -0,0 +1,64 @@
+"""
+Request-Scoped Analysis Context
+Memoizes the intermediate results of one symbol's analysis so every consumer shares them
+
+The analysis is a small dataflow graph:
+
+    quote ─────────────────────────────────┐
+    history(30d) ── features (O(1) state) ─┤
+    model_version ── model (trained on     ├── prediction ── signal(portfolio_type)
+                     demand) ──────────────┘
+
+features and model are only evaluated when the prediction cache has no
+forecast for the latest bar and model_version.
+
+Predictor, StockAdvisor and TradingStrategy all read from the same context,
+so within one request each node is computed at most once: one quote lookup,
+one model load and one indicator state sync, however many of them need the value.
+A context lives for a single request and is not shared between threads.
+"""
+from typing import Any, Callable, Dict
+
+
+class AnalysisContext:
+    """Lazily computed, memoized analysis results for one symbol"""
+
+    def __init__(self, symbol: str, predictor):
+        self.symbol = symbol
+        self.predictor = predictor
+        self._values: Dict[Any, Any] = {}
+        self.computed: Dict[Any, int] = {}
+        self.reused = 0
+
+    def memo(self, key, compute: Callable[[], Any]) -> Any:
+        """Value of a node, computing it on first use"""
+        if key in self._values:
+            self.reused += 1
+            return self._values[key]
+        value = compute()
+        self._values[key] = value
+        self.computed[key] = self.computed.get(key, 0) + 1
+        return value
+
+    def quote(self) -> Dict[str, Any]:
+        return self.memo("quote", lambda: self.predictor.data_fetcher.get_quote(self.symbol))
+
+    def history(self, days: int = 30) -> Dict[str, Any]:
+        return self.memo(("history", days), lambda: self.predictor.data_fetcher.get_historical_data(self.symbol, days=days))
+
+    def model(self):
+        """(model, scaler), training the symbol's model first if none exists"""
+        return self.memo("model", lambda: self.predictor.load_or_train_model(self.symbol))
+
+    def model_version(self) -> str:
+        """Identity of the trained model files (trains the model if there is none)"""
+        return self.memo("model_version", lambda: self.predictor.ensure_model_version(self))
+
+    def features(self) -> Dict[str, Any]:
+        return self.memo("features", lambda: self.predictor.current_features(self))
+
+    def prediction(self) -> Dict[str, Any]:
+        return self.memo("prediction", lambda: self.predictor.build_prediction(self))
+
+    def signal(self, portfolio_type: str = "balanced") -> Dict[str, Any]:
+        return self.memo(("signal", portfolio_type), lambda: self.predictor.build_signal(self, portfolio_type))
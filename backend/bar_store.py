@@ -0,0 +1,213 @@
+"""
+Columnar OHLCV Bar Store
+Daily bars kept as one SQLite row per (symbol, date) and read back as NumPy arrays
+"""
+from bisect import bisect_left
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache_db import CacheDatabase
+from cache_maintenance import CacheNamespace
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+CREATE_BAR_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS bars (
+        symbol TEXT NOT NULL,
+        date TEXT NOT NULL,
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        volume REAL,
+        PRIMARY KEY (symbol, date)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS bar_meta (
+        symbol TEXT PRIMARY KEY,
+        source TEXT,
+        covered_from TEXT,
+        last_date TEXT,
+        fetched_at REAL
+    );
+"""
+UPSERT_BAR_SQL = """
+    INSERT OR REPLACE INTO bars (symbol, date, open, high, low, close, volume)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+UPSERT_BAR_META_SQL = """
+    INSERT OR REPLACE INTO bar_meta (symbol, source, covered_from, last_date, fetched_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
+# Approximate bytes per stored series, for cache size accounting
+SERIES_SIZES_SQL = """
+    SELECT m.symbol, COUNT(b.date) * 64, m.fetched_at
+    FROM bar_meta m LEFT JOIN bars b ON b.symbol = m.symbol
+    GROUP BY m.symbol
+"""
+DELETE_SERIES_SQLS = (
+    "DELETE FROM bars WHERE symbol = ?",
+    "DELETE FROM bar_meta WHERE symbol = ?"
+)
+EXTEND_COVERAGE_SQL = "UPDATE bar_meta SET covered_from = ? WHERE symbol = ? AND covered_from > ?"
+SELECT_BAR_META_SQL = "SELECT source, covered_from, last_date, fetched_at FROM bar_meta WHERE symbol = ?"
+SELECT_BARS_SQL = """
+    SELECT date, open, high, low, close, volume FROM bars
+    WHERE symbol = ? AND date >= ? AND date <= ?
+    ORDER BY date
+"""
+
+
+def empty_bars(symbol: str, source: str = "") -> Dict[str, Any]:
+    """Bar dict with no rows, in the same shape read_bars() returns"""
+    result = {"symbol": symbol, "dates": []}
+    for field in BAR_FIELDS:
+        result[field] = np.empty(0, dtype=np.float64)
+    result["source"] = source
+    return result
+
+
+def slice_bars(bars: Optional[Dict[str, Any]], start_date: str) -> Dict[str, Any]:
+    """Window of a full series from start_date on, as array views (no copies)"""
+    if bars is None:
+        return empty_bars("")
+    start = bisect_left(bars["dates"], start_date)
+    result = {"symbol": bars["symbol"], "dates": bars["dates"][start:]}
+    for field in BAR_FIELDS:
+        result[field] = bars[field][start:]
+    result["source"] = bars["source"]
+    return result
+
+
+def day_numbers(dates) -> np.ndarray:
+    """YYYY-MM-DD strings as int64 days since 1970-01-01"""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def merge_bars(
+    bars: Dict[str, Any],
+    stored: Optional[Tuple[np.ndarray, Sequence[np.ndarray]]]
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Merge written bars into a stored series, for backends that rewrite whole series
+
+    Args:
+        bars: Dict with 'dates' and one sequence per OHLCV field, as passed to write_bars
+        stored: (day numbers, BAR_FIELDS columns) of the stored series, or None
+
+    Returns:
+        (sorted unique day numbers, one float64 column per BAR_FIELDS field);
+        on equal days the written bar replaces the stored one
+    """
+    days = day_numbers(list(bars["dates"]))
+    columns = [np.asarray(bars[field], dtype=np.float64) for field in BAR_FIELDS]
+    if stored is not None:
+        stored_days, stored_columns = stored
+        days = np.concatenate([days, stored_days])
+        columns = [np.concatenate([new, old]) for new, old in zip(columns, stored_columns)]
+    # np.unique keeps the first occurrence, i.e. the newly written bar
+    days, index = np.unique(days, return_index=True)
+    return days, [column[index] for column in columns]
+
+
+class BarStore:
+    """Store and range-read daily OHLCV bars per symbol"""
+
+    def __init__(self, db: CacheDatabase):
+        self.db = db
+        self.db.executescript(CREATE_BAR_TABLES_SQL)
+
+    def get_meta(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Return what is stored for a symbol: source, covered range and fetch time"""
+        row = self.db.fetchone(SELECT_BAR_META_SQL, (symbol,))
+        if not row:
+            return None
+        source, covered_from, last_date, fetched_at = row
+        return {
+            "source": source,
+            "covered_from": covered_from,
+            "last_date": last_date,
+            "fetched_at": fetched_at
+        }
+
+    def write_bars(self, symbol: str, bars: Dict[str, Any], source: str, covered_from: str, fetched_at: float):
+        """
+        Upsert bars and record the window they cover in one commit
+
+        Args:
+            symbol: Stock symbol
+            bars: Dict with 'dates' (YYYY-MM-DD strings) and one sequence per OHLCV field
+            source: Provider the bars came from
+            covered_from: Earliest date the stored series is known to be complete from
+            fetched_at: Unix time of the upstream fetch
+        """
+        dates = list(bars["dates"])
+        columns = [np.asarray(bars[field], dtype=np.float64).tolist() for field in BAR_FIELDS]
+        rows = zip(repeat(symbol), dates, *columns)
+        covered_from, last_date = self._merge_meta(symbol, dates, covered_from)
+
+        with self.db.transaction() as conn:
+            conn.executemany(UPSERT_BAR_SQL, rows)
+            conn.execute(UPSERT_BAR_META_SQL, (symbol, source, covered_from, last_date, fetched_at))
+
+    def mark_covered(self, symbol: str, covered_from: str):
+        """Record that upstream has no bars between covered_from and the stored series"""
+        self.db.execute(EXTEND_COVERAGE_SQL, (covered_from, symbol, covered_from))
+
+    def _merge_meta(self, symbol: str, dates, covered_from: str) -> Tuple[str, Optional[str]]:
+        """Widen a write's covered_from / last_date by what is already stored"""
+        meta = self.get_meta(symbol)
+        last_date = max(dates) if len(dates) else None
+        if meta:
+            if meta["covered_from"] and meta["covered_from"] < covered_from:
+                covered_from = meta["covered_from"]
+            if meta["last_date"] and (last_date is None or meta["last_date"] > last_date):
+                last_date = meta["last_date"]
+        return covered_from, last_date
+
+    def cache_namespace(self) -> CacheNamespace:
+        """How cache maintenance sizes and evicts stored series"""
+        return CacheNamespace("bars", entries_sql=SERIES_SIZES_SQL, delete_sqls=DELETE_SERIES_SQLS)
+
+    def read_bars(self, symbol: str, start_date: str = "", end_date: str = "9999-12-31") -> Dict[str, Any]:
+        """
+        Read bars in [start_date, end_date] as contiguous float64 arrays
+
+        Returns:
+            Dict with 'dates' (list of YYYY-MM-DD strings) and one NumPy array per OHLCV field
+        """
+        rows = self.db.fetchall(SELECT_BARS_SQL, (symbol, start_date, end_date))
+        meta = self.get_meta(symbol)
+        source = meta["source"] if meta else ""
+        if not rows:
+            return empty_bars(symbol, source)
+
+        dates = [row[0] for row in rows]
+        # Transposing to (field, date) and copying leaves every field contiguous
+        values = np.array([row[1:] for row in rows], dtype=np.float64).T.copy()
+
+        result = {"symbol": symbol, "dates": dates}
+        for i, field in enumerate(BAR_FIELDS):
+            result[field] = values[i]
+        result["source"] = source
+        return result
+
+
+def open_bar_store(backend: str, db: CacheDatabase, bar_dir: str) -> BarStore:
+    """
+    Bar store for the BAR_STORE_BACKEND setting
+
+    "sqlite" keeps bars in cache.db; "mmap" keeps one memory-mapped file per
+    symbol under bar_dir, shared read-only by every worker process;
+    "compressed" keeps one delta/XOR-compressed blob per symbol in cache.db.
+    """
+    if backend == "sqlite":
+        return BarStore(db)
+    if backend == "mmap":
+        from mmap_bar_store import MmapBarStore
+        return MmapBarStore(db, bar_dir)
+    if backend == "compressed":
+        from compressed_bar_store import CompressedBarStore
+        return CompressedBarStore(db)
+    raise ValueError(f"Unknown bar store backend '{backend}'")
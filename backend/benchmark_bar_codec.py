@@ -0,0 +1,108 @@
+"""
+Benchmark the compressed bar encoding against JSON blobs
+
+Compares, per daily series:
+    json    the {"dates": [...], "close": [...], ...} text the cache used to store
+    float64 raw little-endian columns (the mmap bar file payload)
+    codec   bar_codec delta-of-delta dates + XOR/byte-plane floats
+
+Prices are generated as a random walk and stored the way yfinance returns
+them (float32 precision widened to float64); --decimals 2 rounds them to
+cents instead, which is the harder case for XOR compression.
+
+Usage:
+    python benchmark_bar_codec.py --symbols 50 --years 10
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from bar_codec import decode_bars, encode_bars
+from bar_store import BAR_FIELDS
+
+
+def make_series(rows: int, seed: int, decimals: int = -1):
+    days = np.busday_offset("2010-01-01", np.arange(rows), roll="forward").astype("datetime64[D]").astype(np.int64)
+    rng = np.random.default_rng(seed)
+    close = 20 + 200 * rng.random() * np.exp(np.cumsum(rng.normal(0, 0.015, rows)))
+    spread = np.abs(rng.normal(0, 0.01, rows)) * close
+    columns = [close - spread / 2, close + spread, close - spread, close, np.round(rng.lognormal(15, 0.7, rows))]
+    if decimals >= 0:
+        columns[:4] = [np.round(column, decimals) for column in columns[:4]]
+    else:
+        columns[:4] = [column.astype(np.float32).astype(np.float64) for column in columns[:4]]
+    return days, columns
+
+
+def to_json(days, columns) -> bytes:
+    data = {"dates": days.astype("datetime64[D]").astype(str).tolist()}
+    for field, column in zip(BAR_FIELDS, columns):
+        data[field] = column.tolist()
+    return json.dumps(data).encode()
+
+
+def from_json(payload: bytes):
+    data = json.loads(payload)
+    return data["dates"], [np.asarray(data[field], dtype=np.float64) for field in BAR_FIELDS]
+
+
+def to_raw(days, columns) -> bytes:
+    return b"".join([days.astype("<i8").tobytes()] + [column.astype("<f8").tobytes() for column in columns])
+
+
+def from_raw(payload: bytes):
+    rows = len(payload) // (8 * (len(BAR_FIELDS) + 1))
+    values = np.frombuffer(payload, dtype="<f8").reshape(len(BAR_FIELDS) + 1, rows)
+    return values[0].view("<i8"), list(values[1:])
+
+
+def timed(fn, items, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [fn(*item) if isinstance(item, tuple) else fn(item) for item in items]
+        best = min(best, time.perf_counter() - started)
+    return results, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--decimals", type=int, default=-1, help="Round prices to this many decimals (-1: float32 prices)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = int(args.years * 252)
+    series = [make_series(rows, seed, args.decimals) for seed in range(args.symbols)]
+    formats = {
+        "json": (to_json, from_json),
+        "float64": (to_raw, from_raw),
+        "codec": (encode_bars, decode_bars),
+    }
+
+    print(f"{args.symbols} symbols x {rows} daily bars")
+    print(f"{'format':<8} {'bytes/series':>13} {'vs json':>8} {'encode ms':>10} {'decode ms':>10} {'decode speedup':>15}")
+    baseline = {}
+    for name, (encode, decode) in formats.items():
+        payloads, encode_seconds = timed(encode, series, args.repeat)
+        _, decode_seconds = timed(decode, payloads, args.repeat)
+        size = sum(len(payload) for payload in payloads) / len(payloads)
+        baseline.setdefault("size", size)
+        baseline.setdefault("decode", decode_seconds)
+        print(
+            f"{name:<8} {size:>13,.0f} {baseline['size'] / size:>7.1f}x "
+            f"{encode_seconds * 1000:>10.1f} {decode_seconds * 1000:>10.1f} {baseline['decode'] / decode_seconds:>14.1f}x"
+        )
+
+    # The codec must be lossless to the bit
+    for days, columns in series:
+        decoded_days, decoded = decode_bars(encode_bars(days, columns))
+        assert np.array_equal(decoded_days, days)
+        assert all(np.array_equal(a.view(np.uint64), b.view(np.uint64)) for a, b in zip(decoded, columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark the NumPy indicators against the pandas code they replace
+
+Two workloads:
+    features    the model's sma_5 / sma_10 / rsi_14 per symbol, as Predictor and
+                prepare_features compute them: the old per-call DataFrame +
+                .tolist() code, indicators.py per series, and one indicators.py
+                call on a (symbols x time) panel
+    indicators  every indicator over the whole panel: pandas on a DataFrame with
+                one column per symbol vs indicators.py on the 2-D array
+
+Usage:
+    python benchmark_indicators.py --symbols 500 --bars 90
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+
+def old_sma(prices, window):
+    df = pd.DataFrame({'price': prices})
+    return df['price'].rolling(window=window, min_periods=1).mean().tolist()
+
+
+def old_rsi(prices, period=14):
+    df = pd.DataFrame({'price': prices})
+    delta = df['price'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period, min_periods=1).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period, min_periods=1).mean()
+    rs = gain / loss
+    return (100 - (100 / (1 + rs))).fillna(50).tolist()
+
+
+def features_old(panel):
+    return [(old_sma(row, 5), old_sma(row, 10), old_rsi(row, 14)) for row in panel]
+
+
+def features_series(panel):
+    return [(indicators.sma(row, 5), indicators.sma(row, 10), indicators.rsi(row, 14)) for row in panel]
+
+
+def features_panel(panel):
+    return indicators.sma(panel, 5), indicators.sma(panel, 10), indicators.rsi(panel, 14)
+
+
+def pandas_rsi(frame, period=14):
+    delta = frame.diff()
+    gain = delta.where(delta > 0, 0).rolling(period, min_periods=1).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(period, min_periods=1).mean()
+    return (100 - 100 / (1 + gain / loss)).fillna(50)
+
+
+def pandas_macd_signal(frame):
+    line = frame.ewm(span=12, adjust=False).mean() - frame.ewm(span=26, adjust=False).mean()
+    return line.ewm(span=9, adjust=False).mean()
+
+
+def pandas_atr(frame, high, low, period=14):
+    previous_close = frame.shift()
+    true_range = np.fmax(high - low, np.fmax((high - previous_close).abs(), (low - previous_close).abs()))
+    return true_range.ewm(alpha=1 / period, adjust=False).mean()
+
+
+def pandas_suite(frame, high, low):
+    return {
+        "sma_20": lambda: frame.rolling(20, min_periods=1).mean(),
+        "ema_12": lambda: frame.ewm(span=12, adjust=False).mean(),
+        "rsi_14": lambda: pandas_rsi(frame),
+        "macd": lambda: pandas_macd_signal(frame),
+        "bollinger": lambda: frame.rolling(20).mean() + 2 * frame.rolling(20).std(),
+        "atr_14": lambda: pandas_atr(frame, high, low),
+    }
+
+
+def numpy_suite(panel, high, low):
+    return {
+        "sma_20": lambda: indicators.sma(panel, 20),
+        "ema_12": lambda: indicators.ema(panel, span=12),
+        "rsi_14": lambda: indicators.rsi(panel, 14),
+        "macd": lambda: indicators.macd(panel)[1],
+        "bollinger": lambda: indicators.bollinger_bands(panel)[1],
+        "atr_14": lambda: indicators.atr(high, low, panel, 14),
+    }
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    panel = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (args.symbols, args.bars)), axis=1))
+    high, low = panel * (1 + rng.random(panel.shape) * 0.02), panel * (1 - rng.random(panel.shape) * 0.02)
+
+    print(f"{args.symbols} symbols x {args.bars} bars\n")
+    print("model features (sma_5, sma_10, rsi_14)")
+    print(f"{'method':<28} {'ms':>9} {'speedup':>9}")
+    baseline = None
+    for name, fn in (
+        ("pandas DataFrame per call", lambda: features_old(panel)),
+        ("indicators per series", lambda: features_series(panel)),
+        ("indicators on the panel", lambda: features_panel(panel)),
+    ):
+        result, seconds = timed(fn, args.repeat)
+        if baseline is None:
+            old, baseline = result, seconds
+        print(f"{name:<28} {seconds * 1000:>9.2f} {baseline / seconds:>8.1f}x")
+
+    # Same numbers as the code they replace
+    sma_5, sma_10, rsi_14 = features_panel(panel)
+    for row, (old_sma_5, old_sma_10, old_rsi_14) in enumerate(old):
+        assert np.allclose(sma_5[row], old_sma_5, rtol=1e-12)
+        assert np.allclose(sma_10[row], old_sma_10, rtol=1e-12)
+        assert np.allclose(rsi_14[row], old_rsi_14, rtol=1e-12)
+
+    print("\nfull panel (time x symbols DataFrame vs symbols x time array)")
+    print(f"{'indicator':<12} {'pandas ms':>10} {'numpy ms':>10} {'speedup':>9} {'max abs diff':>14}")
+    frame, frame_high, frame_low = pd.DataFrame(panel.T), pd.DataFrame(high.T), pd.DataFrame(low.T)
+    pandas_functions = pandas_suite(frame, frame_high, frame_low)
+    for name, fn in numpy_suite(panel, high, low).items():
+        expected, pandas_seconds = timed(pandas_functions[name], args.repeat)
+        actual, numpy_seconds = timed(fn, args.repeat)
+        difference = np.nanmax(np.abs(actual - expected.to_numpy().T))
+        print(
+            f"{name:<12} {pandas_seconds * 1000:>10.2f} {numpy_seconds * 1000:>10.2f} "
+            f"{pandas_seconds / numpy_seconds:>8.1f}x {difference:>14.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Shared SQLite Connection Layer
+Pooled per-thread connections to cache.db with WAL journaling and grouped commits
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+class CacheDatabase:
+    """Per-thread SQLite connections to one database file, safe across threads and worker processes"""
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000, statement_cache_size: int = 128):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.statement_cache_size = statement_cache_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection configured for concurrent readers and a single writer"""
+        # isolation_level=None puts the driver in autocommit mode so that we
+        # control transaction boundaries explicitly (see transaction()).
+        # cached_statements keeps compiled statements around, so the fixed SQL
+        # strings used by callers are only prepared once per connection.
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")  # Durable enough for a cache, no fsync per commit
+        conn.execute("PRAGMA temp_store = MEMORY")
+
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening one if needed"""
+        conn = getattr(self._local, 'conn', None)
+        # A connection inherited across fork() must never be reused by the child
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Group writes into a single commit
+
+        Nested calls join the outermost transaction. BEGIN IMMEDIATE takes the
+        write lock up front so concurrent writers wait on busy_timeout instead
+        of failing with a lock-upgrade error halfway through.
+        """
+        conn = self.connection()
+        if self._local.depth > 0:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth = 0
+            conn.execute("ROLLBACK")
+            raise
+        self._local.depth = 0
+        conn.execute("COMMIT")
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        """Run one statement (committed immediately unless inside transaction())"""
+        return self.connection().execute(sql, params)
+
+    def executemany(self, sql: str, rows: Iterable[Sequence[Any]]) -> None:
+        """Run one statement for many parameter rows as a single commit"""
+        with self.transaction() as conn:
+            conn.executemany(sql, rows)
+
+    def executescript(self, script: str) -> None:
+        """Run a multi-statement script such as schema setup"""
+        self.connection().executescript(script)
+
+    def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[Tuple]:
+        """Run a query and return the first row"""
+        return self.connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple]:
+        """Run a query and return all rows"""
+        return self.connection().execute(sql, params).fetchall()
+
+    def add_missing_columns(self, table: str, columns: Dict[str, str]) -> List[str]:
+        """
+        Migrate an existing table by adding any of `columns` (name -> type) it lacks
+
+        Returns:
+            Names of the columns that were added
+        """
+        existing = {row[1] for row in self.fetchall(f"PRAGMA table_info({table})")}
+        added = []
+        for name, column_type in columns.items():
+            if name not in existing:
+                self.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+                added.append(name)
+        return added
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+            self._local.conn = None
+
+    def close_all(self):
+        """Close every connection opened by this process (e.g. on shutdown)"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_databases: Dict[str, CacheDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_cache_database(path: str) -> CacheDatabase:
+    """Return the process-wide CacheDatabase for a path, shared by every DataFetcher"""
+    key = os.path.abspath(path)
+    with _databases_lock:
+        db = _databases.get(key)
+        if db is None:
+            db = CacheDatabase(path)
+            _databases[key] = db
+        return db
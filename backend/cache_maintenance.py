@@ -0,0 +1,311 @@
+"""
+Cache Maintenance
+Size-bounded LRU/LFU eviction, TTL sweeping and incremental VACUUM for cache.db
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from cache_db import CacheDatabase
+
+CREATE_ACCESS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS cache_access (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        last_access REAL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (namespace, key)
+    ) WITHOUT ROWID
+"""
+UPSERT_ACCESS_SQL = """
+    INSERT INTO cache_access (namespace, key, last_access, hits) VALUES (?, ?, ?, ?)
+    ON CONFLICT (namespace, key) DO UPDATE SET
+        last_access = MAX(last_access, excluded.last_access),
+        hits = hits + excluded.hits
+"""
+SELECT_ACCESS_SQL = "SELECT key, last_access, hits FROM cache_access WHERE namespace = ?"
+DELETE_ACCESS_SQL = "DELETE FROM cache_access WHERE namespace = ? AND key = ?"
+SELECT_MOST_REQUESTED_SQL = "SELECT key FROM cache_access WHERE namespace = ? ORDER BY hits DESC, last_access DESC LIMIT ?"
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+class CacheNamespace:
+    """
+    One kind of cached entry (a table, or a group of rows per key) and how to size and delete it
+
+    entries_sql must return (key, approximate bytes, stored_at) per entry;
+    expired_sql returns the keys whose TTL has run out and receives the
+    current time as its only parameter. delete_sqls take the key.
+    Stores that keep entries outside SQLite override the methods below.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        entries_sql: str,
+        delete_sqls: Sequence[str],
+        expired_sql: Optional[str] = None,
+        memory_key: Optional[str] = None
+    ):
+        self.name = name
+        self.entries_sql = entries_sql
+        self.delete_sqls = list(delete_sqls)
+        self.expired_sql = expired_sql
+        self.memory_key = memory_key or name
+
+    def entries(self, db: CacheDatabase) -> List[Tuple[str, int, float]]:
+        """(key, approximate bytes, stored_at) for every entry"""
+        return db.fetchall(self.entries_sql)
+
+    def expired_keys(self, db: CacheDatabase, now: float) -> List[str]:
+        if not self.expired_sql:
+            return []
+        return [row[0] for row in db.fetchall(self.expired_sql, (now,))]
+
+    def delete(self, conn, key: str):
+        """Delete one entry; runs inside the maintenance transaction"""
+        for sql in self.delete_sqls:
+            conn.execute(sql, (key,))
+
+    def prune(self, db: CacheDatabase, now: float) -> int:
+        """Trim rows inside entries (e.g. retention windows); returns rows removed"""
+        return 0
+
+    def external_bytes(self) -> int:
+        """Bytes this namespace keeps outside cache.db (files), counted against the budget"""
+        return 0
+
+
+class CacheMaintenance:
+    """Keep cache.db under a size budget and report per-namespace size and hit rate"""
+
+    def __init__(
+        self,
+        db: CacheDatabase,
+        max_bytes: int,
+        policy: str = "lru",
+        interval_seconds: float = 300,
+        vacuum_pages: int = 1000,
+        memory=None
+    ):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown cache eviction policy '{policy}', expected one of {EVICTION_POLICIES}")
+        self.db = db
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.interval_seconds = interval_seconds
+        self.vacuum_pages = vacuum_pages
+        self.memory = memory  # In-process tier to keep consistent with deletions
+        self.namespaces: Dict[str, CacheNamespace] = {}
+
+        # Reads are counted in memory and flushed in one batch per run,
+        # so a cache hit never turns into a SQLite write
+        self._lock = threading.Lock()
+        self._pending_access: Dict[Tuple[str, str], List[float]] = {}
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+        self.evictions = 0
+        self.expired = 0
+        self.pruned_rows = 0
+        self.vacuumed_pages = 0
+        self.last_run: Optional[float] = None
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.db.execute(CREATE_ACCESS_TABLE_SQL)
+
+    def register(self, namespace: CacheNamespace):
+        self.namespaces[namespace.name] = namespace
+
+    def record(self, namespace: str, key: str, hit: bool):
+        """Count one lookup; hits also refresh the entry's recency and frequency"""
+        with self._lock:
+            if hit:
+                self._hits[namespace] = self._hits.get(namespace, 0) + 1
+                access = self._pending_access.setdefault((namespace, key), [0.0, 0])
+                access[0] = time.time()
+                access[1] += 1
+            else:
+                self._misses[namespace] = self._misses.get(namespace, 0) + 1
+
+    def flush_access(self):
+        """Write the batched access counters to cache_access in one commit"""
+        with self._lock:
+            pending, self._pending_access = self._pending_access, {}
+        if pending:
+            self.db.executemany(
+                UPSERT_ACCESS_SQL,
+                [(namespace, key, last_access, hits) for (namespace, key), (last_access, hits) in pending.items()]
+            )
+
+    def most_requested(self, namespace: str, limit: int) -> List[str]:
+        """Keys with the most recorded hits, including hits not flushed yet"""
+        self.flush_access()
+        return [row[0] for row in self.db.fetchall(SELECT_MOST_REQUESTED_SQL, (namespace, limit))]
+
+    def _delete(self, namespace: CacheNamespace, keys: List[str]):
+        with self.db.transaction() as conn:
+            for key in keys:
+                namespace.delete(conn, key)
+                conn.execute(DELETE_ACCESS_SQL, (namespace.name, key))
+        if self.memory is not None:
+            for key in keys:
+                self.memory.delete((namespace.memory_key, key))
+
+    def sweep_expired(self) -> int:
+        """Delete every entry past its TTL and let namespaces trim old rows"""
+        now = time.time()
+        removed = 0
+        for namespace in self.namespaces.values():
+            keys = namespace.expired_keys(self.db, now)
+            if keys:
+                self._delete(namespace, keys)
+                removed += len(keys)
+            self.pruned_rows += namespace.prune(self.db, now)
+        self.expired += removed
+        return removed
+
+    def _entries(self) -> List[Tuple[str, str, int, float, int]]:
+        """(namespace, key, bytes, last_access, hits) for every cached entry"""
+        entries = []
+        for namespace in self.namespaces.values():
+            access = {
+                key: (last_access, hits)
+                for key, last_access, hits in self.db.fetchall(SELECT_ACCESS_SQL, (namespace.name,))
+            }
+            for key, size, stored_at in namespace.entries(self.db):
+                # Never-read entries count from when they were stored
+                last_access, hits = access.get(key, (stored_at, 0))
+                entries.append((namespace.name, key, size or 0, last_access or stored_at or 0, hits))
+        return entries
+
+    def used_bytes(self) -> int:
+        """Bytes in use by cache.db pages (file size minus the free list) plus namespace files"""
+        page_size = self.db.fetchone("PRAGMA page_size")[0]
+        page_count = self.db.fetchone("PRAGMA page_count")[0]
+        free_pages = self.db.fetchone("PRAGMA freelist_count")[0]
+        external = sum(namespace.external_bytes() for namespace in self.namespaces.values())
+        return (page_count - free_pages) * page_size + external
+
+    def evict(self) -> int:
+        """
+        Evict entries until the database is back under 90% of max_bytes
+
+        Per-entry sizes are estimates, so the next run re-measures and trims
+        again if pages did not free up as expected.
+        """
+        used = self.used_bytes()
+        if used <= self.max_bytes:
+            return 0
+        excess = used - int(self.max_bytes * 0.9)
+
+        entries = self._entries()
+        if self.policy == "lfu":
+            entries.sort(key=lambda entry: (entry[4], entry[3]))
+        else:
+            entries.sort(key=lambda entry: entry[3])
+
+        victims: Dict[str, List[str]] = {}
+        freed = 0
+        for namespace, key, size, _, _ in entries:
+            if freed >= excess:
+                break
+            victims.setdefault(namespace, []).append(key)
+            freed += size
+
+        evicted = 0
+        for namespace, keys in victims.items():
+            self._delete(self.namespaces[namespace], keys)
+            evicted += len(keys)
+        self.evictions += evicted
+        return evicted
+
+    def enable_incremental_vacuum(self):
+        """Switch cache.db to auto_vacuum=INCREMENTAL (one full VACUUM the first time)"""
+        if self.db.fetchone("PRAGMA auto_vacuum")[0] != 2:
+            self.db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.db.execute("VACUUM")
+
+    def incremental_vacuum(self) -> int:
+        """Return up to vacuum_pages free pages to the filesystem"""
+        free_pages = self.db.fetchone("PRAGMA freelist_count")[0]
+        if free_pages == 0:
+            return 0
+        # The pragma frees one page per step, so the cursor must be drained
+        self.db.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})").fetchall()
+        released = free_pages - self.db.fetchone("PRAGMA freelist_count")[0]
+        self.vacuumed_pages += released
+        return released
+
+    def run_once(self) -> Dict[str, int]:
+        """One maintenance pass: flush access counts, sweep, evict, compact"""
+        self.flush_access()
+        result = {
+            "expired": self.sweep_expired(),
+            "evicted": self.evict(),
+            "vacuumed_pages": self.incremental_vacuum()
+        }
+        self.last_run = time.time()
+        return result
+
+    def _run(self):
+        try:
+            self.enable_incremental_vacuum()
+        except Exception as e:
+            print(f"Cache maintenance could not enable incremental vacuum: {e}")
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Cache maintenance error: {e}")
+
+    def start(self):
+        """Run maintenance every interval_seconds in a background thread"""
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and persist pending access counts"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+        try:
+            self.flush_access()
+        except Exception as e:
+            print(f"Cache maintenance could not flush access counts: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Database size plus per-namespace entries, bytes and hit rate"""
+        namespaces = {}
+        for name in self.namespaces:
+            namespaces[name] = {"entries": 0, "bytes": 0}
+        for name, _, size, _, _ in self._entries():
+            namespaces[name]["entries"] += 1
+            namespaces[name]["bytes"] += size
+        with self._lock:
+            for name, counts in namespaces.items():
+                hits = self._hits.get(name, 0)
+                misses = self._misses.get(name, 0)
+                counts["hits"] = hits
+                counts["misses"] = misses
+                counts["hit_rate"] = round(hits / (hits + misses), 3) if hits + misses else None
+
+        page_size = self.db.fetchone("PRAGMA page_size")[0]
+        return {
+            "used_bytes": self.used_bytes(),
+            "file_bytes": self.db.fetchone("PRAGMA page_count")[0] * page_size,
+            "max_bytes": self.max_bytes,
+            "policy": self.policy,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "pruned_rows": self.pruned_rows,
+            "vacuumed_pages": self.vacuumed_pages,
+            "last_run": self.last_run,
+            "namespaces": namespaces
+        }
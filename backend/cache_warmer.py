@@ -0,0 +1,213 @@
+"""
+Pre-Market Cache Warmer
+Fills the quote, bar, metadata and model caches for each exchange's universe shortly before it opens
+"""
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cache_db import CacheDatabase
+from market_calendar import CALENDARS, exchange_for_symbol
+
+# TopStocksRecommender region served by each exchange
+EXCHANGE_REGIONS = {"NSE": "INDIA", "NASDAQ": "US"}
+
+CREATE_WARM_RUNS_SQL = """
+    CREATE TABLE IF NOT EXISTS cache_warm_runs (
+        exchange TEXT NOT NULL,
+        run_at TEXT NOT NULL,
+        claimed_by TEXT NOT NULL,
+        claimed_at REAL NOT NULL,
+        PRIMARY KEY (exchange, run_at)
+    )
+"""
+CLAIM_WARM_RUN_SQL = "INSERT OR IGNORE INTO cache_warm_runs (exchange, run_at, claimed_by, claimed_at) VALUES (?, ?, ?, ?)"
+DELETE_OLD_WARM_RUNS_SQL = "DELETE FROM cache_warm_runs WHERE claimed_at < ?"
+WARM_RUN_RETENTION_SECONDS = 7 * 86400
+
+
+def next_warm_time(exchange: str, now: datetime, lead_minutes: float) -> datetime:
+    """Next run, lead_minutes before a session opens (trading days only), strictly after `now` (aware)"""
+    calendar = CALENDARS[exchange]
+    day = now.astimezone(calendar.timezone).date()
+    if not calendar.is_trading_day(day):
+        day = calendar.next_trading_day(day)
+    while True:
+        run_at = calendar.session_open(day) - timedelta(minutes=lead_minutes)
+        if run_at > now:
+            return run_at
+        day = calendar.next_trading_day(day)
+
+
+class CacheWarmer:
+    """
+    Background scheduler that warms caches before each exchange opens
+
+    Each run covers the exchange's universe (watchlists, screener stocks)
+    plus its most-requested symbols, and goes through the normal fetch
+    paths: one batched bar download, one bulk metadata lookup, then quotes
+    (always refetched: the one cached after the last close expires at the
+    open) and predictions in a small thread pool. Predicting also trains any
+    missing model, which is the slowest cold path of all. Everything lands
+    in the shared caches, so the first requests after the open are hits.
+
+    Every uvicorn/gunicorn worker starts its own warmer, but with `db`
+    (the shared cache.db) each scheduled run is claimed with a row in
+    cache_warm_runs first: only the worker whose claim lands warms, the
+    others skip that run, so N workers cost one batch of upstream calls.
+    Without `db` every instance warms on its own.
+    """
+
+    def __init__(
+        self,
+        data_fetcher,
+        predictor,
+        universes: Dict[str, List[str]],
+        popular_symbols: Optional[Callable[[int], List[str]]] = None,
+        top_stocks=None,
+        lead_minutes: float = 10,
+        popular_limit: int = 20,
+        history_days: int = 90,
+        max_workers: int = 4,
+        db: Optional[CacheDatabase] = None
+    ):
+        unknown = set(universes) - set(CALENDARS)
+        if unknown:
+            raise ValueError(f"Unknown exchanges for cache warming: {sorted(unknown)}")
+        self.data_fetcher = data_fetcher
+        self.predictor = predictor
+        self.universes = universes
+        self.popular_symbols = popular_symbols
+        self.top_stocks = top_stocks
+        self.lead_minutes = lead_minutes
+        self.popular_limit = popular_limit
+        self.history_days = history_days
+        self.max_workers = max_workers
+        self.db = db
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        if db is not None:
+            db.execute(CREATE_WARM_RUNS_SQL)
+
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self.skipped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def symbols_for(self, exchange: str) -> List[str]:
+        """The exchange's universe followed by its most-requested symbols, without duplicates"""
+        symbols = list(self.universes.get(exchange, []))
+        if self.popular_symbols and self.popular_limit > 0:
+            try:
+                popular = self.popular_symbols(self.popular_limit)
+            except Exception as e:
+                print(f"Cache warmer could not read popular symbols: {e}")
+                popular = []
+            symbols.extend(symbol for symbol in popular if exchange_for_symbol(symbol) == exchange)
+        return list(dict.fromkeys(symbols))
+
+    def next_run(self, now: Optional[datetime] = None) -> Tuple[str, datetime]:
+        """(exchange, time) of the next scheduled warm-up"""
+        now = now or datetime.now(timezone.utc)
+        return min(
+            ((exchange, next_warm_time(exchange, now, self.lead_minutes)) for exchange in self.universes),
+            key=lambda run: run[1]
+        )
+
+    def claim(self, exchange: str, run_at: datetime) -> bool:
+        """Whether this worker gets to do the scheduled run (first claim in cache.db wins)"""
+        if self.db is None:
+            return True
+        now = time.time()
+        self.db.execute(DELETE_OLD_WARM_RUNS_SQL, (now - WARM_RUN_RETENTION_SECONDS,))
+        cursor = self.db.execute(CLAIM_WARM_RUN_SQL, (exchange, run_at.isoformat(), self.worker_id, now))
+        return cursor.rowcount == 1
+
+    def warm(self, exchange: str) -> Dict[str, Any]:
+        """Warm every cache for one exchange now; per-symbol failures are counted, not raised"""
+        started = time.monotonic()
+        symbols = self.symbols_for(exchange)
+        failures: Dict[str, int] = {}
+        failures_lock = threading.Lock()
+
+        def attempt(stage: str, fn, *args):
+            if self._stop.is_set():
+                return None
+            try:
+                return fn(*args)
+            except Exception as e:
+                with failures_lock:
+                    failures[stage] = failures.get(stage, 0) + 1
+                subject = args[0] if isinstance(args[0], str) else exchange
+                print(f"Cache warmer {stage} failed for {subject}: {e}")
+                return None
+
+        histories = attempt("history", self.data_fetcher.get_historical_batch, symbols, self.history_days) or {}
+        attempt("metadata", self.data_fetcher.get_company_metadata, symbols)
+        # Symbols without bars cannot be quoted or predicted either
+        ready = [symbol for symbol in symbols if symbol in histories]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cache-warmer") as pool:
+            # A quote cached after the last close still counts as fresh now, but not once the session opens
+            list(pool.map(lambda symbol: attempt("quote", self._refresh_quote, symbol), ready))
+            list(pool.map(lambda symbol: attempt("prediction", self.predictor.predict_next_day, symbol), ready))
+        if self.top_stocks is not None and exchange in EXCHANGE_REGIONS:
+            attempt("top_stocks", self.top_stocks.get_top_aggressive_stocks, 10, EXCHANGE_REGIONS[exchange])
+
+        run = {
+            "finished_at": time.time(),
+            "seconds": round(time.monotonic() - started, 2),
+            "symbols": len(symbols),
+            "warmed": len(ready),
+            "failures": failures
+        }
+        self.runs[exchange] = run
+        print(f"Cache warmer: {exchange} warmed {len(ready)}/{len(symbols)} symbols in {run['seconds']}s")
+        return run
+
+    def _refresh_quote(self, symbol: str) -> Dict[str, Any]:
+        """Fetch a quote upstream even if a cached one is still within its TTL"""
+        return self.data_fetcher.get_quote(symbol, force_refresh=True)
+
+    def _run(self):
+        while True:
+            exchange, run_at = self.next_run()
+            wait_seconds = (run_at - datetime.now(timezone.utc)).total_seconds()
+            if self._stop.wait(max(wait_seconds, 0)):
+                return
+            try:
+                if self.claim(exchange, run_at):
+                    self.warm(exchange)
+                else:
+                    self.skipped += 1
+                    print(f"Cache warmer: {exchange} run at {run_at.isoformat()} taken by another worker")
+            except Exception as e:
+                print(f"Cache warmer error: {e}")
+
+    def start(self):
+        """Warm each exchange lead_minutes before its open, in a background thread"""
+        if self._thread is not None or not self.universes:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler; a run in progress skips its remaining steps"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        exchange, run_at = self.next_run() if self.universes else (None, None)
+        return {
+            "running": self._thread is not None,
+            "next_exchange": exchange,
+            "next_run": run_at.isoformat() if run_at else None,
+            "worker": self.worker_id,
+            "runs_skipped": self.skipped,
+            "last_runs": self.runs
+        }
@@ -1,3 +1,5 @@
+from typing import Dict
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,6 +8,45 @@ class Settings(BaseSettings):
     GEMINI_API_KEY: str = ""  # Get from https://ai.google.dev/
     CACHE_DB_PATH: str = "cache.db"
     MODEL_DIR: str = "./models"
+    MEMORY_CACHE_MAX_MB: float = 64  # In-process LRU tier in front of cache.db
+    MEMORY_CACHE_TTL_SECONDS: int = 86400  # Upper bound; callers still apply their own max age
+    QUOTE_STALE_WHILE_REVALIDATE: bool = False  # Serve expired quotes at once and refresh in background
+    QUOTE_MAX_STALE_MINUTES: float = 60  # Older quotes are always fetched synchronously
+    HTTP_TIMEOUT_SECONDS: float = 10  # Alpha Vantage / NewsAPI request timeout
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 3
+    HTTP_MAX_CONNECTIONS: int = 100  # Pooled keep-alive connections in total
+    HTTP_CONNECTIONS_PER_HOST: int = 10
+    HTTP_MAX_HOSTS: int = 10
+    ALPHA_VANTAGE_CALLS_PER_MINUTE: float = 5  # Match the API key's quota (free tier: 5/min, 25/day), shared by all workers via cache.db
+    ALPHA_VANTAGE_CALLS_PER_DAY: int = 25
+    PROVIDER_FAILURE_THRESHOLD: int = 3  # Consecutive failures before a provider is skipped
+    PROVIDER_RETRY_SECONDS: float = 60  # How long a failing provider is skipped before one trial call
+    PROVIDER_PROBE_SECONDS: float = 900  # How often a provider ranked last gets one call to re-measure it
+    COMPANY_METADATA_MAX_AGE_DAYS: float = 7  # Names, sectors etc. rarely change
+    CACHE_MAX_MB: float = 512  # Size budget for cache.db; entries are evicted beyond it
+    CACHE_EVICTION_POLICY: str = "lru"  # "lru" or "lfu"
+    CACHE_DEFAULT_TTL_HOURS: float = 24  # Expiry for cache rows written without an explicit TTL
+    CACHE_MAINTENANCE_INTERVAL_SECONDS: float = 300  # Sweep/evict/compact period, 0 disables
+    CACHE_VACUUM_PAGES: int = 1000  # Free pages returned to the filesystem per run
+    BAR_STORE_BACKEND: str = "sqlite"  # "sqlite", "mmap" (per-symbol files memory-mapped by every worker) or "compressed" (one blob per symbol, for long histories)
+    BAR_DIR: str = "./bars"  # Where the mmap backend keeps its files
+    INTRADAY_RETENTION_DAYS: Dict[str, float] = {"1m": 5, "5m": 60}  # Stored intraday intervals and how long each is kept
+    INTRADAY_MAX_AGE_SECONDS: float = 60  # Refresh the latest intraday bars at most this often
+    CACHE_WARMER_ENABLED: bool = True  # Pre-fetch quotes, bars, metadata and predictions before each open; workers sharing cache.db claim each run, so only one of them warms
+    CACHE_WARM_LEAD_MINUTES: float = 10  # How long before the open; keep under the 15 min quote TTL
+    CACHE_WARM_POPULAR_SYMBOLS: int = 20  # Most-requested symbols warmed on top of the fixed universes
+    QUOTE_STREAM_INTERVAL_SECONDS: float = 5  # How often /ws/quotes polls each subscribed symbol (through the quote cache)
+    QUOTE_STREAM_MAX_SYMBOLS: int = 50  # Subscriptions allowed per WebSocket connection
+    MODEL_REGISTRY_MAX_MODELS: int = 256  # Trained models kept unpickled in memory (LRU)
+    MODEL_REGISTRY_CHECK_SECONDS: float = 5  # How often a resident model is checked for retraining by another worker
+    PREDICTION_CACHE_MAX_AGE_DAYS: float = 7  # Cached forecasts of symbols not requested for this long are swept
+    PREDICT_BATCH_MAX_SYMBOLS: int = 500  # Symbols accepted by one /predict/batch call
+    MARKET_DATA_MODE: str = "live"  # "live", "record" (live + save fixtures) or "replay" (fixtures only, no network)
+    MARKET_DATA_FIXTURE_DIR: str = "./fixtures/market_data"
+    REPLAY_LATENCY_MS: float = 0  # Simulated upstream latency in replay mode
+    REPLAY_LATENCY_JITTER_MS: float = 0
+    REPLAY_ERROR_RATE: float = 0  # Fraction of replayed calls that fail like a provider outage
+    REPLAY_SEED: int = 0
     
     class Config:
         env_file = ".env"
@@ -1,179 +1,831 @@
-import sqlite3
+import asyncio
 import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Callable
+import numpy as np
+import pandas as pd
 import yfinance as yf
-import requests
 from config import settings
+from cache_db import get_cache_database
+from bar_store import empty_bars, open_bar_store, slice_bars
+from market_calendar import calendar_for_symbol
+from intraday_store import INTERVAL_SECONDS, IntradayStore, empty_intraday, rollup
+from cache_maintenance import CacheMaintenance, CacheNamespace
+from single_flight import SingleFlight
+from http_client import get_session, request_timeout, async_http
+from memory_cache import MemoryCache
+from provider_health import ProviderError, ProviderHealth, ProviderRouter, TokenBucket
+from market_replay import FaultInjector, build_market_data_clients
+
+CREATE_CACHE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS cache (
+        symbol TEXT PRIMARY KEY,
+        data TEXT,
+        timestamp REAL,
+        expires_at REAL
+    )
+"""
+SELECT_CACHE_SQL = "SELECT data, timestamp FROM cache WHERE symbol = ?"
+UPSERT_CACHE_SQL = "INSERT OR REPLACE INTO cache (symbol, data, timestamp, expires_at) VALUES (?, ?, ?, ?)"
+BACKFILL_CACHE_EXPIRY_SQL = "UPDATE cache SET expires_at = timestamp + ? WHERE expires_at IS NULL"
+CREATE_METADATA_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS company_metadata (
+        symbol TEXT PRIMARY KEY,
+        data TEXT,
+        fetched_at REAL
+    )
+"""
+UPSERT_METADATA_SQL = "INSERT OR REPLACE INTO company_metadata (symbol, data, fetched_at) VALUES (?, ?, ?)"
+DELETE_LEGACY_HISTORY_SQL = "DELETE FROM cache WHERE symbol LIKE '%\\_historical\\_%' ESCAPE '\\'"
+
+# Shared by every DataFetcher instance so nested Predictor/StockAdvisor calls coalesce too
+upstream_flights = SingleFlight()
+
+# RAM tier in front of cache.db, shared the same way
+memory_tier = MemoryCache(
+    max_bytes=int(settings.MEMORY_CACHE_MAX_MB * 1024 * 1024),
+    default_ttl_seconds=settings.MEMORY_CACHE_TTL_SECONDS
+)
+
+# Size bound, TTL sweep and compaction for cache.db; each namespace matches a memory tier key prefix
+cache_maintenance = CacheMaintenance(
+    get_cache_database(settings.CACHE_DB_PATH),
+    max_bytes=int(settings.CACHE_MAX_MB * 1024 * 1024),
+    policy=settings.CACHE_EVICTION_POLICY,
+    interval_seconds=settings.CACHE_MAINTENANCE_INTERVAL_SECONDS,
+    vacuum_pages=settings.CACHE_VACUUM_PAGES,
+    memory=memory_tier
+)
+cache_maintenance.register(CacheNamespace(
+    "cache",
+    entries_sql="SELECT symbol, length(data) + length(symbol) + 32, timestamp FROM cache",
+    delete_sqls=["DELETE FROM cache WHERE symbol = ?"],
+    expired_sql="SELECT symbol FROM cache WHERE expires_at < ?"
+))
+cache_maintenance.register(CacheNamespace(
+    "metadata",
+    entries_sql="SELECT symbol, length(data) + length(symbol) + 24, fetched_at FROM company_metadata",
+    delete_sqls=["DELETE FROM company_metadata WHERE symbol = ?"],
+    expired_sql=f"SELECT symbol FROM company_metadata WHERE fetched_at < ? - {settings.COMPANY_METADATA_MAX_AGE_DAYS * 86400}"
+))
+
+# Daily bars, in cache.db or in memory-mapped files shared by all workers (BAR_STORE_BACKEND)
+bar_store = open_bar_store(settings.BAR_STORE_BACKEND, get_cache_database(settings.CACHE_DB_PATH), settings.BAR_DIR)
+cache_maintenance.register(bar_store.cache_namespace())
+
+# Intraday bars at the stored intervals, pruned by INTRADAY_RETENTION_DAYS during maintenance
+intraday_store = IntradayStore(get_cache_database(settings.CACHE_DB_PATH), settings.INTRADAY_RETENTION_DAYS)
+cache_maintenance.register(intraday_store.cache_namespace())
+
+# Background quote refreshes for stale-while-revalidate
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="quote-refresh")
+_pending_refreshes = set()
+_pending_refreshes_lock = threading.Lock()
+
+# Upstream clients: the real libraries, or fixture recording/replay (MARKET_DATA_MODE)
+market_yf, market_http, market_async_http, market_now = build_market_data_clients(
+    settings.MARKET_DATA_MODE,
+    settings.MARKET_DATA_FIXTURE_DIR,
+    yf,
+    get_session(),
+    async_http,
+    FaultInjector(
+        latency_ms=settings.REPLAY_LATENCY_MS,
+        jitter_ms=settings.REPLAY_LATENCY_JITTER_MS,
+        error_rate=settings.REPLAY_ERROR_RATE,
+        seed=settings.REPLAY_SEED
+    )
+)
+
+# Rate limits, circuit breakers and adaptive ordering for the upstream providers
+providers = ProviderRouter([
+    ProviderHealth(
+        "alphavantage",
+        buckets=[
+            TokenBucket(settings.ALPHA_VANTAGE_CALLS_PER_MINUTE / 60, settings.ALPHA_VANTAGE_CALLS_PER_MINUTE),
+            TokenBucket(settings.ALPHA_VANTAGE_CALLS_PER_DAY / 86400, settings.ALPHA_VANTAGE_CALLS_PER_DAY)
+        ],
+        failure_threshold=settings.PROVIDER_FAILURE_THRESHOLD,
+        reset_timeout=settings.PROVIDER_RETRY_SECONDS,
+        # One quota for every worker process, not one each
+        db=get_cache_database(settings.CACHE_DB_PATH)
+    ),
+    ProviderHealth(
+        "yfinance",
+        failure_threshold=settings.PROVIDER_FAILURE_THRESHOLD,
+        reset_timeout=settings.PROVIDER_RETRY_SECONDS
+    )
+], probe_interval=settings.PROVIDER_PROBE_SECONDS)
+QUOTE_PROVIDERS = ["alphavantage", "yfinance"]  # Default order, adapted by recent health
+HISTORY_PROVIDERS = ["yfinance", "alphavantage"]
+
+QUOTE_MAX_AGE_HOURS = 0.25  # 15 min cache for quotes
+# Quote rows are kept as long as they could still be served stale, then swept
+QUOTE_RETENTION_SECONDS = max(QUOTE_MAX_AGE_HOURS * 3600, settings.QUOTE_MAX_STALE_MINUTES * 60)
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+METADATA_FETCH_WORKERS = 8  # Parallel Ticker.info scrapes when filling the metadata cache
 
 class DataFetcher:
-    def __init__(self):
+    def __init__(self, now: Optional[Callable[[], datetime]] = None):
+        # Clock for date windows; in replay mode the fixtures' "today" rather than the real one
+        self.now = now or market_now
         self.alpha_vantage_key = settings.ALPHA_VANTAGE_API_KEY
         self.cache_db = settings.CACHE_DB_PATH
+        self.db = get_cache_database(self.cache_db)
         self._init_cache_db()
+        self.bar_store = bar_store
     
     def _init_cache_db(self):
         """Initialize SQLite cache database"""
-        conn = sqlite3.connect(self.cache_db)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cache (
-                symbol TEXT PRIMARY KEY,
-                data TEXT,
-                timestamp REAL
-            )
-        """)
-        conn.commit()
-        conn.close()
+        self.db.execute(CREATE_CACHE_TABLE_SQL)
+        # Databases created before TTL sweeping lack expires_at
+        if self.db.add_missing_columns("cache", {"expires_at": "REAL"}):
+            self.db.execute(BACKFILL_CACHE_EXPIRY_SQL, (settings.CACHE_DEFAULT_TTL_HOURS * 3600,))
+        self.db.execute(CREATE_METADATA_TABLE_SQL)
+        # History used to be cached per (symbol, days) as JSON; it now lives in the bar store
+        self.db.execute(DELETE_LEGACY_HISTORY_SQL)
     
     def _get_cached_data(self, symbol: str, max_age_hours: int = 1) -> Optional[Dict]:
-        """Retrieve cached data if fresh"""
-        conn = sqlite3.connect(self.cache_db)
-        cursor = conn.cursor()
-        cursor.execute("SELECT data, timestamp FROM cache WHERE symbol = ?", (symbol,))
-        row = cursor.fetchone()
-        conn.close()
+        """Retrieve cached data if fresh (memory tier first, then SQLite)"""
+        entry = self._get_cached_entry(symbol, max_age_hours)
+        return entry[0] if entry else None
+    
+    def _get_cached_entry(self, symbol: str, max_age_hours: float) -> Optional[Tuple[Dict, float]]:
+        """Retrieve cached data and the time it was stored, if younger than max_age_hours"""
+        max_age_seconds = max_age_hours * 3600
+        entry = memory_tier.get_entry(("cache", symbol), max_age_seconds)
+        if entry is not None:
+            return entry
+        
+        row = self.db.fetchone(SELECT_CACHE_SQL, (symbol,))
         
         if row:
             data, timestamp = row
             age_hours = (time.time() - timestamp) / 3600
             if age_hours < max_age_hours:
-                return json.loads(data)
+                data = json.loads(data)
+                memory_tier.set(("cache", symbol), data, stored_at=timestamp)
+                return data, timestamp
         return None
     
-    def _save_to_cache(self, symbol: str, data: Dict):
-        """Save data to cache"""
-        conn = sqlite3.connect(self.cache_db)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT OR REPLACE INTO cache (symbol, data, timestamp) VALUES (?, ?, ?)",
-            (symbol, json.dumps(data), time.time())
+    def _save_to_cache(self, symbol: str, data: Dict, ttl_seconds: Optional[float] = None):
+        """Save data to cache (written through to SQLite); swept once ttl_seconds have passed"""
+        if ttl_seconds is None:
+            ttl_seconds = settings.CACHE_DEFAULT_TTL_HOURS * 3600
+        now = time.time()
+        self.db.execute(UPSERT_CACHE_SQL, (symbol, json.dumps(data), now, now + ttl_seconds))
+        memory_tier.set(("cache", symbol), data, stored_at=now)
+    
+    def _save_many_to_cache(self, entries: Dict[str, Dict], ttl_seconds: Optional[float] = None):
+        """Save several cache entries with a single commit"""
+        if ttl_seconds is None:
+            ttl_seconds = settings.CACHE_DEFAULT_TTL_HOURS * 3600
+        now = time.time()
+        self.db.executemany(
+            UPSERT_CACHE_SQL,
+            [(key, json.dumps(data), now, now + ttl_seconds) for key, data in entries.items()]
         )
-        conn.commit()
-        conn.close()
+        for key, data in entries.items():
+            memory_tier.set(("cache", key), data, stored_at=now)
     
-    def get_quote(self, symbol: str) -> Dict[str, Any]:
-        """Get current stock quote - try Alpha Vantage first, fallback to yfinance"""
-        # Check cache first
-        cached = self._get_cached_data(symbol, max_age_hours=0.25)  # 15 min cache for quotes
-        if cached:
-            return cached
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Memory tier, cache.db, upstream coalescing and provider health counters"""
+        return {
+            "memory": memory_tier.stats(),
+            "sqlite": cache_maintenance.stats(),
+            "upstream": {
+                "executions": upstream_flights.executions,
+                "coalesced": upstream_flights.coalesced,
+                "in_flight": upstream_flights.in_flight()
+            },
+            "providers": providers.snapshot()
+        }
+    
+    def _call_provider(self, provider: str, kind: str, fn, *args) -> Any:
+        """
+        Run one upstream call under the provider's rate limit and circuit breaker
         
-        # Try Alpha Vantage first
+        `kind` ("quote", "history", ...) selects the latency and success
+        averages the outcome is recorded in. Returns None when the provider is skipped, fails or has no data. Only
+        exceptions count against the provider; an empty answer (unknown
+        symbol) does not.
+        """
+        health = providers[provider]
+        if not health.acquire():
+            return None
+        started = time.monotonic()
         try:
-            url = f"https://www.alphavantage.co/query"
-            params = {
-                "function": "GLOBAL_QUOTE",
-                "symbol": symbol,
-                "apikey": self.alpha_vantage_key
-            }
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            
-            if "Global Quote" in data and data["Global Quote"]:
-                quote = data["Global Quote"]
-                result = {
-                    "symbol": symbol,
-                    "price": float(quote.get("05. price", 0)),
-                    "change": float(quote.get("09. change", 0)),
-                    "change_percent": quote.get("10. change percent", "0%"),
-                    "volume": int(quote.get("06. volume", 0)),
-                    "latest_trading_day": quote.get("07. latest trading day", ""),
-                    "source": "alphavantage"
-                }
-                self._save_to_cache(symbol, result)
-                return result
+            result = fn(*args)
         except Exception as e:
-            print(f"Alpha Vantage error: {e}")
-        
-        # Fallback to yfinance
+            health.record(kind, False, time.monotonic() - started)
+            print(f"{provider} error: {e}")
+            return None
+        health.record(kind, True, time.monotonic() - started)
+        return result
+    
+    async def _call_provider_async(self, provider: str, kind: str, fn, *args) -> Any:
+        """_call_provider for coroutine functions"""
+        health = providers[provider]
+        if not health.acquire():
+            return None
+        started = time.monotonic()
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            hist = ticker.history(period="2d")
-            
-            if len(hist) > 0:
-                current_price = hist['Close'].iloc[-1]
-                prev_close = info.get('previousClose', hist['Close'].iloc[-2] if len(hist) > 1 else current_price)
-                change = current_price - prev_close
-                change_percent = (change / prev_close * 100) if prev_close else 0
-                
-                result = {
-                    "symbol": symbol,
-                    "price": float(current_price),
-                    "change": float(change),
-                    "change_percent": f"{change_percent:.2f}%",
-                    "volume": int(hist['Volume'].iloc[-1]) if 'Volume' in hist.columns else 0,
-                    "latest_trading_day": hist.index[-1].strftime("%Y-%m-%d"),
-                    "source": "yfinance"
-                }
-                self._save_to_cache(symbol, result)
-                return result
+            result = await fn(*args)
         except Exception as e:
-            print(f"yfinance error: {e}")
+            health.record(kind, False, time.monotonic() - started)
+            print(f"{provider} error: {e}")
+            return None
+        health.record(kind, True, time.monotonic() - started)
+        return result
+    
+    def get_quote(self, symbol: str, allow_stale: Optional[bool] = None, force_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Get current stock quote - try Alpha Vantage first, fallback to yfinance
+        
+        The order adapts to recent provider health: a rate-limited or failing
+        provider is skipped until its circuit breaker lets a trial call through.
+        
+        With allow_stale (default: QUOTE_STALE_WHILE_REVALIDATE), an expired
+        quote younger than QUOTE_MAX_STALE_MINUTES is returned immediately,
+        flagged with 'stale': True, while a background refresh runs. Older
+        quotes are always fetched synchronously.
+        
+        force_refresh skips the cache and fetches upstream (still shared with
+        concurrent callers), e.g. to replace a quote cached after the last
+        close that stays "fresh" until the market opens.
+        """
+        # Check cache first
+        if not force_refresh:
+            cached = self._get_cached_quote(symbol, allow_stale)
+            if cached:
+                return cached
+        
+        # Concurrent misses for the same symbol share one upstream fetch
+        return upstream_flights.do(("quote", symbol), self._fetch_quote, symbol, force_refresh)
+    
+    def _get_cached_quote(self, symbol: str, allow_stale: Optional[bool]) -> Optional[Dict[str, Any]]:
+        """Fresh cached quote, else a stale one when allowed; counted for cache hit rates"""
+        cached = self._get_cached_data(symbol, max_age_hours=self._quote_max_age_hours(symbol))
+        if not cached:
+            cached = self._get_stale_quote(symbol, allow_stale)
+        cache_maintenance.record("cache", symbol, hit=cached is not None)
+        return cached
+    
+    def _quote_max_age_hours(self, symbol: str) -> float:
+        """Quote TTL, extended until the next session opens while the symbol's market is closed"""
+        return calendar_for_symbol(symbol).max_age_seconds(QUOTE_MAX_AGE_HOURS * 3600) / 3600
+    
+    def _quote_retention_seconds(self, symbol: str) -> float:
+        """Keep quote rows through a closed market so the sweep does not force a refetch"""
+        return QUOTE_RETENTION_SECONDS + calendar_for_symbol(symbol).seconds_until_open()
+    
+    def _get_stale_quote(self, symbol: str, allow_stale: Optional[bool]) -> Optional[Dict[str, Any]]:
+        """Serve an expired quote and queue its refresh, when stale-while-revalidate applies"""
+        if allow_stale is None:
+            allow_stale = settings.QUOTE_STALE_WHILE_REVALIDATE
+        if not allow_stale:
+            return None
+        entry = self._get_cached_entry(symbol, max_age_hours=settings.QUOTE_MAX_STALE_MINUTES / 60)
+        if not entry:
+            return None
+        data, stored_at = entry
+        self._refresh_quote_in_background(symbol)
+        return {**data, "stale": True, "stale_age_seconds": int(time.time() - stored_at)}
+    
+    def _refresh_quote_in_background(self, symbol: str):
+        """Queue one upstream refresh for a symbol unless one is already pending"""
+        with _pending_refreshes_lock:
+            if symbol in _pending_refreshes:
+                return
+            _pending_refreshes.add(symbol)
+        
+        def refresh():
+            try:
+                upstream_flights.do(("quote", symbol), self._fetch_quote, symbol)
+            except Exception as e:
+                print(f"Background quote refresh failed for {symbol}: {e}")
+            finally:
+                with _pending_refreshes_lock:
+                    _pending_refreshes.discard(symbol)
+        
+        _refresh_executor.submit(refresh)
+    
+    def _fetch_quote(self, symbol: str, force_refresh: bool = False) -> Dict[str, Any]:
+        """Fetch a quote upstream and cache it"""
+        # A previous flight may have filled the cache while this caller was missing it
+        cached = None if force_refresh else self._get_cached_data(symbol, max_age_hours=self._quote_max_age_hours(symbol))
+        if cached:
+            return cached
+        
+        fetchers = {
+            "alphavantage": self._fetch_quote_alphavantage,
+            "yfinance": self._fetch_quote_yfinance
+        }
+        for provider in providers.order(QUOTE_PROVIDERS, "quote"):
+            result = self._call_provider(provider, "quote", fetchers[provider], symbol)
+            if result:
+                self._save_to_cache(symbol, result, ttl_seconds=self._quote_retention_seconds(symbol))
+                return result
         
         raise ValueError(f"Unable to fetch quote for {symbol}")
     
-    def get_historical_data(self, symbol: str, days: int = 90) -> Dict[str, Any]:
-        """Get historical stock data for model training"""
-        cache_key = f"{symbol}_historical_{days}"
-        cached = self._get_cached_data(cache_key, max_age_hours=24)  # 24 hour cache
+    async def get_quote_async(self, symbol: str, allow_stale: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        get_quote for async endpoints
+        
+        Alpha Vantage is awaited on the pooled aiohttp client, so no worker
+        thread is held while the request is in flight; only the yfinance
+        fallback runs in a thread.
+        """
+        cached = self._get_cached_quote(symbol, allow_stale)
+        if cached:
+            return cached
+        
+        # Same flights as get_quote, so /quote and /signal for one symbol share a single upstream call
+        return await upstream_flights.do_async(("quote", symbol), self._fetch_quote_async, symbol)
+    
+    async def _fetch_quote_async(self, symbol: str) -> Dict[str, Any]:
+        """Fetch a quote upstream without blocking the event loop and cache it"""
+        cached = self._get_cached_data(symbol, max_age_hours=self._quote_max_age_hours(symbol))
         if cached:
             return cached
         
-        # Try yfinance first for historical data (more reliable)
-        try:
-            ticker = yf.Ticker(symbol)
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            hist = ticker.history(start=start_date, end=end_date)
-            
-            if len(hist) > 0:
-                result = {
-                    "symbol": symbol,
-                    "dates": hist.index.strftime("%Y-%m-%d").tolist(),
-                    "open": hist['Open'].tolist(),
-                    "high": hist['High'].tolist(),
-                    "low": hist['Low'].tolist(),
-                    "close": hist['Close'].tolist(),
-                    "volume": hist['Volume'].tolist(),
-                    "source": "yfinance"
-                }
-                self._save_to_cache(cache_key, result)
+        fetchers = {
+            "alphavantage": self._fetch_quote_alphavantage_async,
+            # Blocking library, so run it off the loop
+            "yfinance": lambda symbol: asyncio.to_thread(self._fetch_quote_yfinance, symbol)
+        }
+        for provider in providers.order(QUOTE_PROVIDERS, "quote"):
+            result = await self._call_provider_async(provider, "quote", fetchers[provider], symbol)
+            if result:
+                self._save_to_cache(symbol, result, ttl_seconds=self._quote_retention_seconds(symbol))
                 return result
-        except Exception as e:
-            print(f"yfinance historical error: {e}")
         
-        # Fallback to Alpha Vantage
-        try:
-            url = f"https://www.alphavantage.co/query"
-            params = {
-                "function": "TIME_SERIES_DAILY",
+        raise ValueError(f"Unable to fetch quote for {symbol}")
+    
+    def _fetch_quote_alphavantage(self, symbol: str) -> Optional[Dict[str, Any]]:
+        response = market_http.get(
+            ALPHA_VANTAGE_URL, params=self._alphavantage_quote_params(symbol), timeout=request_timeout()
+        )
+        return self._parse_alphavantage_quote(symbol, response.json())
+    
+    async def _fetch_quote_alphavantage_async(self, symbol: str) -> Optional[Dict[str, Any]]:
+        _, data = await market_async_http.get_json(ALPHA_VANTAGE_URL, self._alphavantage_quote_params(symbol))
+        return self._parse_alphavantage_quote(symbol, data)
+    
+    def _alphavantage_quote_params(self, symbol: str) -> Dict[str, str]:
+        return {
+            "function": "GLOBAL_QUOTE",
+            "symbol": symbol,
+            "apikey": self.alpha_vantage_key
+        }
+    
+    def _parse_alphavantage_quote(self, symbol: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Build a quote from a GLOBAL_QUOTE response (None when the symbol is unknown)"""
+        self._check_alphavantage_response(data)
+        if "Global Quote" in data and data["Global Quote"]:
+            quote = data["Global Quote"]
+            return {
                 "symbol": symbol,
-                "outputsize": "full",
-                "apikey": self.alpha_vantage_key
+                "price": float(quote.get("05. price", 0)),
+                "change": float(quote.get("09. change", 0)),
+                "change_percent": quote.get("10. change percent", "0%"),
+                "volume": int(quote.get("06. volume", 0)),
+                "latest_trading_day": quote.get("07. latest trading day", ""),
+                "source": "alphavantage"
             }
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            
-            if "Time Series (Daily)" in data:
-                time_series = data["Time Series (Daily)"]
-                dates = sorted(list(time_series.keys()))[-days:]
-                
-                result = {
-                    "symbol": symbol,
-                    "dates": dates,
-                    "open": [float(time_series[d]["1. open"]) for d in dates],
-                    "high": [float(time_series[d]["2. high"]) for d in dates],
-                    "low": [float(time_series[d]["3. low"]) for d in dates],
-                    "close": [float(time_series[d]["4. close"]) for d in dates],
-                    "volume": [int(time_series[d]["5. volume"]) for d in dates],
-                    "source": "alphavantage"
-                }
-                self._save_to_cache(cache_key, result)
-                return result
+        return None
+    
+    def _check_alphavantage_response(self, data: Dict[str, Any]):
+        """Alpha Vantage answers HTTP 200 with a 'Note'/'Information' message when the quota is spent"""
+        for key in ("Note", "Information"):
+            if key in data:
+                raise ProviderError(f"Alpha Vantage: {data[key]}")
+    
+    def _fetch_quote_yfinance(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Build a quote from yfinance price history alone (no Ticker.info scrape)"""
+        # A few sessions back so the previous close survives weekends and holidays
+        hist = market_yf.Ticker(symbol).history(period="5d")
+        
+        if len(hist) == 0:
+            return None
+        
+        current_price = hist['Close'].iloc[-1]
+        prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
+        change = current_price - prev_close
+        change_percent = (change / prev_close * 100) if prev_close else 0
+        
+        return {
+            "symbol": symbol,
+            "price": float(current_price),
+            "change": float(change),
+            "change_percent": f"{change_percent:.2f}%",
+            "volume": int(hist['Volume'].iloc[-1]) if 'Volume' in hist.columns else 0,
+            "latest_trading_day": hist.index[-1].strftime("%Y-%m-%d"),
+            "source": "yfinance"
+        }
+    
+    def get_company_metadata(self, symbols: List[str], max_age_hours: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Static company details (name, sector, exchange...) for many symbols
+        
+        Served from the long-TTL company_metadata table; symbols missing or
+        older than COMPANY_METADATA_MAX_AGE_DAYS are scraped from yfinance in
+        parallel and written back in one commit. Symbols that cannot be
+        fetched are left out, so callers should fall back to the symbol.
+        """
+        if max_age_hours is None:
+            max_age_hours = settings.COMPANY_METADATA_MAX_AGE_DAYS * 24
+        max_age_seconds = max_age_hours * 3600
+        
+        results = {}
+        missing = []
+        for symbol in dict.fromkeys(symbols):
+            data = memory_tier.get(("metadata", symbol), max_age_seconds=max_age_seconds)
+            if data is not None:
+                results[symbol] = data
+            else:
+                missing.append(symbol)
+        
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            rows = self.db.fetchall(
+                f"SELECT symbol, data, fetched_at FROM company_metadata WHERE symbol IN ({placeholders})",
+                missing
+            )
+            now = time.time()
+            for symbol, data, fetched_at in rows:
+                if now - fetched_at < max_age_seconds:
+                    results[symbol] = json.loads(data)
+                    memory_tier.set(("metadata", symbol), results[symbol], stored_at=fetched_at)
+            missing = [symbol for symbol in missing if symbol not in results]
+        
+        for symbol in dict.fromkeys(symbols):
+            cache_maintenance.record("metadata", symbol, hit=symbol in results)
+        
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(METADATA_FETCH_WORKERS, len(missing))) as pool:
+                fetched = dict(zip(missing, pool.map(self._fetch_company_metadata, missing)))
+            fetched = {symbol: data for symbol, data in fetched.items() if data}
+            now = time.time()
+            self.db.executemany(
+                UPSERT_METADATA_SQL,
+                [(symbol, json.dumps(data), now) for symbol, data in fetched.items()]
+            )
+            for symbol, data in fetched.items():
+                memory_tier.set(("metadata", symbol), data, stored_at=now)
+            results.update(fetched)
+        
+        return results
+    
+    def _fetch_company_metadata(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Scrape company details from yfinance (slow; only used to fill the metadata cache)"""
+        try:
+            info = market_yf.Ticker(symbol).info
         except Exception as e:
-            print(f"Alpha Vantage historical error: {e}")
+            print(f"yfinance metadata error for {symbol}: {e}")
+            return None
+        if not info:
+            return None
+        return {
+            "symbol": symbol,
+            "name": info.get('longName', info.get('shortName', symbol)),
+            "short_name": info.get('shortName'),
+            "sector": info.get('sector'),
+            "industry": info.get('industry'),
+            "currency": info.get('currency'),
+            "exchange": info.get('exchange')
+        }
+    
+    def get_historical_data(self, symbol: str, days: int = 90, max_age_hours: float = 24) -> Dict[str, Any]:
+        """
+        Get historical stock data for model training
+        
+        Returns 'dates' as YYYY-MM-DD strings and each OHLCV field as a
+        float64 NumPy array, served straight from the bar store.
+        
+        Each symbol keeps one series covering the longest window ever
+        requested. Shorter windows are sliced from it, a longer window only
+        downloads the missing older bars, and an expired series only
+        downloads the bars after its last stored date. max_age_hours is
+        extended while the symbol's market is closed: a series fetched after
+        the last close stays fresh until the next session opens.
+        """
+        start_date = (self.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        meta, series = self._load_series(symbol, max_age_hours)
+        segments = self._plan_history_segments(symbol, meta, start_date, max_age_hours)
+        cache_maintenance.record("bars", symbol, hit=not segments)
+        if segments:
+            # Concurrent identical requests share one upstream fetch
+            upstream_flights.do(
+                ("history", symbol, start_date, max_age_hours),
+                self._refresh_history, symbol, start_date, max_age_hours
+            )
+            meta, series = self._load_series(symbol, max_age_hours)
+        
+        return slice_bars(series, start_date)
+    
+    def _load_series(self, symbol: str, max_age_hours: float) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Return a symbol's bar meta and full stored series, from RAM while it is fresh enough"""
+        entry = memory_tier.get(("bars", symbol), calendar_for_symbol(symbol).max_age_seconds(max_age_hours * 3600))
+        if entry is not None:
+            return entry['meta'], entry['bars']
+        
+        meta = self.bar_store.get_meta(symbol)
+        if not (meta and meta['last_date']):
+            return None, None
+        bars = self.bar_store.read_bars(symbol)
+        memory_tier.set(("bars", symbol), {"meta": meta, "bars": bars}, stored_at=meta['fetched_at'])
+        return meta, bars
+    
+    def _refresh_history(self, symbol: str, start_date: str, max_age_hours: float):
+        """Download whatever a symbol's window is missing into the bar store"""
+        # Re-plan from SQLite: a previous flight or another worker may already have filled the gap
+        meta = self.bar_store.get_meta(symbol)
+        if not (meta and meta['last_date']):
+            meta = None
+        segments = self._plan_history_segments(symbol, meta, start_date, max_age_hours)
+        
+        fetched = 0
+        for segment_start, segment_end in segments:
+            result = self._fetch_history(symbol, segment_start, segment_end)
+            if result is None:
+                continue
+            bars, source = result
+            if not bars['dates']:
+                if segment_end is not None and meta:
+                    # Nothing before the stored bars (listed later, e.g. an IPO): never ask for this range again
+                    self.bar_store.mark_covered(symbol, segment_start)
+                    memory_tier.delete(("bars", symbol))
+                    fetched += 1
+                continue
+            self._store_history_segment(symbol, meta, bars, source, segment_start, segment_end)
+            fetched += 1
+        
+        if fetched < len(segments):
+            if not meta:
+                raise ValueError(f"Unable to fetch historical data for {symbol}")
+            print(f"Refresh failed for {symbol}, serving stored bars up to {meta['last_date']}")
+    
+    def get_historical_batch(self, symbols: List[str], days: int = 90, max_age_hours: float = 24) -> Dict[str, Dict[str, Any]]:
+        """
+        Get historical data for many symbols with grouped upstream calls
+        
+        Symbols that need the same date range are downloaded together in one
+        yfinance multi-ticker request and written to the bar store in a
+        single commit. Anything the batch download misses falls back to
+        get_historical_data one symbol at a time.
         
-        raise ValueError(f"Unable to fetch historical data for {symbol}")
+        Returns:
+            Dict of symbol -> history (same shape as get_historical_data);
+            symbols that could not be fetched at all are left out
+        """
+        start_date = (self.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        plans = {}
+        groups: Dict[Tuple[str, Optional[str]], List[str]] = {}
+        for symbol in dict.fromkeys(symbols):
+            meta, _ = self._load_series(symbol, max_age_hours)
+            plans[symbol] = meta
+            segments = self._plan_history_segments(symbol, meta, start_date, max_age_hours)
+            cache_maintenance.record("bars", symbol, hit=not segments)
+            for segment in segments:
+                groups.setdefault(segment, []).append(symbol)
+        
+        failed = set()
+        for (segment_start, segment_end), group in groups.items():
+            downloaded = self._call_provider(
+                "yfinance", "history_batch", self._fetch_history_batch_yfinance, group, segment_start, segment_end
+            ) or {}
+            
+            with self.db.transaction():
+                for symbol, bars in downloaded.items():
+                    meta = plans[symbol]
+                    self._store_history_segment(symbol, meta, bars, "yfinance", segment_start, segment_end)
+            failed.update(symbol for symbol in group if symbol not in downloaded)
+        
+        results = {}
+        for symbol in plans:
+            try:
+                if symbol in failed:
+                    results[symbol] = self.get_historical_data(symbol, days, max_age_hours)
+                else:
+                    _, series = self._load_series(symbol, max_age_hours)
+                    results[symbol] = slice_bars(series, start_date)
+            except Exception as e:
+                print(f"Historical data unavailable for {symbol}: {e}")
+        return results
+    
+    def _plan_history_segments(self, symbol: str, meta: Optional[Dict[str, Any]], start_date: str, max_age_hours: float) -> List[Tuple[str, Optional[str]]]:
+        """Work out which [start, end) date ranges are missing for a symbol's window"""
+        if not meta:
+            return [(start_date, None)]
+        
+        segments = []
+        if start_date < meta['covered_from']:
+            segments.append((start_date, meta['covered_from']))
+        # Bars fetched after the last close stay current until the next session
+        max_age_seconds = calendar_for_symbol(symbol).max_age_seconds(max_age_hours * 3600)
+        if time.time() - meta['fetched_at'] >= max_age_seconds:
+            # Re-request the last stored bar too, it may have been a partial session
+            segments.append((meta['last_date'], None))
+        return segments
+    
+    def _store_history_segment(self, symbol: str, meta: Optional[Dict[str, Any]], bars: Dict[str, Any], source: str, segment_start: str, segment_end: Optional[str]):
+        """Write a downloaded segment to the bar store"""
+        if segment_end is None or not meta:
+            fetched_at = time.time()
+        else:
+            # Backfilling older bars does not make the latest bars any fresher
+            fetched_at = meta['fetched_at']
+        self.bar_store.write_bars(symbol, bars, source, segment_start, fetched_at)
+        memory_tier.delete(("bars", symbol))
+    
+    def _fetch_history(self, symbol: str, start_date: str, end_date: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Fetch bars in [start_date, end_date) from the first provider that has them
+        
+        Returns (bars, provider); the bars have no rows when providers answered
+        but had nothing in the range, and the result is None when none answered.
+        """
+        # yfinance first for historical data (more reliable), unless it is failing
+        fetchers = {
+            "yfinance": self._fetch_history_yfinance,
+            "alphavantage": self._fetch_history_alphavantage
+        }
+        answered = None
+        for provider in providers.order(HISTORY_PROVIDERS, "history"):
+            bars = self._call_provider(provider, "history", fetchers[provider], symbol, start_date, end_date)
+            if bars is None:
+                continue
+            if len(bars['dates']):
+                return bars, provider
+            answered = answered or (bars, provider)
+        
+        return answered
+    
+    def _fetch_history_yfinance(self, symbol: str, start_date: str, end_date: Optional[str] = None) -> Dict[str, Any]:
+        """Download daily bars in [start_date, end_date) via yfinance (end defaults to now; no rows if none)"""
+        ticker = market_yf.Ticker(symbol)
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else self.now()
+        hist = ticker.history(start=datetime.strptime(start_date, "%Y-%m-%d"), end=end)
+        
+        if len(hist) == 0:
+            return empty_bars(symbol)
+        return self._history_frame_to_bars(hist)
+    
+    def _fetch_history_batch_yfinance(self, symbols: List[str], start_date: str, end_date: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Download daily bars for several symbols in one yfinance request"""
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else self.now()
+        data = market_yf.download(
+            symbols,
+            start=datetime.strptime(start_date, "%Y-%m-%d"),
+            end=end,
+            group_by="ticker",
+            auto_adjust=True,
+            threads=True,
+            progress=False
+        )
+        if data is None or len(data) == 0:
+            return {}
+        
+        results = {}
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                hist = data[symbol]
+            else:
+                hist = data
+            # The combined index spans every ticker's sessions, so drop the rows
+            # belonging to other exchanges' trading days
+            hist = hist.dropna(subset=['Close'])
+            if len(hist) > 0:
+                results[symbol] = self._history_frame_to_bars(hist)
+        return results
+    
+    def _fetch_history_alphavantage(self, symbol: str, start_date: str, end_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Download daily bars in [start_date, end_date) via Alpha Vantage (None for unknown symbols)"""
+        # 'compact' returns the latest 100 trading days, enough for any recent gap
+        gap_days = (self.now() - datetime.strptime(start_date, "%Y-%m-%d")).days
+        params = {
+            "function": "TIME_SERIES_DAILY",
+            "symbol": symbol,
+            "outputsize": "compact" if gap_days <= 100 else "full",
+            "apikey": self.alpha_vantage_key
+        }
+        response = market_http.get(ALPHA_VANTAGE_URL, params=params, timeout=request_timeout())
+        data = response.json()
+        self._check_alphavantage_response(data)
+        
+        if "Time Series (Daily)" not in data:
+            return None
+        
+        time_series = data["Time Series (Daily)"]
+        end_date = end_date or "9999-12-31"
+        dates = sorted(d for d in time_series.keys() if start_date <= d < end_date)
+        if not dates:
+            return empty_bars(symbol)
+        
+        return {
+            "dates": dates,
+            "open": [float(time_series[d]["1. open"]) for d in dates],
+            "high": [float(time_series[d]["2. high"]) for d in dates],
+            "low": [float(time_series[d]["3. low"]) for d in dates],
+            "close": [float(time_series[d]["4. close"]) for d in dates],
+            "volume": [int(time_series[d]["5. volume"]) for d in dates]
+        }
+    
+    def get_intraday_bars(self, symbol: str, interval: str = "5m", days: float = 1) -> Dict[str, Any]:
+        """
+        Get intraday bars for the last `days` days
+        
+        Returns epoch-second 'timestamps' (UTC) and each OHLCV field as a
+        float64 NumPy array, plus 'source_interval', the stored interval the
+        bars were built from. Only INTRADAY_RETENTION_DAYS intervals are
+        downloaded; coarser ones (15m, 30m, 1h...) are rolled up from them,
+        and the window is clamped to the source interval's retention.
+        """
+        if interval not in INTERVAL_SECONDS:
+            raise ValueError(f"Unsupported interval '{interval}', expected one of {', '.join(INTERVAL_SECONDS)}")
+        source = intraday_store.source_interval(interval, days)
+        if source is None:
+            raise ValueError(f"Interval '{interval}' cannot be built from the stored intervals {intraday_store.stored_intervals()}")
+        days = min(days, intraday_store.retention_days[source])
+        start_ts = int(self.now().timestamp() - days * 86400)
+        
+        meta = intraday_store.get_meta(symbol, source)
+        fresh = self._intraday_covers(symbol, meta, start_ts)
+        cache_maintenance.record("intraday", f"{symbol}|{source}", hit=fresh)
+        if not fresh:
+            upstream_flights.do(("intraday", symbol, source), self._refresh_intraday, symbol, source, start_ts)
+        
+        bars = intraday_store.read_bars(symbol, source, start_ts)
+        if source != interval:
+            bars = rollup(bars, interval)
+        bars["source_interval"] = source
+        return bars
+    
+    def _intraday_covers(self, symbol: str, meta: Optional[Dict[str, Any]], start_ts: int) -> bool:
+        """Whether stored intraday bars reach back to start_ts and are recent enough"""
+        max_age_seconds = calendar_for_symbol(symbol).max_age_seconds(settings.INTRADAY_MAX_AGE_SECONDS)
+        return bool(
+            meta
+            and meta['covered_from'] <= start_ts
+            and time.time() - meta['fetched_at'] < max_age_seconds
+        )
+    
+    def _refresh_intraday(self, symbol: str, interval: str, start_ts: int):
+        """Download a symbol's missing intraday bars into the intraday store"""
+        # Re-check: a previous flight or another worker may already have fetched them
+        meta = intraday_store.get_meta(symbol, interval)
+        if self._intraday_covers(symbol, meta, start_ts):
+            return
+        if meta and meta['covered_from'] <= start_ts and meta['last_ts'] is not None:
+            # Only the tail is missing; re-request the last bar too, it may have been partial
+            fetch_from = meta['last_ts']
+        else:
+            fetch_from = start_ts
+        
+        bars = self._call_provider("yfinance", "intraday", self._fetch_intraday_yfinance, symbol, interval, fetch_from)
+        if bars is None:
+            if not meta:
+                raise ValueError(f"Unable to fetch {interval} bars for {symbol}")
+            print(f"Intraday refresh failed for {symbol}, serving stored {interval} bars")
+            return
+        intraday_store.write_bars(symbol, interval, bars, min(fetch_from, start_ts), time.time())
+    
+    def _fetch_intraday_yfinance(self, symbol: str, interval: str, start_ts: int) -> Dict[str, Any]:
+        """Download intraday bars from start_ts (epoch seconds) to now via yfinance"""
+        ticker = market_yf.Ticker(symbol)
+        start = pd.Timestamp(start_ts, unit="s", tz="UTC")
+        hist = ticker.history(start=start, interval=interval)
+        
+        # An empty answer is normal outside market hours
+        if len(hist) == 0:
+            return empty_intraday(symbol, interval)
+        hist = hist.dropna(subset=['Close'])
+        index = hist.index.tz_convert("UTC") if hist.index.tz is not None else hist.index.tz_localize("UTC")
+        return {
+            "symbol": symbol,
+            "interval": interval,
+            "timestamps": ((index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64),
+            "open": hist['Open'].to_numpy(dtype=np.float64),
+            "high": hist['High'].to_numpy(dtype=np.float64),
+            "low": hist['Low'].to_numpy(dtype=np.float64),
+            "close": hist['Close'].to_numpy(dtype=np.float64),
+            "volume": hist['Volume'].to_numpy(dtype=np.float64)
+        }
+    
+    def _history_frame_to_bars(self, hist) -> Dict[str, Any]:
+        """Convert a yfinance history DataFrame into bar store columns"""
+        return {
+            "dates": hist.index.strftime("%Y-%m-%d").tolist(),
+            "open": hist['Open'].to_numpy(dtype=np.float64),
+            "high": hist['High'].to_numpy(dtype=np.float64),
+            "low": hist['Low'].to_numpy(dtype=np.float64),
+            "close": hist['Close'].to_numpy(dtype=np.float64),
+            "volume": hist['Volume'].to_numpy(dtype=np.float64)
+        }
@@ -0,0 +1,94 @@
+"""
+Shared HTTP Clients
+Keep-alive connection pools for Alpha Vantage and NewsAPI, sync and async
+"""
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import settings
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide requests.Session reusing TCP/TLS connections across calls"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=settings.HTTP_MAX_HOSTS,
+                pool_maxsize=settings.HTTP_CONNECTIONS_PER_HOST
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def request_timeout() -> Tuple[float, float]:
+    """(connect, read) timeout for requests calls"""
+    return settings.HTTP_CONNECT_TIMEOUT_SECONDS, settings.HTTP_TIMEOUT_SECONDS
+
+
+class AsyncHTTPClient:
+    """aiohttp session with per-host connection limits, created on first use inside the event loop"""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Return the pooled session for the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                await self._close_session(self._session, self._loop)
+            connector = aiohttp.TCPConnector(
+                limit=settings.HTTP_MAX_CONNECTIONS,
+                limit_per_host=settings.HTTP_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=300
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=settings.HTTP_TIMEOUT_SECONDS,
+                connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._loop = loop
+        return self._session
+
+    async def get_json(self, url: str, params: Dict[str, Any]) -> Tuple[int, Any]:
+        """
+        GET a URL and decode the JSON body
+
+        Returns:
+            (status code, decoded body)
+        """
+        session = await self.session()
+        async with session.get(url, params=params) as response:
+            return response.status, await response.json(content_type=None)
+
+    async def _close_session(self, session: aiohttp.ClientSession, loop: asyncio.AbstractEventLoop):
+        """Close a session left behind by another event loop"""
+        if loop is not None and loop.is_running() and loop is not asyncio.get_running_loop():
+            # Its connections belong to that loop, so close them there
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+        else:
+            # The loop is gone: release the connector here, its sockets went with the loop
+            await session.close()
+
+    async def close(self):
+        """Close pooled connections (called on app shutdown)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+async_http = AsyncHTTPClient()
@@ -0,0 +1,309 @@
+"""
+Streaming Indicator State
+Rolling SMA-5 / SMA-10 / RSI-14 per symbol, updated in constant time per bar or tick
+
+Instead of recomputing the model's features from the close series on every
+prediction, each symbol keeps running window sums of its last closes and of
+its last RSI_PERIOD gains and losses, plus those few values themselves so
+the oldest one can be subtracted when a new bar arrives. A bar with the
+same date as the last one replaces it (the forming bar of a running
+session); a live tick can be previewed without touching the stored state.
+
+The results follow indicators.sma / indicators.rsi on the full series,
+including their short-history rules (windows hold fewer values until they
+fill, the first bar counts as a zero change). verify() compares the state
+with a full recompute; sums are re-added from the buffers every
+RESUM_EVERY updates so floating-point drift cannot build up.
+
+States are kept in the memory tier and in cache.db. When the history no
+longer contains the closes a state was built from (a split or dividend
+back-adjusted the series), the state is rebuilt from the bars.
+"""
+import json
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+import indicators
+from cache_db import CacheDatabase
+from cache_maintenance import CacheNamespace
+
+SMA_WINDOWS = (5, 10)
+RSI_PERIOD = 14
+# Updates between re-adding the window sums from their buffers
+RESUM_EVERY = 512
+
+CREATE_INDICATOR_STATE_SQL = """
+    CREATE TABLE IF NOT EXISTS indicator_state (
+        symbol TEXT PRIMARY KEY,
+        last_date TEXT NOT NULL,
+        state TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+"""
+SELECT_INDICATOR_STATE_SQL = "SELECT state FROM indicator_state WHERE symbol = ?"
+UPSERT_INDICATOR_STATE_SQL = """
+    INSERT OR REPLACE INTO indicator_state (symbol, last_date, state, updated_at) VALUES (?, ?, ?, ?)
+"""
+DELETE_INDICATOR_STATE_SQL = "DELETE FROM indicator_state WHERE symbol = ?"
+
+
+def _change(previous: Optional[float], close: float):
+    """(gain, loss) of a bar; the first bar of a series counts as no change"""
+    delta = 0.0 if previous is None else close - previous
+    return max(delta, 0.0), max(-delta, 0.0)
+
+
+class IndicatorState:
+    """Rolling feature state of one symbol"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.last_date: Optional[str] = None
+        self.bars = 0
+        self.closes = deque(maxlen=max(SMA_WINDOWS))
+        self.gains = deque(maxlen=RSI_PERIOD)
+        self.losses = deque(maxlen=RSI_PERIOD)
+        self.sma_sums = {window: 0.0 for window in SMA_WINDOWS}
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.updates = 0
+
+    def _push_change(self, gain: float, loss: float):
+        if len(self.gains) == RSI_PERIOD:
+            self.gain_sum -= self.gains[0]
+            self.loss_sum -= self.losses[0]
+        self.gains.append(gain)
+        self.losses.append(loss)
+        self.gain_sum += gain
+        self.loss_sum += loss
+
+    def append(self, date: str, close: float):
+        """A new bar"""
+        close = float(close)
+        self._push_change(*_change(self.closes[-1] if self.closes else None, close))
+        for window in SMA_WINDOWS:
+            if len(self.closes) >= window:
+                self.sma_sums[window] -= self.closes[-window]
+            self.sma_sums[window] += close
+        self.closes.append(close)
+        self.bars += 1
+        self.last_date = date
+        self._counted()
+
+    def replace_last(self, close: float):
+        """The last bar's close changed (a session still in progress)"""
+        close = float(close)
+        previous = self.closes[-2] if len(self.closes) > 1 else None
+        gain, loss = _change(previous, close)
+        self.gain_sum += gain - self.gains[-1]
+        self.loss_sum += loss - self.losses[-1]
+        self.gains[-1] = gain
+        self.losses[-1] = loss
+        for window in SMA_WINDOWS:
+            self.sma_sums[window] += close - self.closes[-1]
+        self.closes[-1] = close
+        self._counted()
+
+    def update(self, date: str, close: float):
+        """Apply a bar or tick: same date as the last bar replaces it, a later one is appended"""
+        if self.last_date is None or date > self.last_date:
+            self.append(date, close)
+        elif date == self.last_date:
+            self.replace_last(close)
+        else:
+            raise ValueError(f"{self.symbol}: bar {date} is older than the state's last bar {self.last_date}")
+
+    def _counted(self):
+        self.updates += 1
+        if self.updates % RESUM_EVERY == 0:
+            self.resum()
+
+    def resum(self):
+        """Re-add the window sums from the buffered values"""
+        closes = list(self.closes)
+        for window in SMA_WINDOWS:
+            self.sma_sums[window] = float(sum(closes[-window:]))
+        self.gain_sum = float(sum(self.gains))
+        self.loss_sum = float(sum(self.losses))
+
+    def features(self) -> Dict[str, Any]:
+        """close, sma_5, sma_10 and rsi_14 of the last bar"""
+        if not self.bars:
+            raise ValueError(f"No bars in the indicator state of {self.symbol}")
+        result = {"close": self.closes[-1]}
+        for window in SMA_WINDOWS:
+            result[f"sma_{window}"] = self.sma_sums[window] / min(self.bars, window)
+        # Running sums can end up a hair off zero; a window without losses must still read 100
+        gain = max(self.gain_sum, 0.0) if any(self.gains) else 0.0
+        loss = max(self.loss_sum, 0.0) if any(self.losses) else 0.0
+        if loss == 0:
+            result[f"rsi_{RSI_PERIOD}"] = 100.0 if gain > 0 else 50.0
+        else:
+            result[f"rsi_{RSI_PERIOD}"] = 100.0 - 100.0 / (1.0 + gain / loss)
+        return result
+
+    def preview(self, date: str, close: float) -> Dict[str, Any]:
+        """Features as if a live tick at `close` were applied, leaving the state unchanged"""
+        if self.last_date is not None and date < self.last_date:
+            return self.features()
+        state = self.copy()
+        state.update(date, close)
+        return state.features()
+
+    def copy(self) -> "IndicatorState":
+        return IndicatorState.from_dict(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "symbol": self.symbol,
+            "last_date": self.last_date,
+            "bars": self.bars,
+            "closes": list(self.closes),
+            "gains": list(self.gains),
+            "losses": list(self.losses),
+            "sma_sums": {str(window): total for window, total in self.sma_sums.items()},
+            "gain_sum": self.gain_sum,
+            "loss_sum": self.loss_sum,
+            "updates": self.updates
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndicatorState":
+        state = cls(data["symbol"])
+        state.last_date = data["last_date"]
+        state.bars = data["bars"]
+        state.closes.extend(data["closes"])
+        state.gains.extend(data["gains"])
+        state.losses.extend(data["losses"])
+        state.sma_sums = {window: float(data["sma_sums"][str(window)]) for window in SMA_WINDOWS}
+        state.gain_sum = data["gain_sum"]
+        state.loss_sum = data["loss_sum"]
+        state.updates = data["updates"]
+        return state
+
+    @classmethod
+    def from_bars(cls, symbol: str, dates, closes) -> "IndicatorState":
+        """
+        Build the state of a series from its last RSI_PERIOD + 1 bars
+
+        Older bars no longer affect any window. The first replayed bar's
+        change is a placeholder that the following RSI_PERIOD bars push out.
+        """
+        state = cls(symbol)
+        start = max(0, len(closes) - (RSI_PERIOD + 1))
+        for date, close in zip(dates[start:], closes[start:]):
+            state.append(date, close)
+        state.bars = len(closes)
+        state.updates = 0
+        return state
+
+    def matches(self, dates, closes) -> bool:
+        """Whether the buffered closes are still the series' closes up to last_date"""
+        end = bisect_right(dates, self.last_date)
+        if end == 0 or dates[end - 1] != self.last_date:
+            return False
+        buffered = list(self.closes)[:-1]
+        if end - 1 < len(buffered):
+            # Series shorter than the buffers: only a state built from this series fits
+            return self.bars == end and list(closes[:end - 1]) == buffered
+        return list(closes[end - 1 - len(buffered):end - 1]) == buffered
+
+    def verify(self, closes, tolerance: float = 1e-9) -> Dict[str, float]:
+        """
+        Differences between the state and a full recompute over `closes`
+
+        Returns the features whose absolute difference exceeds `tolerance`
+        (empty when the state is consistent).
+        """
+        closes = np.ascontiguousarray(closes, dtype=np.float64)
+        expected = {"close": closes[-1]}
+        for window in SMA_WINDOWS:
+            expected[f"sma_{window}"] = indicators.sma(closes, window)[-1]
+        expected[f"rsi_{RSI_PERIOD}"] = indicators.rsi(closes, RSI_PERIOD)[-1]
+        actual = self.features()
+        return {
+            name: float(actual[name] - value)
+            for name, value in expected.items()
+            if not abs(actual[name] - value) <= tolerance * max(1.0, abs(value))
+        }
+
+
+class IndicatorStateStore:
+    """Indicator states of all symbols, in the memory tier and cache.db"""
+
+    def __init__(self, db: CacheDatabase, memory=None):
+        self.db = db
+        self.memory = memory
+        self.db.execute(CREATE_INDICATOR_STATE_SQL)
+        self.appended = 0
+        self.rebuilt = 0
+
+    def get(self, symbol: str) -> Optional[IndicatorState]:
+        """The stored state (a copy the caller may update), None if there is none"""
+        data = self.memory.get(("indicator_state", symbol)) if self.memory is not None else None
+        if data is None:
+            row = self.db.fetchone(SELECT_INDICATOR_STATE_SQL, (symbol,))
+            if not row:
+                return None
+            data = json.loads(row[0])
+            if self.memory is not None:
+                self.memory.set(("indicator_state", symbol), data)
+        return IndicatorState.from_dict(data)
+
+    def save(self, state: IndicatorState):
+        data = state.to_dict()
+        self.db.execute(UPSERT_INDICATOR_STATE_SQL, (state.symbol, state.last_date, json.dumps(data), time.time()))
+        if self.memory is not None:
+            self.memory.set(("indicator_state", state.symbol), data)
+
+    def rebuild(self, symbol: str, history: Dict[str, Any]) -> IndicatorState:
+        """Replace a symbol's state with one built from its bars"""
+        state = IndicatorState.from_bars(symbol, list(history['dates']), history['close'])
+        self.save(state)
+        self.rebuilt += 1
+        return state
+
+    def sync(self, symbol: str, history: Dict[str, Any]) -> IndicatorState:
+        """
+        The symbol's state advanced to the last bar of `history`
+
+        Only bars after the state's last one are applied (the last bar itself
+        is re-applied in case it was still forming), so a hot symbol costs a
+        comparison of a few closes. Rebuilds when the state is missing or the
+        history was revised.
+        """
+        dates = list(history['dates'])
+        closes = history['close']
+        if not dates:
+            raise ValueError(f"No bars to build the indicator state of {symbol}")
+        state = self.get(symbol)
+        if state is None or not state.matches(dates, closes):
+            return self.rebuild(symbol, history)
+
+        start = dates.index(state.last_date)
+        if start == len(dates) - 1 and closes[start] == state.closes[-1]:
+            return state
+        for date, close in zip(dates[start:], closes[start:]):
+            state.update(date, close)
+            self.appended += 1
+        self.save(state)
+        return state
+
+    def invalidate(self, symbol: str):
+        self.db.execute(DELETE_INDICATOR_STATE_SQL, (symbol,))
+        if self.memory is not None:
+            self.memory.delete(("indicator_state", symbol))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"updates": self.appended, "rebuilds": self.rebuilt}
+
+    def cache_namespace(self) -> CacheNamespace:
+        return CacheNamespace(
+            "indicator_state",
+            entries_sql="SELECT symbol, length(state) + 48, updated_at FROM indicator_state",
+            delete_sqls=[DELETE_INDICATOR_STATE_SQL]
+        )
@@ -0,0 +1,213 @@
+"""
+Technical Indicators
+Vectorized SMA, EMA, RSI, MACD, Bollinger bands and ATR on float64 arrays
+
+Every function takes a 1-D series or a 2-D (symbols x time) panel and works
+along the last axis, returning float64 arrays of the same shape. Rows of a
+panel can hold series of different lengths by left-padding them with NaN:
+padding comes back as NaN and each row equals the result for its unpadded
+series. sma and rsi skip NaNs inside a series like pandas does; the
+exponential indicators expect none after a row's first value.
+
+The definitions are the pandas expressions the models were trained with:
+
+    sma              Series.rolling(window, min_periods=1).mean()
+    rsi              ModelTrainer's rolling-mean RSI (first delta counts as 0, NaN -> 50)
+    ema              Series.ewm(span=span, adjust=False).mean()
+    bollinger_bands  rolling(window).mean() -/+ num_std * rolling(window).std()
+    atr              true range .ewm(alpha=1 / period, adjust=False).mean() (Wilder)
+
+Results are not bit-identical to the pandas features the saved models were
+trained on: pandas keeps compensated running sums, these use prefix sums
+and a blocked EMA recursion, so values differ in the last few digits
+(the tests hold them to 1e-10). That is far below anything a model can
+resolve, but a retrained model will not reproduce old coefficients bit for
+bit either.
+
+Only NumPy is needed.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Longest stretch of the EMA recursion evaluated as one cumulative sum
+EMA_BLOCK = 256
+
+
+def _as_array(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    """Index of each row's first non-NaN value (the row length if there is none)"""
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=-1), valid.argmax(axis=-1), x.shape[-1])
+
+
+def _first_value(x: np.ndarray) -> np.ndarray:
+    """Each row's first non-NaN value, shaped to broadcast against the rows"""
+    if x.shape[-1] == 0:
+        return np.zeros(x.shape[:-1] + (1,))
+    first = np.minimum(_first_valid(x), x.shape[-1] - 1)
+    return np.take_along_axis(x, first[..., None], axis=-1)
+
+
+def _padding(x: np.ndarray) -> np.ndarray:
+    """Mask of the leading NaNs of each row"""
+    if x.shape[-1] == 0:
+        return np.zeros(x.shape, dtype=bool)
+    return np.arange(x.shape[-1]) < _first_valid(x)[..., None]
+
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    total = np.cumsum(x, axis=-1)
+    if window < x.shape[-1]:
+        total[..., window:] -= total[..., :-window].copy()
+    return total
+
+
+def _rolling_sum_and_count(x: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Rolling sums skipping NaNs, and how many values each window holds"""
+    valid = ~np.isnan(x)
+    if valid.all():
+        # No gaps: the count is just the window filling up
+        return _rolling_sum(x, window), np.minimum(np.arange(1.0, x.shape[-1] + 1), window)
+    return _rolling_sum(np.where(valid, x, 0.0), window), _rolling_sum(valid.astype(np.float64), window)
+
+
+def sma(values, window: int, min_periods: int = 1) -> np.ndarray:
+    """Simple moving average over the last `window` values (NaNs skipped)"""
+    x = _as_array(values)
+    # Prefix sums of the distance to each row's first value: flat series stay exact and long ones drift less
+    reference = _first_value(x)
+    total, count = _rolling_sum_and_count(x - reference, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count >= max(min_periods, 1), total / count + reference, np.nan)
+
+
+def _ema_recursion(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    y[t] = (1 - alpha) * y[t - 1] + alpha * x[t] along the last axis, with y[0] = x[0]
+
+    Within a block the recursion unrolls to a cumulative sum of x scaled by
+    (1 - alpha) ** -k; blocks are short enough that the scale cannot
+    overflow and rounding does not build up, and each block starts from the
+    last value of the previous one.
+    """
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        return x.copy()
+    n = x.shape[-1]
+    block = int(max(1, min(EMA_BLOCK, 500.0 / -np.log(decay))))
+    steps = np.arange(block)
+    growth = decay ** -steps
+    shrink = decay ** steps
+    result = np.empty_like(x)
+    previous = x[..., :1]
+    for start in range(0, n, block):
+        chunk = x[..., start:start + block]
+        m = chunk.shape[-1]
+        sums = np.cumsum(chunk * growth[:m], axis=-1)
+        part = result[..., start:start + m]
+        np.multiply(sums, alpha * shrink[:m], out=part)
+        part += previous * (decay * shrink[:m])
+        previous = part[..., -1:]
+    return result
+
+
+def ema(values, span: Optional[float] = None, alpha: Optional[float] = None) -> np.ndarray:
+    """Exponential moving average seeded with the first value (pandas adjust=False)"""
+    if alpha is None:
+        if span is None:
+            raise ValueError("ema needs span or alpha")
+        alpha = 2.0 / (span + 1.0)
+    x = _as_array(values)
+    if x.shape[-1] == 0:
+        return x.copy()
+    padding = _padding(x)
+    # Padding is filled with the first value, which leaves the recursion at exactly that value
+    result = _ema_recursion(np.where(padding, _first_value(x), x), alpha)
+    result[padding] = np.nan
+    return result
+
+
+def rsi(values, period: int = 14) -> np.ndarray:
+    """Relative Strength Index from simple rolling means of gains and losses"""
+    x = _as_array(values)
+    padding = _padding(x)
+    delta = np.diff(x, axis=-1, prepend=np.nan)
+    # Like Series.where, a NaN delta (the first one) counts as no gain and no loss
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain[padding] = np.nan
+    loss[padding] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = 100.0 - 100.0 / (1.0 + sma(gain, period) / sma(loss, period))
+    result = np.where(np.isnan(result), 50.0, result)
+    result[padding] = np.nan
+    return result
+
+
+def macd(values, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(MACD line, signal line, histogram)"""
+    x = _as_array(values)
+    line = ema(x, span=fast) - ema(x, span=slow)
+    signal_line = ema(line, span=signal)
+    return line, signal_line, line - signal_line
+
+
+def rolling_std(values, window: int, min_periods: Optional[int] = None, ddof: int = 1) -> np.ndarray:
+    """
+    Rolling standard deviation (pandas rolling(window).std() by default)
+
+    Squared deviations from the window mean are summed one window offset
+    at a time: `window` whole-array passes, but no catastrophic cancellation
+    for flat or high-priced series, unlike a sum-of-squares formula.
+    """
+    x = _as_array(values)
+    min_periods = window if min_periods is None else min_periods
+    n = x.shape[-1]
+    valid = ~np.isnan(x)
+    has_gaps = not valid.all()
+    filled = np.where(valid, x, 0.0) if has_gaps else x
+    weight = valid.astype(np.float64)
+    mean = sma(x, window, min_periods=1)
+    count = _rolling_sum(weight, window) if has_gaps else np.minimum(np.arange(1.0, n + 1), window)
+    squares = np.zeros_like(x)
+    deviation = np.empty_like(x)
+    for offset in range(min(window, n)):
+        part = deviation[..., offset:]
+        np.subtract(filled[..., :n - offset], mean[..., offset:], out=part)
+        np.multiply(part, part, out=part)
+        if has_gaps:
+            part *= weight[..., :n - offset]
+        squares[..., offset:] += part
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = squares / (count - ddof)
+    return np.where((count >= max(min_periods, 1)) & (count > ddof), np.sqrt(variance), np.nan)
+
+
+def bollinger_bands(
+    values,
+    window: int = 20,
+    num_std: float = 2.0,
+    min_periods: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(middle, upper, lower) bands; NaN until a full window by default, like pandas"""
+    x = _as_array(values)
+    min_periods = window if min_periods is None else min_periods
+    middle = sma(x, window, min_periods)
+    width = num_std * rolling_std(x, window, min_periods)
+    return middle, middle + width, middle - width
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """max(high - low, |high - previous close|, |low - previous close|); high - low on the first bar"""
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    previous_close = np.concatenate([np.full(close.shape[:-1] + (1,), np.nan), close[..., :-1]], axis=-1)
+    return np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """Average True Range with Wilder's smoothing"""
+    return ema(true_range(high, low, close), alpha=1.0 / period)
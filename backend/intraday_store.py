@@ -0,0 +1,219 @@
+"""
+Intraday Bar Store
+1m/5m bars kept per (symbol, interval) with retention, rolled up to coarser intervals on read
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bar_store import BAR_FIELDS
+from cache_db import CacheDatabase
+from cache_maintenance import CacheNamespace
+from market_calendar import ExchangeCalendar, calendar_for_symbol
+
+INTERVAL_SECONDS = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400, "1h": 3600}
+
+CREATE_INTRADAY_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS intraday_bars (
+        symbol TEXT NOT NULL,
+        interval TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        volume REAL,
+        PRIMARY KEY (symbol, interval, ts)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS intraday_bars_age ON intraday_bars (interval, ts);
+    CREATE TABLE IF NOT EXISTS intraday_meta (
+        symbol TEXT NOT NULL,
+        interval TEXT NOT NULL,
+        covered_from INTEGER,
+        last_ts INTEGER,
+        fetched_at REAL,
+        PRIMARY KEY (symbol, interval)
+    );
+"""
+UPSERT_INTRADAY_SQL = """
+    INSERT OR REPLACE INTO intraday_bars (symbol, interval, ts, open, high, low, close, volume)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+UPSERT_INTRADAY_META_SQL = """
+    INSERT OR REPLACE INTO intraday_meta (symbol, interval, covered_from, last_ts, fetched_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
+SELECT_INTRADAY_META_SQL = "SELECT covered_from, last_ts, fetched_at FROM intraday_meta WHERE symbol = ? AND interval = ?"
+SELECT_INTRADAY_SQL = """
+    SELECT ts, open, high, low, close, volume FROM intraday_bars
+    WHERE symbol = ? AND interval = ? AND ts >= ?
+    ORDER BY ts
+"""
+
+
+def empty_intraday(symbol: str, interval: str) -> Dict[str, Any]:
+    result = {"symbol": symbol, "interval": interval, "timestamps": np.empty(0, dtype=np.int64)}
+    for field in BAR_FIELDS:
+        result[field] = np.empty(0, dtype=np.float64)
+    return result
+
+
+def _session_opens(ts: np.ndarray, calendar: ExchangeCalendar) -> np.ndarray:
+    """Epoch second of the exchange's regular open on each row's trading day"""
+    # Sessions never cross a UTC midnight for the exchanges we serve
+    day = ts // 86400
+    _, day_start_index, day_of_row = np.unique(day, return_index=True, return_inverse=True)
+    opens = np.array([
+        int(calendar.session_open(datetime.fromtimestamp(int(first), calendar.timezone).date()).timestamp())
+        for first in ts[day_start_index]
+    ], dtype=np.int64)
+    return opens[day_of_row.ravel()]
+
+
+def rollup(bars: Dict[str, Any], interval: str, calendar: Optional[ExchangeCalendar] = None) -> Dict[str, Any]:
+    """
+    Aggregate finer bars into `interval` bars (vectorized)
+
+    Buckets are anchored at the exchange's session open from market_calendar
+    (09:15 IST, 09:30 ET) rather than the clock hour or the first stored
+    bar, so the result does not depend on where the retained data starts.
+    Partial buckets at the end of a session are kept.
+    """
+    seconds = INTERVAL_SECONDS[interval]
+    ts = bars["timestamps"]
+    if ts.size == 0:
+        return empty_intraday(bars["symbol"], interval)
+
+    session_open = _session_opens(ts, calendar or calendar_for_symbol(bars["symbol"]))
+    bucket = session_open + (ts - session_open) // seconds * seconds
+
+    result = {"symbol": bars["symbol"], "interval": interval}
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], ts.size] - 1
+    result["timestamps"] = bucket[starts]
+    result["open"] = bars["open"][starts]
+    result["high"] = np.maximum.reduceat(bars["high"], starts)
+    result["low"] = np.minimum.reduceat(bars["low"], starts)
+    result["close"] = bars["close"][ends]
+    result["volume"] = np.add.reduceat(bars["volume"], starts)
+    return result
+
+
+class IntradayStore:
+    """Store, prune and range-read intraday bars"""
+
+    def __init__(self, db: CacheDatabase, retention_days: Dict[str, float]):
+        unknown = set(retention_days) - set(INTERVAL_SECONDS)
+        if unknown:
+            raise ValueError(f"Unknown intraday intervals in retention policy: {sorted(unknown)}")
+        self.db = db
+        self.retention_days = retention_days
+        self.db.executescript(CREATE_INTRADAY_TABLES_SQL)
+
+    def stored_intervals(self) -> List[str]:
+        """Intervals kept on disk, finest first"""
+        return sorted(self.retention_days, key=INTERVAL_SECONDS.get)
+
+    def source_interval(self, interval: str, days: float) -> Optional[str]:
+        """
+        Stored interval to serve `interval` from
+
+        The coarsest stored interval that divides the requested one and is
+        retained long enough wins (least rollup work); failing that, the one
+        retained longest.
+        """
+        seconds = INTERVAL_SECONDS[interval]
+        candidates = [name for name in self.stored_intervals() if seconds % INTERVAL_SECONDS[name] == 0]
+        if not candidates:
+            return None
+        covering = [name for name in candidates if self.retention_days[name] >= days]
+        if covering:
+            return covering[-1]
+        return max(candidates, key=self.retention_days.get)
+
+    def get_meta(self, symbol: str, interval: str) -> Optional[Dict[str, Any]]:
+        row = self.db.fetchone(SELECT_INTRADAY_META_SQL, (symbol, interval))
+        if not row:
+            return None
+        covered_from, last_ts, fetched_at = row
+        return {"covered_from": covered_from, "last_ts": last_ts, "fetched_at": fetched_at}
+
+    def write_bars(self, symbol: str, interval: str, bars: Dict[str, Any], covered_from: int, fetched_at: float):
+        """Upsert bars (epoch-second 'timestamps' plus OHLCV arrays) and widen the covered window"""
+        timestamps = np.asarray(bars["timestamps"], dtype=np.int64)
+        columns = [np.asarray(bars[field], dtype=np.float64).tolist() for field in BAR_FIELDS]
+        rows = zip([symbol] * len(timestamps), [interval] * len(timestamps), timestamps.tolist(), *columns)
+
+        meta = self.get_meta(symbol, interval)
+        last_ts = int(timestamps.max()) if timestamps.size else None
+        if meta:
+            covered_from = min(covered_from, meta["covered_from"])
+            if meta["last_ts"] is not None and (last_ts is None or meta["last_ts"] > last_ts):
+                last_ts = meta["last_ts"]
+
+        with self.db.transaction() as conn:
+            conn.executemany(UPSERT_INTRADAY_SQL, rows)
+            conn.execute(UPSERT_INTRADAY_META_SQL, (symbol, interval, covered_from, last_ts, fetched_at))
+
+    def read_bars(self, symbol: str, interval: str, start_ts: int = 0) -> Dict[str, Any]:
+        """Stored bars from start_ts on, as NumPy arrays"""
+        rows = self.db.fetchall(SELECT_INTRADAY_SQL, (symbol, interval, start_ts))
+        if not rows:
+            return empty_intraday(symbol, interval)
+        values = np.array(rows, dtype=np.float64).T.copy()
+        result = {"symbol": symbol, "interval": interval, "timestamps": values[0].astype(np.int64)}
+        for i, field in enumerate(BAR_FIELDS):
+            result[field] = values[i + 1]
+        return result
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Delete bars older than each interval's retention; returns rows removed"""
+        now = now or time.time()
+        removed = 0
+        with self.db.transaction() as conn:
+            for interval, days in self.retention_days.items():
+                cutoff = int(now - days * 86400)
+                removed += conn.execute(
+                    "DELETE FROM intraday_bars WHERE interval = ? AND ts < ?", (interval, cutoff)
+                ).rowcount
+                conn.execute(
+                    "UPDATE intraday_meta SET covered_from = ? WHERE interval = ? AND covered_from < ?",
+                    (cutoff, interval, cutoff)
+                )
+            # Stored intervals dropped from the policy are removed entirely
+            placeholders = ",".join("?" * len(self.retention_days))
+            removed += conn.execute(
+                f"DELETE FROM intraday_bars WHERE interval NOT IN ({placeholders})", list(self.retention_days)
+            ).rowcount
+            conn.execute(f"DELETE FROM intraday_meta WHERE interval NOT IN ({placeholders})", list(self.retention_days))
+        return removed
+
+    def cache_namespace(self) -> CacheNamespace:
+        return _IntradayNamespace(self)
+
+
+class _IntradayNamespace(CacheNamespace):
+    """Cache maintenance view: one entry per (symbol, interval) series, pruned by retention"""
+
+    def __init__(self, store: IntradayStore):
+        super().__init__(
+            "intraday",
+            entries_sql="""
+                SELECT m.symbol || '|' || m.interval, COUNT(b.ts) * 64, m.fetched_at
+                FROM intraday_meta m
+                LEFT JOIN intraday_bars b ON b.symbol = m.symbol AND b.interval = m.interval
+                GROUP BY m.symbol, m.interval
+            """,
+            delete_sqls=[]
+        )
+        self.store = store
+
+    def delete(self, conn, key: str):
+        symbol, interval = key.rsplit("|", 1)
+        conn.execute("DELETE FROM intraday_bars WHERE symbol = ? AND interval = ?", (symbol, interval))
+        conn.execute("DELETE FROM intraday_meta WHERE symbol = ? AND interval = ?", (symbol, interval))
+
+    def prune(self, db: CacheDatabase, now: float) -> int:
+        return self.store.prune(now)
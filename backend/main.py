@@ -1,16 +1,25 @@
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 import uvicorn
 
-from data_fetcher import DataFetcher
+from config import settings
+from data_fetcher import DataFetcher, cache_maintenance
+from cache_db import get_cache_database
+from cache_warmer import CacheWarmer
+from intraday_store import INTERVAL_SECONDS
 from model_trainer import ModelTrainer
 from predictor import Predictor
 from nlp_parser import NLPParser
 from advisor import StockAdvisor
 from top_stocks import TopStocksRecommender
 from stock_screener import StockScreener
+from http_client import async_http
+from quote_broadcaster import QuoteBroadcaster, QuoteSubscriber
 
 # Try to import Gemini parser, fall back to NLP parser if not available
 try:
@@ -20,10 +29,23 @@ except ImportError:
     USE_GEMINI = False
     print("Gemini parser not available, using fallback NLP parser")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop shared resources with the app"""
+    cache_maintenance.start()
+    if settings.CACHE_WARMER_ENABLED:
+        cache_warmer.start()
+    yield
+    await quote_broadcaster.close()
+    cache_warmer.stop()
+    cache_maintenance.stop()
+    await async_http.close()
+
 app = FastAPI(
     title="Stock Market Forecast API",
     description="Next-day stock price prediction for NSE, BSE, and NASDAQ tickers",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -50,6 +72,35 @@ advisor = StockAdvisor()
 top_stocks = TopStocksRecommender()
 stock_screener = StockScreener()
 
+# Pre-market warm-up of the watchlists, screener stocks and most-requested symbols
+cache_warmer = CacheWarmer(
+    data_fetcher,
+    predictor,
+    universes={
+        "NSE": top_stocks.INTRADAY_WATCHLIST['INDIA'] + [stock['symbol'] for stock in stock_screener.QUALITY_STOCKS],
+        "NASDAQ": top_stocks.INTRADAY_WATCHLIST['US']
+    },
+    popular_symbols=lambda limit: cache_maintenance.most_requested("bars", limit),
+    top_stocks=top_stocks,
+    lead_minutes=settings.CACHE_WARM_LEAD_MINUTES,
+    popular_limit=settings.CACHE_WARM_POPULAR_SYMBOLS,
+    # Workers sharing cache.db elect one warmer per scheduled run
+    db=get_cache_database(settings.CACHE_DB_PATH)
+)
+
+async def streamed_quote(symbol: str):
+    """Quote for /ws/quotes, with indicators at its price once the symbol has an indicator state"""
+    quote = await data_fetcher.get_quote_async(symbol)
+    live = predictor.live_indicators(symbol, quote)
+    return quote if live is None else dict(quote, indicators=live)
+
+# One shared poller per symbol streamed over /ws/quotes
+quote_broadcaster = QuoteBroadcaster(
+    streamed_quote,
+    interval_seconds=settings.QUOTE_STREAM_INTERVAL_SECONDS,
+    max_symbols_per_client=settings.QUOTE_STREAM_MAX_SYMBOLS
+)
+
 # Initialize Gemini parser if available
 gemini_parser = None
 if USE_GEMINI:
@@ -69,6 +120,8 @@ class QuoteResponse(BaseModel):
     volume: int
     latest_trading_day: str
     source: str
+    stale: bool = False
+    stale_age_seconds: Optional[int] = None
 
 class PredictionResponse(BaseModel):
     symbol: str
@@ -101,8 +154,12 @@ async def root():
         "endpoints": [
             "/quote?symbol=RELIANCE.NS",
             "/predict?symbol=RELIANCE.NS",
+            "/predict/batch?symbols=AAPL,MSFT,RELIANCE.NS",
             "/signal?symbol=RELIANCE.NS",
             "/chart?symbol=RELIANCE.NS",
+            "/indicators?symbol=RELIANCE.NS&verify=true",
+            "/intraday?symbol=RELIANCE.NS&interval=5m&days=1",
+            "/ws/quotes?symbols=AAPL,RELIANCE.NS (WebSocket)",
             "/portfolio?symbol=RELIANCE.NS&type=aggressive",
             "/train?symbol=RELIANCE.NS",
             "/analyze?query=can I invest in apple today"
@@ -111,7 +168,10 @@ async def root():
     }
 
 @app.get("/quote", response_model=QuoteResponse)
-async def get_quote(symbol: str = Query(..., description="Stock symbol (e.g., RELIANCE.NS, AAPL)")):
+async def get_quote(
+    symbol: str = Query(..., description="Stock symbol (e.g., RELIANCE.NS, AAPL)"),
+    allow_stale: Optional[bool] = Query(None, description="Return an expired quote immediately and refresh it in the background")
+):
     """
     Get current stock quote
     
@@ -119,13 +179,78 @@ async def get_quote(symbol: str = Query(..., description="Stock symbol (e.g., RE
     - NSE: RELIANCE.NS, TCS.NS, INFY.NS
     - BSE: RELIANCE.BO, TCS.BO
     - NASDAQ: AAPL, GOOGL, MSFT
+    
+    Stale quotes are flagged with "stale": true.
     """
     try:
-        quote = data_fetcher.get_quote(symbol)
+        quote = await data_fetcher.get_quote_async(symbol, allow_stale=allow_stale)
         return quote
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.websocket("/ws/quotes")
+async def stream_quotes(websocket: WebSocket, symbols: str = ""):
+    """
+    Live quotes over a WebSocket
+    
+    Subscribe with ?symbols=AAPL,TCS.NS or by sending
+    {"action": "subscribe" | "unsubscribe", "symbols": [...]}. The server
+    pushes {"type": "quote", "symbol", "data"} whenever a quote changes,
+    {"type": "error", "symbol", "detail"} when one cannot be fetched, and
+    {"type": "subscriptions", "symbols"} after every change. A slow client
+    only ever receives the newest quote per symbol. Quotes of symbols that
+    have been predicted carry "indicators" (sma_5, sma_10, rsi_14) at the
+    live price.
+    """
+    await websocket.accept()
+    subscriber = QuoteSubscriber()
+    
+    async def send_updates():
+        while True:
+            for message in await subscriber.next_batch():
+                await websocket.send_json(message)
+    
+    def update(action: str, requested):
+        rejected = []
+        for symbol in requested:
+            symbol = str(symbol).strip().upper()
+            if not symbol:
+                continue
+            if action == "unsubscribe":
+                quote_broadcaster.unsubscribe(subscriber, symbol)
+            elif not quote_broadcaster.subscribe(subscriber, symbol):
+                rejected.append(symbol)
+        if rejected:
+            subscriber.offer("_error", {
+                "type": "error",
+                "detail": f"At most {quote_broadcaster.max_symbols_per_client} symbols per connection, not subscribed: {', '.join(rejected)}"
+            })
+        subscriber.offer("_subscriptions", {"type": "subscriptions", "symbols": sorted(subscriber.symbols)})
+    
+    sender = asyncio.create_task(send_updates())
+    try:
+        if symbols:
+            update("subscribe", symbols.split(","))
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            action = message.get("action") if isinstance(message, dict) else None
+            requested = message.get("symbols") if isinstance(message, dict) else None
+            if action not in ("subscribe", "unsubscribe") or not isinstance(requested, list):
+                subscriber.offer("_error", {
+                    "type": "error",
+                    "detail": 'Expected {"action": "subscribe" | "unsubscribe", "symbols": [...]}'
+                })
+                continue
+            update(action, requested)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        quote_broadcaster.remove(subscriber)
+
 @app.get("/predict", response_model=PredictionResponse)
 async def get_prediction(symbol: str = Query(..., description="Stock symbol")):
     """
@@ -146,6 +271,40 @@ async def get_prediction(symbol: str = Query(..., description="Stock symbol")):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/predict/batch")
+async def get_batch_predictions(symbols: str = Query(..., description="Comma-separated stock symbols")):
+    """
+    Predict next-day closing prices for many symbols in one call
+    
+    Histories are fetched in grouped downloads and all models are evaluated
+    together, so a dashboard of hundreds of tickers costs one request
+    instead of one /predict per ticker. Symbols that fail are listed under
+    "errors" instead of failing the whole batch.
+    """
+    requested = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols.split(",") if symbol.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(requested) > settings.PREDICT_BATCH_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.PREDICT_BATCH_MAX_SYMBOLS} symbols per batch, got {len(requested)}"
+        )
+    
+    try:
+        result = predictor.predict_many(requested)
+        predictions = [
+            PredictionResponse(**prediction)
+            for prediction in (result['predictions'].get(symbol) for symbol in requested)
+            if prediction is not None
+        ]
+        return {
+            "count": len(predictions),
+            "predictions": predictions,
+            "errors": result['errors']
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/signal", response_model=SignalResponse)
 async def get_signal(symbol: str = Query(..., description="Stock symbol")):
     """
@@ -172,6 +331,57 @@ async def get_chart_data(symbol: str = Query(..., description="Stock symbol")):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/indicators")
+async def get_indicators(
+    symbol: str = Query(..., description="Stock symbol"),
+    verify: bool = Query(False, description="Check the state against a full recompute")
+):
+    """
+    SMA-5, SMA-10 and RSI-14 of the latest bar and at the live quote
+    
+    Served from the symbol's rolling indicator state, which only applies the
+    bars added since its last update. With verify=true the state is also
+    compared with a full recompute over the recent history and rebuilt if
+    they differ.
+    """
+    try:
+        return predictor.get_indicators(symbol, verify=verify)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/intraday")
+async def get_intraday(
+    symbol: str = Query(..., description="Stock symbol"),
+    interval: str = Query("5m", description="Bar interval: 1m, 2m, 5m, 15m, 30m, 60m, 90m or 1h"),
+    days: float = Query(1, gt=0, description="How many days back, clamped to the retention of the stored interval")
+):
+    """
+    Get intraday OHLCV bars
+    
+    Timestamps are Unix seconds (UTC). Intervals coarser than the stored
+    1m/5m bars are rolled up from them; "source_interval" says which.
+    """
+    if interval not in INTERVAL_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid interval. Choose from: {', '.join(INTERVAL_SECONDS)}"
+        )
+    try:
+        bars = data_fetcher.get_intraday_bars(symbol, interval, days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "symbol": symbol,
+        "interval": interval,
+        "source_interval": bars["source_interval"],
+        "timestamps": bars["timestamps"].tolist(),
+        "open": bars["open"].tolist(),
+        "high": bars["high"].tolist(),
+        "low": bars["low"].tolist(),
+        "close": bars["close"].tolist(),
+        "volume": bars["volume"].tolist()
+    }
+
 @app.get("/portfolio")
 async def get_portfolio_signal(
     symbol: str = Query(..., description="Stock symbol"),
@@ -208,6 +418,8 @@ async def train_model(symbol: str = Query(..., description="Stock symbol")):
     try:
         historical_data = data_fetcher.get_historical_data(symbol, days=90)
         result = model_trainer.train_model(symbol, historical_data)
+        # The new model version already misses the cached forecast; drop it right away anyway
+        predictor.prediction_cache.invalidate(symbol)
         return {
             "message": f"Model trained successfully for {symbol}",
             "details": result
@@ -248,14 +460,19 @@ async def analyze_query(
                 "examples": nlp_parser.get_example_queries()
             }
         
+        # News comes over the async client, so no worker thread waits on NewsAPI
+        company_name = parsed.get('company_name', parsed['symbol'])
+        news_articles = await advisor.news_analyzer.get_stock_news_async(parsed['symbol'], company_name)
+        
         # Get comprehensive analysis
         analysis = advisor.analyze_investment(
             symbol=parsed['symbol'],
-            company_name=parsed.get('company_name', parsed['symbol']),
+            company_name=company_name,
             user_intent=parsed.get('intent', 'analyze'),
             quantity=parsed.get('quantity'),
             portfolio_type=portfolio_type,
-            budget=budget
+            budget=budget,
+            news_articles=news_articles
         )
         
         # Add parsed query info
@@ -357,14 +574,18 @@ async def analyze_query_gemini(
                 "popular_stocks": popular_stocks
             }
         
+        company_name = parsed.get('company_name', parsed['symbol'])
+        news_articles = await advisor.news_analyzer.get_stock_news_async(parsed['symbol'], company_name)
+        
         # Get comprehensive analysis
         analysis = advisor.analyze_investment(
             symbol=parsed['symbol'],
-            company_name=parsed.get('company_name', parsed['symbol']),
+            company_name=company_name,
             user_intent=parsed.get('intent', 'analyze'),
             quantity=None,
             portfolio_type=portfolio_type,
-            budget=budget
+            budget=budget,
+            news_articles=news_articles
         )
         
         # Add Gemini parsed info
@@ -396,6 +617,23 @@ async def get_hidden_gems():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to screen stocks: {str(e)}")
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Cache tier counters
+    
+    Reports memory tier occupancy, hits, misses and evictions plus how many
+    upstream fetches were coalesced, for sizing MEMORY_CACHE_MAX_MB, and
+    the pre-market warmer's schedule and last runs.
+    """
+    stats = data_fetcher.get_cache_stats()
+    stats["warmer"] = cache_warmer.stats()
+    stats["quote_stream"] = quote_broadcaster.stats()
+    stats["models"] = model_trainer.registry.stats()
+    stats["predictions"] = predictor.prediction_cache.stats()
+    stats["indicator_state"] = predictor.indicator_states.stats()
+    return stats
+
 @app.get("/health")
 async def health_check():
     """Service health check"""
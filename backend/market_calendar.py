@@ -0,0 +1,207 @@
+"""
+Exchange Trading Calendars
+Sessions and holidays for NSE/BSE and NASDAQ, used to keep caches valid while a market is closed
+
+Tickers pick their calendar by suffix: .NS and .BO trade on the NSE
+schedule (BSE follows the same holidays), anything else on NASDAQ, whose
+holidays are the NYSE ones. US holidays are generated from their rules for
+any year; NSE publishes its list yearly, so NSE_HOLIDAYS has to be extended
+from the exchange circular each December (later years fall back to
+weekends only).
+"""
+from datetime import date, datetime, time as clock_time, timedelta, timezone
+from typing import Dict, FrozenSet, Optional
+from zoneinfo import ZoneInfo
+
+# Quotes and bars fetched this long after the close are final for the session
+SETTLE_MINUTES = 15
+
+NSE_HOLIDAYS = {
+    2024: [
+        "2024-01-22", "2024-01-26", "2024-03-08", "2024-03-25", "2024-03-29", "2024-04-11",
+        "2024-04-17", "2024-05-01", "2024-05-20", "2024-06-17", "2024-07-17", "2024-08-15",
+        "2024-10-02", "2024-11-01", "2024-11-15", "2024-11-20", "2024-12-25",
+    ],
+    2025: [
+        "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14", "2025-04-18",
+        "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02", "2025-10-21", "2025-10-22",
+        "2025-11-05", "2025-12-25",
+    ],
+    2026: [
+        "2026-01-15", "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31", "2026-04-03",
+        "2026-04-14", "2026-05-01", "2026-05-28", "2026-06-26", "2026-09-14", "2026-10-02",
+        "2026-10-20", "2026-11-10", "2026-11-24", "2026-12-25",
+    ],
+}
+# Unscheduled NYSE/NASDAQ closures (national days of mourning)
+NYSE_SPECIAL_CLOSURES = ["2018-12-05", "2025-01-09"]
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th (1-based) weekday of a month; n=-1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday ones on Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def nyse_holidays(year: int) -> FrozenSet[date]:
+    """Full-day NYSE (and NASDAQ) closures in a year, from the exchange's holiday rules"""
+    days = [
+        _nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),   # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),   # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    ]
+    # A Saturday New Year's Day is not moved back into the previous year
+    if date(year, 1, 1).weekday() != 5:
+        days.append(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        days.append(_observed(date(year, 6, 19)))  # Juneteenth
+    days.extend(date.fromisoformat(day) for day in NYSE_SPECIAL_CLOSURES if day.startswith(str(year)))
+    return frozenset(days)
+
+
+def nse_holidays(year: int) -> FrozenSet[date]:
+    """Published NSE trading holidays for a year (empty for years not listed yet)"""
+    return frozenset(date.fromisoformat(day) for day in NSE_HOLIDAYS.get(year, []))
+
+
+class ExchangeCalendar:
+    """Trading days and regular session hours of one exchange"""
+
+    def __init__(self, name: str, timezone_name: str, open_time: clock_time, close_time: clock_time, holiday_rule):
+        self.name = name
+        self.timezone = ZoneInfo(timezone_name)
+        self.open_time = open_time
+        self.close_time = close_time
+        self._holiday_rule = holiday_rule
+        self._holidays: Dict[int, FrozenSet[date]] = {}
+
+    def holidays(self, year: int) -> FrozenSet[date]:
+        """Holidays for a year, computed once and kept"""
+        holidays = self._holidays.get(year)
+        if holidays is None:
+            holidays = self._holidays[year] = self._holiday_rule(year)
+        return holidays
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays(day.year)
+
+    def next_trading_day(self, day: date) -> date:
+        """First trading day strictly after `day`"""
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def previous_trading_day(self, day: date) -> date:
+        """Last trading day strictly before `day`"""
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def session_open(self, day: date) -> datetime:
+        return datetime.combine(day, self.open_time, tzinfo=self.timezone)
+
+    def session_close(self, day: date) -> datetime:
+        return datetime.combine(day, self.close_time, tzinfo=self.timezone)
+
+    def _moment(self, moment) -> datetime:
+        """Accept aware datetimes or Unix timestamps"""
+        if isinstance(moment, datetime):
+            return moment
+        return datetime.fromtimestamp(moment, timezone.utc)
+
+    def is_open(self, moment) -> bool:
+        """Whether a regular session is in progress (until SETTLE_MINUTES after the close)"""
+        moment = self._moment(moment)
+        day = moment.astimezone(self.timezone).date()
+        if not self.is_trading_day(day):
+            return False
+        settled = self.session_close(day) + timedelta(minutes=SETTLE_MINUTES)
+        return self.session_open(day) <= moment < settled
+
+    def next_session_open(self, moment) -> datetime:
+        """Open of the first session starting strictly after `moment`"""
+        moment = self._moment(moment)
+        day = moment.astimezone(self.timezone).date()
+        if not (self.is_trading_day(day) and self.session_open(day) > moment):
+            day = self.next_trading_day(day)
+        return self.session_open(day)
+
+    def last_settled_close(self, moment) -> datetime:
+        """Close (plus SETTLE_MINUTES) of the latest session fully finished by `moment`"""
+        moment = self._moment(moment)
+        day = moment.astimezone(self.timezone).date()
+        if not self.is_trading_day(day):
+            day = self.previous_trading_day(day)
+        settled = self.session_close(day) + timedelta(minutes=SETTLE_MINUTES)
+        if settled > moment:
+            settled = self.session_close(self.previous_trading_day(day)) + timedelta(minutes=SETTLE_MINUTES)
+        return settled
+
+    def max_age_seconds(self, ttl_seconds: float, now: Optional[float] = None) -> float:
+        """
+        How old cached market data may be at `now` and still be served
+
+        While a session runs this is the normal TTL. While the market is
+        closed, anything fetched after the last session settled cannot
+        change before the next open, so it stays valid until then.
+        """
+        now = now if now is not None else datetime.now(timezone.utc).timestamp()
+        if self.is_open(now):
+            return ttl_seconds
+        return max(ttl_seconds, now - self.last_settled_close(now).timestamp())
+
+    def seconds_until_open(self, now: Optional[float] = None) -> float:
+        """0 during a session, otherwise the time left until the next one opens"""
+        now = now if now is not None else datetime.now(timezone.utc).timestamp()
+        if self.is_open(now):
+            return 0.0
+        return self.next_session_open(now).timestamp() - now
+
+
+CALENDARS = {
+    "NSE": ExchangeCalendar("NSE", "Asia/Kolkata", clock_time(9, 15), clock_time(15, 30), nse_holidays),
+    "NASDAQ": ExchangeCalendar("NASDAQ", "America/New_York", clock_time(9, 30), clock_time(16, 0), nyse_holidays),
+}
+
+
+def exchange_for_symbol(symbol: str) -> str:
+    """NSE for .NS/.BO tickers (BSE shares NSE's hours and holidays), NASDAQ for everything else"""
+    return "NSE" if symbol.upper().endswith((".NS", ".BO")) else "NASDAQ"
+
+
+def calendar_for_symbol(symbol: str) -> ExchangeCalendar:
+    return CALENDARS[exchange_for_symbol(symbol)]
@@ -0,0 +1,425 @@
+"""
+Offline Market Data Record/Replay
+Record yfinance and Alpha Vantage responses to local fixtures and serve them back with no network
+
+Set MARKET_DATA_MODE=record to save every upstream response while running
+live, then MARKET_DATA_MODE=replay to serve those responses from
+MARKET_DATA_FIXTURE_DIR. Replay can add latency and random provider errors
+(REPLAY_LATENCY_MS, REPLAY_LATENCY_JITTER_MS, REPLAY_ERROR_RATE, seeded by
+REPLAY_SEED) so benchmarks and load tests stay deterministic on CI.
+
+Fixture layout:
+    yfinance/<SYMBOL>.csv                   daily bars (Date, Open, High, Low, Close, Volume)
+    yfinance/<INTERVAL>/<SYMBOL>.csv        intraday bars, Datetime in UTC
+    yfinance/info/<SYMBOL>.json             Ticker.info
+    alphavantage/<FUNCTION>/<SYMBOL>.json   raw API response bodies
+
+In replay, "now" for DataFetcher's date windows is the day after the last
+recorded session (ReplayClock), so fixtures keep working as they age.
+
+Record fixtures for a few symbols:
+    MARKET_DATA_MODE=record python market_replay.py AAPL MSFT RELIANCE.NS --days 365
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from provider_health import ProviderError
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+MARKET_DATA_MODES = ("live", "record", "replay")
+
+
+class FixtureStore:
+    """Read and write market data fixtures under one directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def _write_atomic(self, path: str, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _history_path(self, symbol: str, interval: str) -> str:
+        if interval == "1d":
+            return self._path("yfinance", f"{symbol}.csv")
+        return self._path("yfinance", interval, f"{symbol}.csv")
+
+    def load_history(self, symbol: str, interval: str = "1d") -> pd.DataFrame:
+        """All recorded bars for a symbol, indexed by naive session date (daily) or naive UTC time"""
+        index_name = "Date" if interval == "1d" else "Datetime"
+        path = self._history_path(symbol, interval)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=BAR_COLUMNS, index=pd.DatetimeIndex([], name=index_name))
+        return pd.read_csv(path, index_col=index_name, parse_dates=[index_name])
+
+    def save_history(self, symbol: str, frame: pd.DataFrame, interval: str = "1d"):
+        """Merge bars into the symbol's fixture (newer recordings win on overlapping dates)"""
+        if frame is None or len(frame) == 0:
+            return
+        frame = frame[[column for column in BAR_COLUMNS if column in frame.columns]].dropna(subset=["Close"])
+        # Session dates / UTC only, so replay never depends on the recording machine's time zone
+        if interval == "1d":
+            index = pd.DatetimeIndex(frame.index.strftime("%Y-%m-%d"), name="Date")
+        else:
+            index = frame.index.tz_convert("UTC") if frame.index.tz is not None else frame.index
+            index = pd.DatetimeIndex(index.tz_localize(None), name="Datetime")
+        frame = frame.set_axis(index)
+        with self._lock:
+            merged = pd.concat([self.load_history(symbol, interval), frame])
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+            self._write_atomic(self._history_path(symbol, interval), merged.to_csv)
+
+    def last_session(self) -> Optional[pd.Timestamp]:
+        """Latest daily bar in any yfinance or Alpha Vantage fixture, None without fixtures"""
+        dates = []
+        history_dir = self._path("yfinance")
+        if os.path.isdir(history_dir):
+            for name in os.listdir(history_dir):
+                if name.endswith(".csv"):
+                    frame = self.load_history(name[:-len(".csv")])
+                    if len(frame) > 0:
+                        dates.append(frame.index[-1])
+        series_dir = self._path("alphavantage", "TIME_SERIES_DAILY")
+        if os.path.isdir(series_dir):
+            for name in os.listdir(series_dir):
+                body = self._load_json(os.path.join(series_dir, name)) or {}
+                series = body.get("Time Series (Daily)") or {}
+                if series:
+                    dates.append(pd.Timestamp(max(series)))
+        return max(dates) if dates else None
+
+    def load_info(self, symbol: str) -> Dict[str, Any]:
+        return self._load_json(self._path("yfinance", "info", f"{symbol}.json")) or {}
+
+    def save_info(self, symbol: str, info: Dict[str, Any]):
+        if info:
+            self._save_json(self._path("yfinance", "info", f"{symbol}.json"), info)
+
+    def load_response(self, function: str, symbol: str) -> Optional[Dict[str, Any]]:
+        return self._load_json(self._path("alphavantage", function, f"{symbol}.json"))
+
+    def save_response(self, function: str, symbol: str, body: Dict[str, Any]):
+        """Store an Alpha Vantage body; daily series are merged so compact and full calls add up"""
+        path = self._path("alphavantage", function, f"{symbol}.json")
+        with self._lock:
+            existing = self._load_json(path)
+            if existing:
+                for key, value in body.items():
+                    if key.startswith("Time Series") and isinstance(existing.get(key), dict):
+                        value = {**existing[key], **value}
+                    existing[key] = value
+                body = existing
+            self._save_json(path, body)
+
+    def _load_json(self, path: str) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _save_json(self, path: str, data: Dict[str, Any]):
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=1, default=str)
+        self._write_atomic(path, write)
+
+
+class FaultInjector:
+    """Seeded latency and error simulation for replayed calls"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self, call: str) -> float:
+        """Delay in seconds for the next call; raises a simulated provider error at error_rate"""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise ProviderError(f"Simulated upstream error ({call})")
+        return delay
+
+    def before_call(self, call: str):
+        delay = self._draw(call)
+        if delay:
+            time.sleep(delay)
+
+    async def before_call_async(self, call: str):
+        delay = self._draw(call)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class ReplayClock:
+    """
+    Wall clock moved to just after the last recorded session
+
+    DataFetcher builds its [start, end) windows from now(); against the real
+    date, a 90-day window past fixtures that ended months ago comes back
+    empty. The offset is fixed on first use, so time still advances during
+    a run, and falls back to the real clock when there are no fixtures.
+    """
+
+    def __init__(self, store: FixtureStore):
+        self.store = store
+        self._offset: Optional[timedelta] = None
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        with self._lock:
+            if self._offset is None:
+                last = self.store.last_session()
+                # Midnight after the last session: an exclusive end of "now" still includes it
+                anchor = (last + pd.Timedelta(days=1)).to_pydatetime() if last is not None else datetime.now()
+                self._offset = anchor - datetime.now()
+        return datetime.now() + self._offset
+
+
+PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def _period_offset(period: str) -> pd.DateOffset:
+    """yfinance period string ("5d", "3mo", "1y") as a DateOffset"""
+    for suffix, unit in PERIOD_UNITS.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+    raise ValueError(f"Unsupported replay period '{period}'")
+
+
+def _to_naive(value) -> Optional[pd.Timestamp]:
+    if value is None:
+        return None
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_convert("UTC").tz_localize(None) if timestamp.tzinfo else timestamp
+
+
+def _replay_bars(store: FixtureStore, symbol: str, period: Optional[str], start, end, interval: str = "1d") -> pd.DataFrame:
+    """
+    Recorded bars in [start, end)
+
+    period ("5d", "1mo", ...) counts back from the last recorded session
+    rather than from today, so replayed quotes do not change as fixtures age.
+    """
+    frame = store.load_history(symbol, interval)
+    if len(frame) == 0:
+        return frame
+    if period:
+        return frame[frame.index > frame.index[-1] - _period_offset(period)]
+    start, end = _to_naive(start), _to_naive(end)
+    if start is not None:
+        frame = frame[frame.index >= start]
+    if end is not None:
+        frame = frame[frame.index < end]
+    return frame
+
+
+class ReplayTicker:
+    """yf.Ticker stand-in backed by fixtures"""
+
+    def __init__(self, symbol: str, store: FixtureStore, faults: FaultInjector):
+        self.symbol = symbol
+        self.store = store
+        self.faults = faults
+
+    def history(self, period: Optional[str] = None, start=None, end=None, interval: str = "1d", **kwargs) -> pd.DataFrame:
+        self.faults.before_call(f"history {self.symbol}")
+        return _replay_bars(self.store, self.symbol, period, start, end, interval)
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        self.faults.before_call(f"info {self.symbol}")
+        return self.store.load_info(self.symbol)
+
+
+class ReplayYFinance:
+    """The slice of the yfinance module DataFetcher uses, served from fixtures"""
+
+    def __init__(self, store: FixtureStore, faults: FaultInjector):
+        self.store = store
+        self.faults = faults
+
+    def Ticker(self, symbol: str) -> ReplayTicker:
+        return ReplayTicker(symbol, self.store, self.faults)
+
+    def download(self, tickers, start=None, end=None, interval: str = "1d", **kwargs) -> pd.DataFrame:
+        """Multi-ticker download as a (ticker, field) column MultiIndex"""
+        if isinstance(tickers, str):
+            tickers = tickers.split()
+        self.faults.before_call(f"download {len(tickers)} tickers")
+        frames = {}
+        for symbol in tickers:
+            frame = _replay_bars(self.store, symbol, None, start, end, interval)
+            if len(frame) > 0:
+                frames[symbol] = frame
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+
+class RecordingTicker:
+    """Real yf.Ticker that saves what it returns"""
+
+    def __init__(self, ticker, store: FixtureStore):
+        self._ticker = ticker
+        self.store = store
+
+    def history(self, *args, **kwargs) -> pd.DataFrame:
+        frame = self._ticker.history(*args, **kwargs)
+        self.store.save_history(self._ticker.ticker, frame, kwargs.get("interval", "1d"))
+        return frame
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        info = self._ticker.info
+        self.store.save_info(self._ticker.ticker, info)
+        return info
+
+
+class RecordingYFinance:
+    """Pass-through to the yfinance module that records responses"""
+
+    def __init__(self, yf_module, store: FixtureStore):
+        self._yf = yf_module
+        self.store = store
+
+    def Ticker(self, symbol: str) -> RecordingTicker:
+        return RecordingTicker(self._yf.Ticker(symbol), self.store)
+
+    def download(self, tickers, *args, **kwargs) -> pd.DataFrame:
+        data = self._yf.download(tickers, *args, **kwargs)
+        interval = kwargs.get("interval", "1d")
+        if data is not None and len(data) > 0 and isinstance(data.columns, pd.MultiIndex):
+            for symbol in data.columns.get_level_values(0).unique():
+                self.store.save_history(symbol, data[symbol], interval)
+        elif data is not None and len(data) > 0 and isinstance(tickers, str):
+            self.store.save_history(tickers, data, interval)
+        return data
+
+
+class _FixtureResponse:
+    """Minimal requests.Response stand-in"""
+
+    def __init__(self, status_code: int, body: Dict[str, Any]):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self) -> Dict[str, Any]:
+        return self._body
+
+
+def _response_key(params: Dict[str, Any]) -> Tuple[str, str]:
+    return params.get("function", "UNKNOWN"), params.get("symbol", "UNKNOWN")
+
+
+def _is_recordable(body: Any) -> bool:
+    # Quota notes are not market data; replaying them would only replay the outage
+    return isinstance(body, dict) and not any(key in body for key in ("Note", "Information", "Error Message"))
+
+
+class ReplayHTTP:
+    """Alpha Vantage session (sync get and async get_json) served from fixtures"""
+
+    def __init__(self, store: FixtureStore, faults: FaultInjector):
+        self.store = store
+        self.faults = faults
+
+    def _lookup(self, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        body = self.store.load_response(*_response_key(params))
+        # An unrecorded symbol looks like an empty answer, not an outage
+        return 200, body if body is not None else {}
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> _FixtureResponse:
+        self.faults.before_call(f"GET {_response_key(params or {})}")
+        return _FixtureResponse(*self._lookup(params or {}))
+
+    async def get_json(self, url: str, params: Dict[str, Any]) -> Tuple[int, Any]:
+        await self.faults.before_call_async(f"GET {_response_key(params)}")
+        return self._lookup(params)
+
+
+class RecordingHTTP:
+    """Pass-through to the pooled HTTP clients that records Alpha Vantage bodies"""
+
+    def __init__(self, session, async_client, store: FixtureStore):
+        self._session = session
+        self._async_client = async_client
+        self.store = store
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs):
+        response = self._session.get(url, params=params, **kwargs)
+        body = response.json()
+        if response.status_code == 200 and _is_recordable(body):
+            self.store.save_response(*_response_key(params or {}), body)
+        return response
+
+    async def get_json(self, url: str, params: Dict[str, Any]) -> Tuple[int, Any]:
+        status, body = await self._async_client.get_json(url, params)
+        if status == 200 and _is_recordable(body):
+            self.store.save_response(*_response_key(params), body)
+        return status, body
+
+
+def build_market_data_clients(mode: str, fixture_dir: str, yf_module, session, async_client, faults: Optional[FaultInjector] = None):
+    """
+    Clients DataFetcher should call for the given MARKET_DATA_MODE
+
+    Returns:
+        (yfinance-like module, sync HTTP session, async HTTP client, now() for date windows)
+    """
+    if mode not in MARKET_DATA_MODES:
+        raise ValueError(f"Unknown MARKET_DATA_MODE '{mode}', expected one of {MARKET_DATA_MODES}")
+    if mode == "live":
+        return yf_module, session, async_client, datetime.now
+
+    store = FixtureStore(fixture_dir)
+    if mode == "record":
+        http = RecordingHTTP(session, async_client, store)
+        return RecordingYFinance(yf_module, store), http, http, datetime.now
+
+    http = ReplayHTTP(store, faults or FaultInjector())
+    return ReplayYFinance(store, faults or FaultInjector()), http, http, ReplayClock(store).now
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from data_fetcher import DataFetcher
+    from config import settings
+
+    parser = argparse.ArgumentParser(description="Record market data fixtures for replay")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    if settings.MARKET_DATA_MODE != "record":
+        parser.error("run with MARKET_DATA_MODE=record")
+
+    # Call the providers directly: going through the caches would only record what is missing locally
+    fetcher = DataFetcher()
+    start_date = (datetime.now() - timedelta(days=args.days)).strftime("%Y-%m-%d")
+    fetcher._call_provider("yfinance", "history_batch", fetcher._fetch_history_batch_yfinance, args.symbols, start_date)
+    for symbol in args.symbols:
+        fetcher._fetch_company_metadata(symbol)
+        fetcher._call_provider("yfinance", "quote", fetcher._fetch_quote_yfinance, symbol)
+        # Alpha Vantage calls stay under the key's rate limit and are skipped once it is spent
+        fetcher._call_provider("alphavantage", "quote", fetcher._fetch_quote_alphavantage, symbol)
+        fetcher._call_provider("alphavantage", "history", fetcher._fetch_history_alphavantage, symbol, start_date)
+    print(f"Recorded {len(args.symbols)} symbols to {settings.MARKET_DATA_FIXTURE_DIR}")
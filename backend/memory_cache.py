@@ -0,0 +1,131 @@
+"""
+In-Process Memory Cache Tier
+Bounded LRU cache with per-entry TTL and byte-size accounting, sitting in front of SQLite
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate the memory held by a cached value in bytes"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """LRU + TTL cache bounded by total bytes"""
+
+    def __init__(self, max_bytes: int, default_ttl_seconds: float = 3600):
+        self.max_bytes = max_bytes
+        self.default_ttl_seconds = default_ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_entry(self, key: Hashable, max_age_seconds: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """
+        Look up a key
+
+        Returns:
+            (value, stored_at) if present, within its TTL and younger than
+            max_age_seconds, else None. Only entries actually served count
+            as hits; a present but too old entry is a miss (and is kept, a
+            less strict caller may still use it).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at, expires_at, size = entry
+            if now >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if max_age_seconds is not None and now - stored_at >= max_age_seconds:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, stored_at
+
+    def get(self, key: Hashable, max_age_seconds: Optional[float] = None) -> Optional[Any]:
+        """Return the cached value if present and younger than max_age_seconds"""
+        entry = self.get_entry(key, max_age_seconds)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None, stored_at: Optional[float] = None):
+        """
+        Store a value, evicting least recently used entries to stay under max_bytes
+
+        Args:
+            key: Cache key
+            value: Value to store (shared with every reader, treat as read-only)
+            ttl_seconds: Time after stored_at when the entry is dropped
+            stored_at: When the data was produced (defaults to now), so entries
+                loaded from SQLite keep their original age
+        """
+        stored_at = time.time() if stored_at is None else stored_at
+        ttl_seconds = self.default_ttl_seconds if ttl_seconds is None else ttl_seconds
+        size = estimate_size(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # Too big to keep, but the previous value is outdated all the same
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, stored_at, stored_at + ttl_seconds, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        """Drop a key if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Drop everything (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: Hashable):
+        """Remove an entry; caller holds the lock"""
+        _, _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and occupancy for sizing the tier"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
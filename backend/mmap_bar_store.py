@@ -0,0 +1,169 @@
+"""
+Memory-Mapped Bar Files
+One fixed-width columnar file per symbol, mapped read-only and shared by every worker process
+
+File layout (little-endian, every section 8-byte aligned):
+    header   64 bytes: magic, row count
+    dates    int64[rows], days since 1970-01-01
+    open, high, low, close, volume   float64[rows] each
+
+Readers get NumPy views straight onto the mapping, so all uvicorn workers
+share the same page-cache pages instead of holding private copies. Writers
+merge into a new file and os.replace() it over the old one: readers of the
+old mapping keep a consistent snapshot and pick up the new file on their
+next read. Bar metadata (source, covered range, fetch time) stays in the
+SQLite bar_meta table, and each write runs inside a cache.db transaction so
+concurrent writers in different processes are serialized.
+"""
+import os
+import struct
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from bar_store import BAR_FIELDS, UPSERT_BAR_META_SQL, BarStore, empty_bars, merge_bars
+from cache_db import CacheDatabase
+from cache_maintenance import CacheNamespace
+
+MAGIC = b"BARS\x00\x00\x00\x01"
+HEADER = struct.Struct("<8sq")
+HEADER_SIZE = 64
+
+
+def encode_bar_file(day_numbers: np.ndarray, columns: List[np.ndarray]) -> bytes:
+    """Serialize one series into the bar file layout"""
+    rows = len(day_numbers)
+    header = HEADER.pack(MAGIC, rows).ljust(HEADER_SIZE, b"\x00")
+    parts = [header, np.ascontiguousarray(day_numbers, dtype="<i8").tobytes()]
+    parts.extend(np.ascontiguousarray(column, dtype="<f8").tobytes() for column in columns)
+    return b"".join(parts)
+
+
+def map_bar_file(path: str) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Map a bar file read-only
+
+    Returns:
+        (day numbers, {field: float64 view}) - no bar data is copied
+    """
+    mapping = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, rows = HEADER.unpack_from(mapping, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a bar file")
+    day_numbers = np.ndarray((rows,), dtype="<i8", buffer=mapping, offset=HEADER_SIZE)
+    columns = {}
+    offset = HEADER_SIZE + rows * 8
+    for field in BAR_FIELDS:
+        columns[field] = np.ndarray((rows,), dtype="<f8", buffer=mapping, offset=offset)
+        offset += rows * 8
+    return day_numbers, columns
+
+
+class _MappedSeries:
+    """A mapped file plus its decoded date strings, valid for one file version"""
+
+    def __init__(self, path: str, version: Tuple[int, int, int]):
+        self.version = version
+        self.day_numbers, self.columns = map_bar_file(path)
+        # Dates are decoded once per file version; the float columns stay mapped
+        self.dates = self.day_numbers.astype("datetime64[D]").astype(str).tolist()
+
+
+class MmapBarStore(BarStore):
+    """BarStore keeping bars in memory-mapped per-symbol files"""
+
+    def __init__(self, db: CacheDatabase, root: str):
+        super().__init__(db)
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._mapped: Dict[str, _MappedSeries] = {}
+        self._lock = threading.Lock()
+
+    def path(self, symbol: str) -> str:
+        return os.path.join(self.root, f"{symbol}.bars")
+
+    def _series(self, symbol: str):
+        """Mapped series for a symbol, remapped when another writer replaced the file"""
+        path = self.path(symbol)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            series = self._mapped.get(symbol)
+            if series is None or series.version != version:
+                series = _MappedSeries(path, version)
+                self._mapped[symbol] = series
+            return series
+
+    def write_bars(self, symbol: str, bars: Dict[str, Any], source: str, covered_from: str, fetched_at: float):
+        """Merge bars into the symbol's file (new values win on equal dates) and swap it in atomically"""
+        # The write lock on cache.db also serializes writers in other processes
+        with self.db.transaction() as conn:
+            covered_from, last_date = self._merge_meta(symbol, list(bars["dates"]), covered_from)
+            series = self._series(symbol)
+            stored = (series.day_numbers, [series.columns[field] for field in BAR_FIELDS]) if series is not None else None
+            payload = encode_bar_file(*merge_bars(bars, stored))
+
+            path = self.path(symbol)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            conn.execute(UPSERT_BAR_META_SQL, (symbol, source, covered_from, last_date, fetched_at))
+
+    def read_bars(self, symbol: str, start_date: str = "", end_date: str = "9999-12-31") -> Dict[str, Any]:
+        """Bars in [start_date, end_date] as read-only views onto the shared mapping"""
+        meta = self.get_meta(symbol)
+        source = meta["source"] if meta else ""
+        series = self._series(symbol)
+        if series is None:
+            return empty_bars(symbol, source)
+
+        start = bisect_left(series.dates, start_date)
+        end = bisect_right(series.dates, end_date)
+        result = {"symbol": symbol, "dates": series.dates[start:end]}
+        for field in BAR_FIELDS:
+            result[field] = series.columns[field][start:end]
+        result["source"] = source
+        return result
+
+    def delete_series(self, symbol: str):
+        with self._lock:
+            self._mapped.pop(symbol, None)
+        try:
+            os.remove(self.path(symbol))
+        except FileNotFoundError:
+            pass
+
+    def cache_namespace(self) -> CacheNamespace:
+        return _BarFileNamespace(self)
+
+
+class _BarFileNamespace(CacheNamespace):
+    """Cache maintenance view of the bar files: sized from disk, evicted by unlinking"""
+
+    def __init__(self, store: MmapBarStore):
+        super().__init__("bars", entries_sql="SELECT symbol, 0, fetched_at FROM bar_meta", delete_sqls=[
+            "DELETE FROM bar_meta WHERE symbol = ?"
+        ])
+        self.store = store
+
+    def entries(self, db: CacheDatabase) -> List[Tuple[str, int, float]]:
+        entries = []
+        for symbol, _, fetched_at in db.fetchall(self.entries_sql):
+            path = self.store.path(symbol)
+            entries.append((symbol, os.path.getsize(path) if os.path.exists(path) else 0, fetched_at))
+        return entries
+
+    def delete(self, conn, key: str):
+        super().delete(conn, key)
+        self.store.delete_series(key)
+
+    def external_bytes(self) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(self.store.root) if entry.name.endswith(".bars"))
@@ -0,0 +1,152 @@
+"""
+Resident Model Registry
+Bounded LRU of unpickled (model, scaler) pairs, revalidated against the files on disk
+
+A hot symbol's model is served from memory. At most once every
+check_interval_seconds the registry stats the two pickle files; if another
+worker retrained the symbol in the meantime (different mtime, size or
+inode), the pair is reloaded, and if the files are gone it is dropped.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+Version = Tuple[Tuple[int, int, int], Tuple[int, int, int]]
+
+
+class _ResidentModel:
+    __slots__ = ("model", "scaler", "version", "checked_at")
+
+    def __init__(self, model: Any, scaler: Any, version: Version, checked_at: float):
+        self.model = model
+        self.scaler = scaler
+        self.version = version
+        self.checked_at = checked_at
+
+
+class ModelRegistry:
+    """LRU cache of trained models keyed by symbol"""
+
+    def __init__(self, model_dir: str, max_models: int = 256, check_interval_seconds: float = 5):
+        self.model_dir = model_dir
+        self.max_models = max_models
+        self.check_interval_seconds = check_interval_seconds
+        self._entries: "OrderedDict[str, _ResidentModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def paths(self, symbol: str) -> Tuple[str, str]:
+        """(model path, scaler path) for a symbol"""
+        return (
+            os.path.join(self.model_dir, f"{symbol}_model.pkl"),
+            os.path.join(self.model_dir, f"{symbol}_scaler.pkl")
+        )
+
+    def version(self, symbol: str) -> Optional[Version]:
+        """File identity of a symbol's model pair, None if either file is missing"""
+        try:
+            stats = [os.stat(path) for path in self.paths(symbol)]
+        except FileNotFoundError:
+            return None
+        model_stat, scaler_stat = stats
+        return (
+            (model_stat.st_mtime_ns, model_stat.st_size, model_stat.st_ino),
+            (scaler_stat.st_mtime_ns, scaler_stat.st_size, scaler_stat.st_ino)
+        )
+
+    def current_version(self, symbol: str) -> Optional[Version]:
+        """Version of a symbol's model files, from the resident entry inside the check interval"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None and now - entry.checked_at < self.check_interval_seconds:
+                return entry.version
+        return self.version(symbol)
+
+    def get(self, symbol: str) -> Optional[Tuple[Any, Any]]:
+        """(model, scaler) for a symbol, loading or reloading from disk when needed"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None and now - entry.checked_at < self.check_interval_seconds:
+                self._entries.move_to_end(symbol)
+                self.hits += 1
+                return entry.model, entry.scaler
+
+        version = self.version(symbol)
+        if version is None:
+            self.invalidate(symbol)
+            return None
+        if entry is not None and entry.version == version:
+            with self._lock:
+                entry.checked_at = now
+                self.hits += 1
+            return entry.model, entry.scaler
+
+        # Unpickling happens outside the lock; concurrent loaders of one symbol just race to store it
+        model_path, scaler_path = self.paths(symbol)
+        try:
+            with open(model_path, 'rb') as f:
+                model = pickle.load(f)
+            with open(scaler_path, 'rb') as f:
+                scaler = pickle.load(f)
+        except FileNotFoundError:
+            self.invalidate(symbol)
+            return None
+        with self._lock:
+            if entry is None:
+                self.loads += 1
+            else:
+                self.reloads += 1
+        self._store(symbol, model, scaler, version, now)
+        return model, scaler
+
+    def put(self, symbol: str, model: Any, scaler: Any):
+        """Keep a freshly trained pair resident (its files must already be written)"""
+        version = self.version(symbol)
+        if version is not None:
+            self._store(symbol, model, scaler, version, time.monotonic())
+
+    def _store(self, symbol: str, model: Any, scaler: Any, version: Version, checked_at: float):
+        with self._lock:
+            self._entries[symbol] = _ResidentModel(model, scaler, version, checked_at)
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_models:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, symbol: str):
+        with self._lock:
+            self._entries.pop(symbol, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "models": len(self._entries),
+                "max_models": self.max_models,
+                "hits": self.hits,
+                "loads": self.loads,
+                "reloads": self.reloads,
+                "evictions": self.evictions
+            }
+
+
+_registries: Dict[str, ModelRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(model_dir: str, max_models: int = 256, check_interval_seconds: float = 5) -> ModelRegistry:
+    """Return the process-wide ModelRegistry for a model directory, shared by every ModelTrainer"""
+    key = os.path.abspath(model_dir)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = ModelRegistry(model_dir, max_models, check_interval_seconds)
+            _registries[key] = registry
+        return registry
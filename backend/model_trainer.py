@@ -1,61 +1,47 @@
 import numpy as np
-import pandas as pd
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 import pickle
 import os
-from typing import Dict, Any, Tuple
+import threading
+from typing import Dict, Any, Optional, Tuple
+import indicators
 from config import settings
+from model_registry import get_model_registry
 
 class ModelTrainer:
     def __init__(self):
         self.model_dir = settings.MODEL_DIR
         os.makedirs(self.model_dir, exist_ok=True)
+        # Trained models stay resident across requests, shared by every ModelTrainer
+        self.registry = get_model_registry(
+            self.model_dir,
+            max_models=settings.MODEL_REGISTRY_MAX_MODELS,
+            check_interval_seconds=settings.MODEL_REGISTRY_CHECK_SECONDS
+        )
     
-    def calculate_sma(self, prices: list, window: int) -> list:
+    def calculate_sma(self, prices, window: int) -> np.ndarray:
         """Calculate Simple Moving Average"""
-        df = pd.DataFrame({'price': prices})
-        sma = df['price'].rolling(window=window, min_periods=1).mean()
-        return sma.tolist()
+        return indicators.sma(prices, window)
     
-    def calculate_rsi(self, prices: list, period: int = 14) -> list:
+    def calculate_rsi(self, prices, period: int = 14) -> np.ndarray:
         """Calculate Relative Strength Index"""
-        df = pd.DataFrame({'price': prices})
-        delta = df['price'].diff()
-        
-        gain = (delta.where(delta > 0, 0)).rolling(window=period, min_periods=1).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period, min_periods=1).mean()
-        
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        rsi = rsi.fillna(50)  # Fill NaN with neutral value
-        return rsi.tolist()
+        return indicators.rsi(prices, period)
     
     def prepare_features(self, historical_data: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
         """Prepare features and target for model training"""
-        close_prices = historical_data['close']
+        close_prices = np.ascontiguousarray(historical_data['close'], dtype=np.float64)
         
         # Calculate technical indicators
         sma_5 = self.calculate_sma(close_prices, 5)
         sma_10 = self.calculate_sma(close_prices, 10)
         rsi_14 = self.calculate_rsi(close_prices, 14)
         
-        # Create feature matrix
-        features = []
-        targets = []
-        
-        # Start from index 10 to have enough data for indicators
-        for i in range(10, len(close_prices) - 1):
-            feature_row = [
-                close_prices[i],      # Current close
-                sma_5[i],             # SMA 5
-                sma_10[i],            # SMA 10
-                rsi_14[i],            # RSI 14
-            ]
-            features.append(feature_row)
-            targets.append(close_prices[i + 1])  # Next day close (target)
+        # Rows from index 10 (enough data for indicators), each targeting the next day's close
+        features = np.column_stack([close_prices, sma_5, sma_10, rsi_14])[10:-1]
+        targets = close_prices[11:]
         
-        return np.array(features), np.array(targets)
+        return features, targets
     
     def train_model(self, symbol: str, historical_data: Dict[str, Any]) -> Dict[str, Any]:
         """Train linear regression model for a specific symbol"""
@@ -83,14 +69,10 @@ class ModelTrainer:
         val_score = model.score(X_val_scaled, y_val)
         
         # Save model and scaler
-        model_path = os.path.join(self.model_dir, f"{symbol}_model.pkl")
-        scaler_path = os.path.join(self.model_dir, f"{symbol}_scaler.pkl")
-        
-        with open(model_path, 'wb') as f:
-            pickle.dump(model, f)
-        
-        with open(scaler_path, 'wb') as f:
-            pickle.dump(scaler, f)
+        model_path, scaler_path = self.registry.paths(symbol)
+        self._write_pickle(scaler_path, scaler)
+        self._write_pickle(model_path, model)
+        self.registry.put(symbol, model, scaler)
         
         return {
             "symbol": symbol,
@@ -102,24 +84,27 @@ class ModelTrainer:
             "validation_samples": len(X_val)
         }
     
+    def _write_pickle(self, path: str, obj: Any):
+        """Write a pickle atomically so other workers never load a half-written file"""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(tmp_path, path)
+    
     def load_model(self, symbol: str) -> Tuple[Any, Any]:
-        """Load trained model and scaler for a symbol"""
-        model_path = os.path.join(self.model_dir, f"{symbol}_model.pkl")
-        scaler_path = os.path.join(self.model_dir, f"{symbol}_scaler.pkl")
-        
-        if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+        """Load trained model and scaler for a symbol (from the resident registry when current)"""
+        pair = self.registry.get(symbol)
+        if pair is None:
             raise FileNotFoundError(f"Model not found for {symbol}. Please train first.")
-        
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        
-        with open(scaler_path, 'rb') as f:
-            scaler = pickle.load(f)
-        
-        return model, scaler
+        return pair
+    
+    def model_version(self, symbol: str) -> Optional[str]:
+        """Identity of the trained model files (changes on every retrain), None if not trained"""
+        version = self.registry.current_version(symbol)
+        if version is None:
+            return None
+        return ":".join(str(part) for file_version in version for part in file_version)
     
     def model_exists(self, symbol: str) -> bool:
         """Check if model exists for a symbol"""
-        model_path = os.path.join(self.model_dir, f"{symbol}_model.pkl")
-        scaler_path = os.path.join(self.model_dir, f"{symbol}_scaler.pkl")
-        return os.path.exists(model_path) and os.path.exists(scaler_path)
+        return self.registry.get(symbol) is not None
@@ -2,11 +2,11 @@
 News Fetcher and Sentiment Analyzer
 Fetches recent news about stocks and analyzes sentiment
 """
-import requests
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from datetime import datetime, timedelta
 from textblob import TextBlob
 from config import settings
+from http_client import get_session, request_timeout, async_http
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,32 +31,16 @@ class NewsAnalyzer:
             List of news articles with sentiment
         """
         try:
-            # Clean symbol for search
-            search_symbol = symbol.replace('.NS', '').replace('.BO', '')
-            
-            # Build search query
-            query = f'"{company_name}" OR "{search_symbol}" stock'
-            
-            # Calculate date range
-            to_date = datetime.now()
-            from_date = to_date - timedelta(days=days)
-            
             # Fetch news (with fallback if no API key)
             if not self.news_api_key or self.news_api_key == "":
                 logger.warning("NEWS_API_KEY not set, using mock news")
                 return self._get_mock_news(company_name)
             
-            params = {
-                'q': query,
-                'from': from_date.strftime('%Y-%m-%d'),
-                'to': to_date.strftime('%Y-%m-%d'),
-                'language': 'en',
-                'sortBy': 'relevancy',
-                'pageSize': 10,
-                'apiKey': self.news_api_key
-            }
-            
-            response = requests.get(self.news_api_url, params=params, timeout=10)
+            response = get_session().get(
+                self.news_api_url,
+                params=self._build_news_params(symbol, company_name, days),
+                timeout=request_timeout()
+            )
             
             if response.status_code == 200:
                 data = response.json()
@@ -70,6 +54,49 @@ class NewsAnalyzer:
             logger.error(f"Error fetching news: {str(e)}")
             return self._get_mock_news(company_name)
     
+    async def get_stock_news_async(self, symbol: str, company_name: str, days: int = 7) -> List[Dict]:
+        """get_stock_news for async endpoints, awaited on the pooled aiohttp client"""
+        try:
+            if not self.news_api_key or self.news_api_key == "":
+                logger.warning("NEWS_API_KEY not set, using mock news")
+                return self._get_mock_news(company_name)
+            
+            status, data = await async_http.get_json(
+                self.news_api_url, self._build_news_params(symbol, company_name, days)
+            )
+            
+            if status == 200:
+                return self._process_articles(data.get('articles', []))
+            else:
+                logger.error(f"News API error: {status}")
+                return self._get_mock_news(company_name)
+                
+        except Exception as e:
+            logger.error(f"Error fetching news: {str(e)}")
+            return self._get_mock_news(company_name)
+    
+    def _build_news_params(self, symbol: str, company_name: str, days: int) -> Dict[str, Any]:
+        """NewsAPI query parameters for a stock"""
+        # Clean symbol for search
+        search_symbol = symbol.replace('.NS', '').replace('.BO', '')
+        
+        # Build search query
+        query = f'"{company_name}" OR "{search_symbol}" stock'
+        
+        # Calculate date range
+        to_date = datetime.now()
+        from_date = to_date - timedelta(days=days)
+        
+        return {
+            'q': query,
+            'from': from_date.strftime('%Y-%m-%d'),
+            'to': to_date.strftime('%Y-%m-%d'),
+            'language': 'en',
+            'sortBy': 'relevancy',
+            'pageSize': 10,
+            'apiKey': self.news_api_key
+        }
+    
     def _process_articles(self, articles: List[Dict]) -> List[Dict]:
         """Process and analyze sentiment of articles"""
         processed = []
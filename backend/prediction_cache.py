@@ -0,0 +1,95 @@
+"""
+Versioned Prediction Cache
+Next-day forecasts keyed by the bar they were computed from and the model that computed them
+
+A forecast only changes when a new daily bar arrives (or the still-forming
+bar of the current session moves) or the model is retrained. Entries hold
+the last bar's date and close plus the model's file version; a lookup with
+any of them different is a miss, so retraining or fresh bars invalidate a
+forecast without anyone having to delete it. Only the latest forecast per
+symbol is kept, in the memory tier and in cache.db for other workers.
+"""
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from cache_db import CacheDatabase
+from cache_maintenance import CacheNamespace
+
+CREATE_PREDICTIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS predictions (
+        symbol TEXT PRIMARY KEY,
+        bar_date TEXT NOT NULL,
+        bar_close REAL NOT NULL,
+        model_version TEXT NOT NULL,
+        data TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+"""
+SELECT_PREDICTION_SQL = "SELECT bar_date, bar_close, model_version, data FROM predictions WHERE symbol = ?"
+UPSERT_PREDICTION_SQL = """
+    INSERT OR REPLACE INTO predictions (symbol, bar_date, bar_close, model_version, data, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+DELETE_PREDICTION_SQL = "DELETE FROM predictions WHERE symbol = ?"
+
+
+class PredictionCache:
+    """Latest forecast per symbol, valid for one (last bar, model version) pair"""
+
+    def __init__(self, db: CacheDatabase, memory=None, max_age_days: float = 7):
+        self.db = db
+        self.memory = memory
+        self.max_age_days = max_age_days
+        self.db.execute(CREATE_PREDICTIONS_SQL)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, symbol: str, bar_date: str, bar_close: float, model_version: str) -> Optional[Dict[str, Any]]:
+        """The cached forecast if it was computed from this bar with this model"""
+        key = (bar_date, float(bar_close), model_version)
+        entry = self.memory.get(("predictions", symbol)) if self.memory is not None else None
+        # Another worker may already have stored the forecast for a newer bar or model
+        if entry is None or entry[0] != key:
+            row = self.db.fetchone(SELECT_PREDICTION_SQL, (symbol,))
+            if row:
+                entry = (tuple(row[:3]), json.loads(row[3]))
+                if self.memory is not None:
+                    self.memory.set(("predictions", symbol), entry)
+        hit = entry is not None and entry[0] == key
+        self._count(hit)
+        return entry[1] if hit else None
+
+    def put(self, symbol: str, bar_date: str, bar_close: float, model_version: str, forecast: Dict[str, Any]):
+        """Store a forecast, replacing the symbol's previous one"""
+        key = (bar_date, float(bar_close), model_version)
+        self.db.execute(UPSERT_PREDICTION_SQL, (symbol, *key, json.dumps(forecast), time.time()))
+        if self.memory is not None:
+            self.memory.set(("predictions", symbol), (key, forecast))
+
+    def invalidate(self, symbol: str):
+        self.db.execute(DELETE_PREDICTION_SQL, (symbol,))
+        if self.memory is not None:
+            self.memory.delete(("predictions", symbol))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def cache_namespace(self) -> CacheNamespace:
+        # Forecasts of symbols nobody asked about for max_age_days are swept
+        return CacheNamespace(
+            "predictions",
+            entries_sql="SELECT symbol, length(data) + length(model_version) + 48, created_at FROM predictions",
+            delete_sqls=[DELETE_PREDICTION_SQL],
+            expired_sql=f"SELECT symbol FROM predictions WHERE created_at < ? - {self.max_age_days * 86400}"
+        )
@@ -1,66 +1,325 @@
 import numpy as np
-from typing import Dict, Any, Tuple
-from data_fetcher import DataFetcher
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+import indicators
+from analysis_context import AnalysisContext
+from cache_db import get_cache_database
+from config import settings
+from data_fetcher import DataFetcher, cache_maintenance, memory_tier
+from indicator_state import IndicatorStateStore
+from market_calendar import calendar_for_symbol
 from model_trainer import ModelTrainer
+from prediction_cache import PredictionCache
+
+# Forecasts shared by every Predictor (and every worker, through cache.db)
+prediction_cache = PredictionCache(
+    get_cache_database(settings.CACHE_DB_PATH),
+    memory_tier,
+    max_age_days=settings.PREDICTION_CACHE_MAX_AGE_DAYS
+)
+cache_maintenance.register(prediction_cache.cache_namespace())
+
+# Rolling SMA/RSI state per symbol, advanced bar by bar instead of recomputed
+indicator_states = IndicatorStateStore(get_cache_database(settings.CACHE_DB_PATH), memory_tier)
+cache_maintenance.register(indicator_states.cache_namespace())
+
+# Quote lookups of batch predictions run in parallel (most are memory tier hits)
+_batch_quote_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="batch-quote")
+
+# Closes needed for the latest features: RSI 14 looks at 14 deltas, i.e. 15 closes
+FEATURE_WINDOW = 15
+
+
+def latest_feature_matrix(closes: List[np.ndarray]) -> np.ndarray:
+    """
+    [close, sma_5, sma_10, rsi_14] of the last bar of each series, one row per series
+    
+    Same values as compute_features, computed for all series at once on a
+    panel of their last FEATURE_WINDOW closes, left-padded with NaN.
+    """
+    window = np.full((len(closes), FEATURE_WINDOW), np.nan)
+    for row, close in enumerate(closes):
+        tail = np.asarray(close[-FEATURE_WINDOW:], dtype=np.float64)
+        window[row, FEATURE_WINDOW - len(tail):] = tail
+    
+    return np.column_stack([
+        window[:, -1],
+        indicators.sma(window, 5)[:, -1],
+        indicators.sma(window, 10)[:, -1],
+        indicators.rsi(window, 14)[:, -1]
+    ])
+
+
+def _is_linear(model: Any, scaler: Any) -> bool:
+    """A fitted linear model behind a StandardScaler, which can be evaluated as array math"""
+    return hasattr(model, 'coef_') and hasattr(model, 'intercept_') and hasattr(scaler, 'mean_') and hasattr(scaler, 'scale_')
+
+
+def apply_models(models: List[Tuple[Any, Any]], features: np.ndarray) -> np.ndarray:
+    """
+    Predictions of per-row (model, scaler) pairs for a feature matrix
+    
+    Linear models are stacked into coefficient and scaler matrices and
+    evaluated in one pass: ((X - mean) / scale) . coef + intercept, row-wise.
+    Anything else falls back to its own transform/predict.
+    """
+    predicted = np.empty(len(models))
+    linear = [row for row, (model, scaler) in enumerate(models) if _is_linear(model, scaler)]
+    if linear:
+        pairs = [models[row] for row in linear]
+        n_features = features.shape[1]
+        mean = np.array([scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features) for _, scaler in pairs])
+        scale = np.array([scaler.scale_ if scaler.scale_ is not None else np.ones(n_features) for _, scaler in pairs])
+        coef = np.array([np.ravel(model.coef_) for model, _ in pairs])
+        intercept = np.array([float(np.ravel(model.intercept_)[0]) for model, _ in pairs])
+        predicted[linear] = np.einsum('ij,ij->i', (features[linear] - mean) / scale, coef) + intercept
+    linear_rows = set(linear)
+    for row, (model, scaler) in enumerate(models):
+        if row not in linear_rows:
+            predicted[row] = model.predict(scaler.transform(features[row:row + 1]))[0]
+    return predicted
 
 class Predictor:
     def __init__(self):
         self.data_fetcher = DataFetcher()
         self.model_trainer = ModelTrainer()
+        self.prediction_cache = prediction_cache
+        self.indicator_states = indicator_states
     
-    def predict_next_day(self, symbol: str) -> Dict[str, Any]:
-        """Predict next day closing price for a symbol"""
-        # Check if model exists, if not train it
+    def context(self, symbol: str) -> AnalysisContext:
+        """Fresh request-scoped context; pass it to every call made for the same request"""
+        return AnalysisContext(symbol, self)
+    
+    def load_or_train_model(self, symbol: str) -> Tuple[Any, Any]:
+        """Load model and scaler, training a model first if none exists"""
         if not self.model_trainer.model_exists(symbol):
             print(f"Model not found for {symbol}, training new model...")
             historical_data = self.data_fetcher.get_historical_data(symbol, days=90)
             train_result = self.model_trainer.train_model(symbol, historical_data)
             print(f"Model trained: {train_result}")
+        return self.model_trainer.load_model(symbol)
+    
+    def ensure_model_version(self, context: AnalysisContext) -> str:
+        """Version of the symbol's model, training one first if none exists"""
+        version = self.model_trainer.model_version(context.symbol)
+        if version is None:
+            context.model()
+            version = self.model_trainer.model_version(context.symbol)
+        return version
+    
+    def current_features(self, context: AnalysisContext) -> Dict[str, Any]:
+        """Indicator values of the latest bar, from the symbol's streaming indicator state"""
+        return self.indicator_states.sync(context.symbol, context.history(30)).features()
+    
+    def live_indicators(self, symbol: str, quote: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Indicators at a live quote's price, None for symbols without an indicator state yet"""
+        state = self.indicator_states.get(symbol)
+        if state is None:
+            return None
+        return state.preview(quote.get('latest_trading_day') or state.last_date, quote['price'])
+    
+    def get_indicators(self, symbol: str, verify: bool = False, context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
+        """
+        Latest SMA-5, SMA-10 and RSI-14 of a symbol, and their values at the current quote
         
-        # Load model and scaler
-        model, scaler = self.model_trainer.load_model(symbol)
+        With verify, the state is checked against a full recompute over the
+        recent history and rebuilt if they disagree.
+        """
+        context = context or self.context(symbol)
+        history = context.history(30)
+        state = self.indicator_states.sync(symbol, history)
+        result = {"symbol": symbol, "as_of": state.last_date}
         
-        # Get recent data for prediction
-        historical_data = self.data_fetcher.get_historical_data(symbol, days=30)
-        close_prices = historical_data['close']
+        if verify:
+            differences = state.verify(history['close'])
+            if differences:
+                print(f"Indicator state of {symbol} disagreed with a full recompute ({differences}), rebuilding")
+                state = self.indicator_states.rebuild(symbol, history)
+            result["verification"] = {"consistent": not differences, "differences": differences}
         
-        # Prepare current features
+        result["indicators"] = state.features()
+        quote = context.quote()
+        result["live"] = {
+            "price": quote['price'],
+            "date": quote.get('latest_trading_day') or state.last_date,
+            "indicators": state.preview(quote.get('latest_trading_day') or state.last_date, quote['price'])
+        }
+        return result
+    
+    def compute_features(self, historical_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Indicator values of the latest bar, recomputed from the whole series"""
+        close_prices = historical_data['close']
         sma_5 = self.model_trainer.calculate_sma(close_prices, 5)
         sma_10 = self.model_trainer.calculate_sma(close_prices, 10)
         rsi_14 = self.model_trainer.calculate_rsi(close_prices, 14)
+        return {
+            "close": float(close_prices[-1]),
+            "sma_5": float(sma_5[-1]),
+            "sma_10": float(sma_10[-1]),
+            "rsi_14": float(rsi_14[-1])
+        }
+    
+    def predict_next_day(self, symbol: str, context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
+        """Predict next day closing price for a symbol"""
+        return (context or self.context(symbol)).prediction()
+    
+    def build_prediction(self, context: AnalysisContext) -> Dict[str, Any]:
+        """Prediction node of an analysis context"""
+        symbol = context.symbol
+        historical_data = context.history(30)
+        bar_date = historical_data['dates'][-1]
+        bar_close = float(historical_data['close'][-1])
+        model_version = context.model_version()
         
-        # Create feature vector for latest data
-        current_features = np.array([[
-            close_prices[-1],  # Current close
-            sma_5[-1],         # SMA 5
-            sma_10[-1],        # SMA 10
-            rsi_14[-1],        # RSI 14
-        ]])
-        
-        # Scale and predict
-        current_features_scaled = scaler.transform(current_features)
-        predicted_price = model.predict(current_features_scaled)[0]
+        # The forecast only depends on the latest bar and the model, so it is reused until either changes
+        forecast = self.prediction_cache.get(symbol, bar_date, bar_close, model_version)
+        cache_maintenance.record("predictions", symbol, hit=forecast is not None)
+        if forecast is None:
+            model, scaler = context.model()
+            features = context.features()
+            
+            # Create feature vector for latest data
+            current_features = np.array([[
+                features['close'],   # Current close
+                features['sma_5'],   # SMA 5
+                features['sma_10'],  # SMA 10
+                features['rsi_14'],  # RSI 14
+            ]])
+            
+            # Scale and predict
+            current_features_scaled = scaler.transform(current_features)
+            forecast = {
+                "predicted_price": float(model.predict(current_features_scaled)[0]),
+                "features": {
+                    "sma_5": features['sma_5'],
+                    "sma_10": features['sma_10'],
+                    "rsi_14": features['rsi_14']
+                }
+            }
+            self.prediction_cache.put(symbol, bar_date, bar_close, model_version, forecast)
         
         # Get current quote
-        current_quote = self.data_fetcher.get_quote(symbol)
-        current_price = current_quote['price']
+        current_price = context.quote()['price']
+        predicted_price = forecast['predicted_price']
         
         return {
             "symbol": symbol,
             "current_price": float(current_price),
-            "predicted_price": float(predicted_price),
+            "predicted_price": predicted_price,
             "prediction_change": float(predicted_price - current_price),
             "prediction_change_percent": float((predicted_price - current_price) / current_price * 100),
-            "features": {
-                "sma_5": float(sma_5[-1]),
-                "sma_10": float(sma_10[-1]),
-                "rsi_14": float(rsi_14[-1])
-            }
+            "features": dict(forecast['features'])
         }
     
-    def generate_signal(self, symbol: str, portfolio_type: str = "balanced") -> Dict[str, Any]:
+    def predict_many(self, symbols: List[str]) -> Dict[str, Any]:
+        """
+        Predict next day closing prices for many symbols at once
+        
+        Histories come from one grouped get_historical_batch call, cached
+        forecasts are reused as in predict_next_day, and the remaining
+        symbols' features and models are evaluated as stacked arrays
+        (latest_feature_matrix, apply_models) instead of symbol by symbol.
+        
+        Returns:
+            {"predictions": {symbol: same dict as predict_next_day},
+             "errors": {symbol: message}} for the unique requested symbols
+        """
+        symbols = list(dict.fromkeys(symbols))
+        errors: Dict[str, str] = {}
+        
+        histories = self.data_fetcher.get_historical_batch(symbols, days=30)
+        for symbol in symbols:
+            if symbol not in histories or len(histories[symbol]['close']) == 0:
+                errors[symbol] = f"Unable to fetch historical data for {symbol}"
+        ready = [symbol for symbol in symbols if symbol not in errors]
+        
+        # Train missing models from one batched 90-day download
+        untrained = [symbol for symbol in ready if self.model_trainer.model_version(symbol) is None]
+        if untrained:
+            training_data = self.data_fetcher.get_historical_batch(untrained, days=90)
+            for symbol in untrained:
+                try:
+                    print(f"Model not found for {symbol}, training new model...")
+                    self.model_trainer.train_model(symbol, training_data[symbol])
+                except Exception as e:
+                    errors[symbol] = f"Model training failed for {symbol}: {e}"
+        ready = [symbol for symbol in ready if symbol not in errors]
+        
+        # Cached forecasts first; the rest is computed together
+        forecasts: Dict[str, Dict[str, Any]] = {}
+        pending = []
+        for symbol in ready:
+            history = histories[symbol]
+            key = (history['dates'][-1], float(history['close'][-1]), self.model_trainer.model_version(symbol))
+            forecast = self.prediction_cache.get(symbol, *key)
+            cache_maintenance.record("predictions", symbol, hit=forecast is not None)
+            if forecast is None:
+                pending.append((symbol, key))
+            else:
+                forecasts[symbol] = forecast
+        
+        models = []
+        for symbol, key in list(pending):
+            try:
+                models.append(self.model_trainer.load_model(symbol))
+            except Exception as e:
+                errors[symbol] = str(e)
+                pending.remove((symbol, key))
+        if pending:
+            features = latest_feature_matrix([histories[symbol]['close'] for symbol, _ in pending])
+            predicted = apply_models(models, features)
+            for row, (symbol, key) in enumerate(pending):
+                forecasts[symbol] = {
+                    "predicted_price": float(predicted[row]),
+                    "features": {
+                        "sma_5": float(features[row, 1]),
+                        "sma_10": float(features[row, 2]),
+                        "rsi_14": float(features[row, 3])
+                    }
+                }
+                self.prediction_cache.put(symbol, *key, forecasts[symbol])
+        
+        def quote_price(symbol: str) -> Optional[float]:
+            try:
+                return float(self.data_fetcher.get_quote(symbol)['price'])
+            except Exception as e:
+                errors[symbol] = f"Quote unavailable for {symbol}: {e}"
+                return None
+        
+        predicted_symbols = [symbol for symbol in ready if symbol in forecasts]
+        prices = dict(zip(predicted_symbols, _batch_quote_executor.map(quote_price, predicted_symbols)))
+        
+        predictions = {}
+        for symbol in predicted_symbols:
+            current_price = prices[symbol]
+            if current_price is None:
+                continue
+            predicted_price = forecasts[symbol]['predicted_price']
+            predictions[symbol] = {
+                "symbol": symbol,
+                "current_price": current_price,
+                "predicted_price": predicted_price,
+                "prediction_change": float(predicted_price - current_price),
+                "prediction_change_percent": float((predicted_price - current_price) / current_price * 100),
+                "features": dict(forecasts[symbol]['features'])
+            }
+        
+        return {"predictions": predictions, "errors": errors}
+    
+    def generate_signal(
+        self,
+        symbol: str,
+        portfolio_type: str = "balanced",
+        context: Optional[AnalysisContext] = None
+    ) -> Dict[str, Any]:
         """Generate buy/sell/hold signal with reasoning"""
-        prediction = self.predict_next_day(symbol)
+        return (context or self.context(symbol)).signal(portfolio_type)
+    
+    def build_signal(self, context: AnalysisContext, portfolio_type: str) -> Dict[str, Any]:
+        """Signal node of an analysis context"""
+        symbol = context.symbol
+        prediction = context.prediction()
         
         current_price = prediction['current_price']
         predicted_price = prediction['predicted_price']
@@ -145,34 +404,29 @@ class Predictor:
             }
         }
     
-    def get_chart_data(self, symbol: str) -> Dict[str, Any]:
+    def get_chart_data(self, symbol: str, context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
         """Get historical + predicted data for charting"""
-        # Get historical data
-        historical_data = self.data_fetcher.get_historical_data(symbol, days=30)
+        context = context or self.context(symbol)
+        
+        # Get historical data (the same 30 days the prediction's features come from)
+        historical_data = context.history(30)
         
         # Get prediction
-        prediction = self.predict_next_day(symbol)
+        prediction = context.prediction()
         
         # Prepare chart data
         dates = historical_data['dates']
         close_prices = historical_data['close']
         
-        # Add predicted point
-        from datetime import datetime, timedelta
-        last_date = datetime.strptime(dates[-1], "%Y-%m-%d")
-        next_date = last_date + timedelta(days=1)
-        
-        # Skip weekends for next trading day
-        while next_date.weekday() >= 5:  # 5=Saturday, 6=Sunday
-            next_date += timedelta(days=1)
-        
-        prediction_date = next_date.strftime("%Y-%m-%d")
+        # Add predicted point on the exchange's next trading day (skips weekends and holidays)
+        last_date = date.fromisoformat(dates[-1])
+        prediction_date = calendar_for_symbol(symbol).next_trading_day(last_date).isoformat()
         
         return {
             "symbol": symbol,
             "historical": {
                 "dates": dates,
-                "prices": close_prices
+                "prices": close_prices.tolist()
             },
             "prediction": {
                 "date": prediction_date,
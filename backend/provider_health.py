@@ -0,0 +1,284 @@
+"""
+Market Data Provider Health
+Token-bucket rate limits, circuit breakers and adaptive ordering for upstream providers
+"""
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+from cache_db import CacheDatabase
+
+CREATE_BUCKETS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS provider_buckets (
+        provider TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (provider, bucket)
+    )
+"""
+SELECT_BUCKETS_SQL = "SELECT bucket, tokens, updated FROM provider_buckets WHERE provider = ?"
+UPSERT_BUCKET_SQL = "INSERT OR REPLACE INTO provider_buckets (provider, bucket, tokens, updated) VALUES (?, ?, ?, ?)"
+
+
+class ProviderError(Exception):
+    """The provider itself failed (rate limit note, outage), as opposed to having no data"""
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `capacity` burst, refilled at `rate` tokens per second
+
+    Times are wall-clock, so the state can be handed between processes.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.time()
+
+    def _refill(self):
+        now = time.time()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, tokens: float = 1) -> bool:
+        """Whether `tokens` could be taken right now (does not take them)"""
+        self._refill()
+        return self.tokens >= tokens
+
+    def take(self, tokens: float = 1):
+        self._refill()
+        self.tokens -= tokens
+
+
+class CircuitBreaker:
+    """
+    Skip a provider after repeated failures
+
+    closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one trial call is let through (half-open), which
+    closes the breaker on success or re-opens it on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (claims the half-open trial slot)"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def release_trial(self):
+        """Give back a half-open trial slot that was claimed but not used"""
+        self._trial_running = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_running = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_running = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class CallStats:
+    """Moving averages of one kind of call (quotes, history, ...) to a provider"""
+
+    def __init__(self, smoothing: float):
+        self.smoothing = smoothing
+        self.success_rate = 1.0
+        self.latency = 0.0  # EWMA seconds
+        self.samples = 0
+        self.probed_at = time.monotonic()  # Last call or probe; only calls refresh the averages
+
+    def record(self, success: bool, latency: float):
+        a = self.smoothing
+        self.samples += 1
+        self.probed_at = time.monotonic()
+        self.success_rate = (1 - a) * self.success_rate + a * (1.0 if success else 0.0)
+        self.latency = latency if self.samples == 1 else (1 - a) * self.latency + a * latency
+
+    def expected_cost(self) -> float:
+        """Expected seconds spent per successful answer; lower is better"""
+        return self.latency / max(self.success_rate, 0.05)
+
+
+class ProviderHealth:
+    """
+    Rate limits, breaker and recent success/latency per kind of call for one provider
+
+    With `db` (the shared cache.db) the buckets' tokens live in
+    provider_buckets, so every worker process spends from one quota
+    instead of each getting the key's full allowance. Breaker and averages
+    stay per process.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        buckets: Optional[List[TokenBucket]] = None,
+        failure_threshold: int = 3,
+        reset_timeout: float = 60,
+        smoothing: float = 0.2,
+        db: Optional[CacheDatabase] = None
+    ):
+        self.name = name
+        self.buckets = buckets or []
+        self.db = db if self.buckets else None
+        if self.db is not None:
+            self.db.execute(CREATE_BUCKETS_TABLE_SQL)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.smoothing = smoothing
+        # A quote and a year of history cost very different amounts, so they are averaged apart
+        self.kinds: Dict[str, CallStats] = {}
+        self.calls = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Reserve one call: False if the breaker is open or a rate limit is exhausted"""
+        with self._lock:
+            # Plain read first: an exhausted quota must not queue every request on the write lock
+            if not self._buckets_available():
+                self.rate_limited += 1
+                return False
+            if not self.breaker.allow():
+                self.short_circuited += 1
+                return False
+            with self.db.transaction() if self.db is not None else nullcontext():
+                # Another worker may have spent the last token since the read above
+                if not self._buckets_available():
+                    self.breaker.release_trial()
+                    self.rate_limited += 1
+                    return False
+                for bucket in self.buckets:
+                    bucket.take()
+                self._save_buckets()
+            return True
+
+    def _buckets_available(self) -> bool:
+        if self.db is not None:
+            for index, tokens, updated in self.db.fetchall(SELECT_BUCKETS_SQL, (self.name,)):
+                if index < len(self.buckets):
+                    self.buckets[index].tokens = tokens
+                    self.buckets[index].updated = updated
+        return all(bucket.available() for bucket in self.buckets)
+
+    def _save_buckets(self):
+        if self.db is None:
+            return
+        for index, bucket in enumerate(self.buckets):
+            self.db.execute(UPSERT_BUCKET_SQL, (self.name, index, bucket.tokens, bucket.updated))
+
+    def record(self, kind: str, success: bool, latency: float):
+        """Feed the outcome of a call into the breaker and the kind's moving averages"""
+        with self._lock:
+            self.calls += 1
+            self.kinds.setdefault(kind, CallStats(self.smoothing)).record(success, latency)
+            if success:
+                self.breaker.record_success()
+            else:
+                self.failures += 1
+                self.breaker.record_failure()
+
+    def sampled(self, kind: str) -> bool:
+        return kind in self.kinds
+
+    def claim_probe(self, kind: str, interval: float) -> bool:
+        """Whether this kind has gone `interval` seconds without a call; claims the probe if so"""
+        with self._lock:
+            stats = self.kinds.get(kind)
+            if stats is None or time.monotonic() - stats.probed_at < interval:
+                return False
+            stats.probed_at = time.monotonic()
+            return True
+
+    def expected_cost(self, kind: str) -> float:
+        """Expected seconds per successful answer of this kind (0 before the first sample)"""
+        stats = self.kinds.get(kind)
+        return stats.expected_cost() if stats else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.breaker.state,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rate_limited": self.rate_limited,
+                "short_circuited": self.short_circuited,
+                "kinds": {
+                    kind: {
+                        "success_rate": round(stats.success_rate, 3),
+                        "latency_ms": round(stats.latency * 1000, 1),
+                        "samples": stats.samples
+                    }
+                    for kind, stats in self.kinds.items()
+                }
+            }
+
+
+class ProviderRouter:
+    """Order providers by recent success rate and latency"""
+
+    def __init__(self, providers: List[ProviderHealth], probe_interval: float = 900):
+        self.providers = {provider.name: provider for provider in providers}
+        # A demoted provider only gets calls when the others fail, so its
+        # averages would never show that it recovered
+        self.probe_interval = probe_interval
+
+    def __getitem__(self, name: str) -> ProviderHealth:
+        return self.providers[name]
+
+    def order(self, names: List[str], kind: str) -> List[str]:
+        """
+        Sort candidate providers for one kind of call, cheapest expected cost first
+
+        Providers whose breaker is open sink to the end. Costs are only
+        compared once every candidate has answered this kind of call: an
+        unsampled provider has no known cost, and ranking it first would
+        send all traffic to, say, the quota-limited fallback. Until then the
+        caller's default order holds.
+
+        A ranked-down provider that has not been called for probe_interval
+        seconds is moved to the front for one call, so its averages catch up
+        once it recovers.
+        """
+        def is_open(name: str) -> bool:
+            return self.providers[name].breaker.state == CircuitBreaker.OPEN
+
+        if not all(self.providers[name].sampled(kind) for name in names):
+            return sorted(names, key=is_open)
+        ranked = sorted(names, key=lambda name: (is_open(name), self.providers[name].expected_cost(kind)))
+        for name in ranked[1:]:
+            if not is_open(name) and self.providers[name].claim_probe(kind, self.probe_interval):
+                ranked.remove(name)
+                ranked.insert(0, name)
+                break
+        return ranked
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: provider.snapshot() for name, provider in self.providers.items()}
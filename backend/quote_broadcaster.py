@@ -0,0 +1,136 @@
+"""
+Live Quote Fan-Out
+One poller per subscribed symbol, pushing each new quote to every WebSocket subscriber
+
+However many clients watch a symbol, its quote is fetched once per poll
+interval (through the normal cached quote path). Each subscriber keeps at
+most one pending message per symbol: when a client reads slower than
+quotes arrive, newer quotes replace the unsent ones instead of queueing,
+so memory stays bounded and a slow client always catches up to the latest
+price rather than replaying stale ones.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+
+class QuoteSubscriber:
+    """Latest-wins outbox of one connection, keyed by symbol (or control message kind)"""
+
+    def __init__(self):
+        self.symbols: Set[str] = set()
+        self.coalesced = 0
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, key: str, message: Dict[str, Any]):
+        """Queue a message, replacing any unsent one with the same key"""
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = message
+        self._ready.set()
+
+    async def next_batch(self) -> List[Dict[str, Any]]:
+        """Wait for pending messages and take all of them, oldest key first"""
+        await self._ready.wait()
+        batch, self._pending = list(self._pending.values()), {}
+        self._ready.clear()
+        return batch
+
+
+def _quote_changed(previous: Optional[Dict[str, Any]], quote: Dict[str, Any]) -> bool:
+    """Whether a poll result is worth pushing, given the last message sent for the symbol"""
+    if previous is None or previous["type"] != "quote":
+        return True
+    data = previous["data"]
+    return any(data.get(field) != quote.get(field) for field in ("price", "change", "volume", "latest_trading_day"))
+
+
+class QuoteBroadcaster:
+    """Shared per-symbol quote pollers with fan-out to subscribers"""
+
+    def __init__(
+        self,
+        fetch_quote: Callable[[str], Awaitable[Dict[str, Any]]],
+        interval_seconds: float = 5,
+        max_symbols_per_client: int = 50
+    ):
+        self.fetch_quote = fetch_quote
+        self.interval_seconds = interval_seconds
+        self.max_symbols_per_client = max_symbols_per_client
+        self._subscribers: Dict[str, Set[QuoteSubscriber]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self.fetches = 0
+        self.deliveries = 0
+
+    def subscribe(self, subscriber: QuoteSubscriber, symbol: str) -> bool:
+        """Add a symbol to a subscriber; False when the per-client limit is reached"""
+        if symbol in subscriber.symbols:
+            return True
+        if len(subscriber.symbols) >= self.max_symbols_per_client:
+            return False
+        subscriber.symbols.add(symbol)
+        self._subscribers.setdefault(symbol, set()).add(subscriber)
+        # Late joiners get the last known quote right away
+        if symbol in self._latest:
+            subscriber.offer(symbol, self._latest[symbol])
+        if symbol not in self._pollers:
+            self._pollers[symbol] = asyncio.create_task(self._poll(symbol), name=f"quote-poller-{symbol}")
+        return True
+
+    def unsubscribe(self, subscriber: QuoteSubscriber, symbol: str):
+        """Remove a symbol from a subscriber; the poller stops with its last subscriber"""
+        subscriber.symbols.discard(symbol)
+        subscribers = self._subscribers.get(symbol)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[symbol]
+            self._latest.pop(symbol, None)
+            poller = self._pollers.pop(symbol, None)
+            if poller is not None:
+                poller.cancel()
+
+    def remove(self, subscriber: QuoteSubscriber):
+        """Drop every subscription of a closed connection"""
+        for symbol in list(subscriber.symbols):
+            self.unsubscribe(subscriber, symbol)
+
+    def _publish(self, symbol: str, message: Dict[str, Any]):
+        for subscriber in self._subscribers.get(symbol, ()):
+            subscriber.offer(symbol, message)
+            self.deliveries += 1
+
+    async def _poll(self, symbol: str):
+        while True:
+            try:
+                self.fetches += 1
+                quote = await self.fetch_quote(symbol)
+                if _quote_changed(self._latest.get(symbol), quote):
+                    self._latest[symbol] = {"type": "quote", "symbol": symbol, "data": quote}
+                    self._publish(symbol, self._latest[symbol])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Report a failure once, not on every retry
+                if self._latest.get(symbol, {}).get("type") != "error":
+                    self._latest[symbol] = {"type": "error", "symbol": symbol, "detail": str(e)}
+                    self._publish(symbol, self._latest[symbol])
+            await asyncio.sleep(self.interval_seconds)
+
+    async def close(self):
+        """Stop every poller (app shutdown)"""
+        pollers = list(self._pollers.values())
+        self._pollers.clear()
+        for poller in pollers:
+            poller.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self._pollers),
+            "subscriptions": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "fetches": self.fetches,
+            "deliveries": self.deliveries
+        }
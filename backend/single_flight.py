@@ -0,0 +1,132 @@
+"""
+Single-Flight Request Coalescing
+Concurrent calls for the same key share one execution and its result
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+
+class _Call:
+    """One in-flight execution and the result every waiter will receive"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.owner = threading.get_ident()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+        # Coroutines waiting for the result, resolved on their own loop
+        self.futures: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def resolve(self, future: asyncio.Future):
+        if future.done():
+            return
+        if self.error is not None:
+            future.set_exception(self.error)
+        else:
+            future.set_result(self.result)
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one upstream request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) unless a call with the same key is already running
+
+        Callers that arrive while the first call is running block until it
+        finishes and receive the same result (or the same exception). The
+        result object is shared, so callers must treat it as read-only.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            # A nested call for the same key from the leading thread would wait on itself
+            if call is not None and call.owner != threading.get_ident():
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    async def do_async(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Await the coroutine fn(*args, **kwargs), sharing in-flight calls with do()
+
+        A coroutine arriving while a thread is fetching the key waits for that
+        result without holding a thread, and threads arriving while the
+        coroutine runs block on it like on any other call, so sync and async
+        endpoints never fetch the same key twice at once.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+            call.futures.append((loop, waiter))
+
+        if leader:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda done: self._finish_task(key, call, done))
+        # Shield so one caller giving up does not cancel the fetch for the others
+        return await asyncio.shield(waiter)
+
+    def _finish_task(self, key: Hashable, call: _Call, task: asyncio.Future):
+        if task.cancelled():
+            call.error = asyncio.CancelledError()
+        elif task.exception() is not None:
+            call.error = task.exception()
+        else:
+            call.result = task.result()
+        self._finish(key, call)
+
+    def _finish(self, key: Hashable, call: _Call):
+        """Release the key and hand the outcome to every waiting thread and coroutine"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            futures, call.futures = call.futures, []
+        call.event.set()
+        for loop, future in futures:
+            try:
+                loop.call_soon_threadsafe(call.resolve, future)
+            except RuntimeError:
+                pass  # That caller's loop has already closed
+
+    def in_flight(self) -> int:
+        """Number of keys currently being fetched"""
+        with self._lock:
+            return len(self._calls)
+
@@ -0,0 +1,135 @@
+"""
+Test the request-scoped analysis context: one quote, one model load and one indicator state sync per analysis
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from advisor import StockAdvisor
+from analysis_context import AnalysisContext
+from cache_db import CacheDatabase
+from indicator_state import IndicatorStateStore
+from model_trainer import ModelTrainer
+from prediction_cache import PredictionCache
+from predictor import Predictor
+from trading_strategy import TradingStrategy
+
+
+class CountingFetcher:
+    def __init__(self):
+        self.calls = {"quote": 0, "history": 0}
+
+    def get_quote(self, symbol):
+        self.calls["quote"] += 1
+        return {"symbol": symbol, "price": 100.0, "change_percent": "1.0%"}
+
+    def get_historical_data(self, symbol, days=90):
+        self.calls["history"] += 1
+        close = np.linspace(90.0, 100.0, 30)
+        dates = [str(day) for day in np.arange("2026-01-01", 30, dtype="datetime64[D]")]
+        return {"symbol": symbol, "dates": dates, "close": close}
+
+
+class FakeModel:
+    def predict(self, features):
+        return np.array([104.0])
+
+
+class FakeScaler:
+    def transform(self, features):
+        return features
+
+
+class CountingTrainer(ModelTrainer):
+    def __init__(self):
+        self.loads = 0
+        self.indicator_passes = 0
+
+    def model_exists(self, symbol):
+        return True
+
+    def model_version(self, symbol):
+        return "v1"
+
+    def load_model(self, symbol):
+        self.loads += 1
+        return FakeModel(), FakeScaler()
+
+    def calculate_rsi(self, prices, period=14):
+        self.indicator_passes += 1
+        return super().calculate_rsi(prices, period)
+
+
+def _predictor():
+    predictor = Predictor.__new__(Predictor)
+    predictor.data_fetcher = CountingFetcher()
+    predictor.model_trainer = CountingTrainer()
+    db = CacheDatabase(os.path.join(tempfile.mkdtemp(), "cache.db"))
+    predictor.prediction_cache = PredictionCache(db)
+    predictor.indicator_states = IndicatorStateStore(db)
+    return predictor
+
+
+def test_nodes_are_computed_once():
+    predictor = _predictor()
+    context = predictor.context("AAPL")
+
+    prediction = predictor.predict_next_day("AAPL", context=context)
+    signal = predictor.generate_signal("AAPL", "aggressive", context=context)
+    chart = predictor.get_chart_data("AAPL", context=context)
+
+    assert prediction["predicted_price"] == 104.0
+    assert signal["signal"] == "BUY"  # +4% clears the aggressive 1% threshold
+    assert chart["prediction"]["price"] == 104.0
+    assert predictor.data_fetcher.calls == {"quote": 1, "history": 1}
+    assert predictor.model_trainer.loads == 1
+    assert predictor.model_trainer.indicator_passes == 0
+    assert predictor.indicator_states.stats()["rebuilds"] == 1
+    assert all(count == 1 for count in context.computed.values())
+    print("✓ Prediction, signal and chart share one quote, one history read, one model load and one state sync")
+
+    # Without a context each call stands alone, but the cached forecast spares the model
+    predictor.generate_signal("AAPL")
+    assert predictor.data_fetcher.calls["quote"] == 2
+    assert predictor.model_trainer.loads == 1
+    assert predictor.indicator_states.stats()["rebuilds"] == 1
+    print("✓ A later request reuses the cached forecast: no model load, no indicators")
+
+
+def test_signals_are_memoized_per_portfolio_type():
+    context = AnalysisContext("AAPL", _predictor())
+    assert context.signal("long_term")["signal"] == "BUY"
+    assert context.signal("balanced") is context.signal("balanced")
+    assert context.computed[("signal", "long_term")] == 1
+    assert context.computed[("signal", "balanced")] == 1
+    assert context.computed["prediction"] == 1
+    print("✓ Each portfolio type gets its own signal on top of one prediction")
+
+
+def test_advisor_analysis_uses_one_context():
+    predictor = _predictor()
+    advisor = StockAdvisor.__new__(StockAdvisor)
+    advisor.predictor = predictor
+    advisor.data_fetcher = predictor.data_fetcher
+    advisor.news_analyzer = type("NoNews", (), {"get_overall_sentiment": lambda self, articles: {"label": "neutral", "score": 0}})()
+    advisor.trading_strategy = TradingStrategy()
+
+    result = advisor.analyze_investment("AAPL", "Apple", portfolio_type="balanced", budget=10000, news_articles=[])
+    assert result["success"], result
+    assert result["trading_plan"] is not None
+    assert predictor.data_fetcher.calls == {"quote": 1, "history": 1}
+    assert predictor.model_trainer.loads == 1
+    assert predictor.model_trainer.indicator_passes == 0
+    assert predictor.indicator_states.stats()["rebuilds"] == 1
+    print("✓ /analyze pipeline: 1 quote lookup, 1 model load, no full indicator recompute")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ANALYSIS CONTEXT TESTS")
+    print("=" * 60)
+    test_nodes_are_computed_once()
+    test_signals_are_memoized_per_portfolio_type()
+    test_advisor_analysis_uses_one_context()
+    print("\nAll analysis context tests passed!")
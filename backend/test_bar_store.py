@@ -0,0 +1,137 @@
+"""
+Test the columnar OHLCV bar store
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from cache_db import CacheDatabase
+from bar_store import BarStore
+from compressed_bar_store import CompressedBarStore
+from mmap_bar_store import MmapBarStore
+
+
+def _sample_bars(dates, start_price=100.0):
+    n = len(dates)
+    close = start_price + np.arange(n, dtype=np.float64)
+    return {
+        "dates": dates,
+        "open": close - 0.5,
+        "high": close + 1.0,
+        "low": close - 1.0,
+        "close": close,
+        "volume": np.full(n, 1_000_000.0)
+    }
+
+
+def test_round_trip_returns_arrays():
+    """Bars come back as contiguous float64 arrays, sliced by date"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+        store = BarStore(db)
+        dates = ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+        store.write_bars("AAPL", _sample_bars(dates), "yfinance", "2024-01-01", time.time())
+
+        bars = store.read_bars("AAPL")
+        assert bars["dates"] == dates
+        assert isinstance(bars["close"], np.ndarray)
+        assert bars["close"].dtype == np.float64
+        assert bars["close"].flags["C_CONTIGUOUS"]
+        assert bars["close"].tolist() == [100.0, 101.0, 102.0, 103.0]
+        print(f"✓ Read {len(bars['dates'])} bars as NumPy arrays")
+
+        window = store.read_bars("AAPL", "2024-01-04")
+        assert window["dates"] == ["2024-01-04", "2024-01-05"]
+        assert window["close"].tolist() == [102.0, 103.0]
+        print("✓ Range read sliced by date")
+
+        assert store.read_bars("MSFT")["close"].size == 0
+        db.close_all()
+
+
+def test_meta_tracks_coverage():
+    """Meta keeps the earliest covered date and latest bar across writes"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+        store = BarStore(db)
+        store.write_bars("TCS.NS", _sample_bars(["2024-02-01", "2024-02-02"]), "yfinance", "2024-01-25", 1.0)
+        store.write_bars("TCS.NS", _sample_bars(["2024-01-30", "2024-01-31"]), "yfinance", "2024-01-29", 2.0)
+
+        meta = store.get_meta("TCS.NS")
+        assert meta["covered_from"] == "2024-01-25", meta
+        assert meta["last_date"] == "2024-02-02", meta
+        assert meta["fetched_at"] == 2.0
+        assert len(store.read_bars("TCS.NS")["dates"]) == 4
+        print(f"✓ Meta: {meta}")
+        db.close_all()
+
+
+def test_mmap_store_zero_copy_and_atomic_append():
+    """mmap backend returns read-only views onto the file and sees appends from other writers"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+        store = MmapBarStore(db, os.path.join(tmpdir, "bars"))
+        other_worker = MmapBarStore(db, os.path.join(tmpdir, "bars"))
+        store.write_bars("AAPL", _sample_bars(["2024-01-02", "2024-01-03", "2024-01-04"]), "yfinance", "2024-01-01", 1.0)
+
+        bars = other_worker.read_bars("AAPL")
+        assert bars["dates"] == ["2024-01-02", "2024-01-03", "2024-01-04"]
+        assert bars["close"].tolist() == [100.0, 101.0, 102.0]
+        assert isinstance(bars["close"].base, np.memmap) or isinstance(bars["close"].base.base, np.memmap)
+        assert not bars["close"].flags["WRITEABLE"]
+        print("✓ Read-only views onto the mapped file")
+
+        # Overlapping append: the re-sent last bar is replaced, not duplicated
+        update = _sample_bars(["2024-01-04", "2024-01-05"], start_price=200.0)
+        store.write_bars("AAPL", update, "yfinance", "2024-01-04", 2.0)
+        assert bars["close"].tolist() == [100.0, 101.0, 102.0]  # old snapshot stays consistent
+        fresh = other_worker.read_bars("AAPL", "2024-01-03")
+        assert fresh["dates"] == ["2024-01-03", "2024-01-04", "2024-01-05"]
+        assert fresh["close"].tolist() == [101.0, 200.0, 201.0]
+        assert other_worker.get_meta("AAPL")["covered_from"] == "2024-01-01"
+        print("✓ Append swapped in atomically and picked up by another reader")
+
+        namespace = store.cache_namespace()
+        assert namespace.entries(db)[0][1] == os.path.getsize(store.path("AAPL"))
+        with db.transaction() as conn:
+            namespace.delete(conn, "AAPL")
+        assert store.get_meta("AAPL") is None and not os.path.exists(store.path("AAPL"))
+        print("✓ Evicting a series unlinks its file")
+        db.close_all()
+
+
+def test_backends_merge_writes_alike():
+    """Every backend merges overlapping writes the same way: sorted by date, newest bar wins"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+        stores = {
+            "sqlite": BarStore(db),
+            "mmap": MmapBarStore(db, os.path.join(tmpdir, "bars")),
+            "compressed": CompressedBarStore(db)
+        }
+        results = {}
+        for name, store in stores.items():
+            symbol = f"AAPL_{name}"
+            store.write_bars(symbol, _sample_bars(["2024-01-04", "2024-01-05", "2024-01-08"]), "yfinance", "2024-01-04", time.time())
+            # Backfill out of order, overlapping one stored date with a revised bar
+            store.write_bars(symbol, _sample_bars(["2024-01-03", "2024-01-02", "2024-01-04"], 50.0), "yfinance", "2024-01-01", time.time())
+            store.write_bars(symbol, _sample_bars([]), "yfinance", "2023-12-01", time.time())
+            bars = store.read_bars(symbol)
+            results[name] = (bars["dates"], bars["close"].tolist(), store.get_meta(symbol)["covered_from"])
+
+        assert results["sqlite"] == results["mmap"] == results["compressed"], results
+        assert results["sqlite"] == (
+            ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05", "2024-01-08"],
+            [51.0, 50.0, 52.0, 101.0, 102.0],
+            "2023-12-01"
+        )
+        print("✓ sqlite, mmap and compressed backends merge writes identically")
+
+
+if __name__ == "__main__":
+    test_round_trip_returns_arrays()
+    test_meta_tracks_coverage()
+    test_backends_merge_writes_alike()
+    test_mmap_store_zero_copy_and_atomic_append()
@@ -0,0 +1,148 @@
+"""
+Test batch prediction: vectorized features and stacked linear models match the per-symbol path
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from cache_db import CacheDatabase
+from model_trainer import ModelTrainer
+from indicator_state import IndicatorStateStore
+from prediction_cache import PredictionCache
+from predictor import Predictor, apply_models, latest_feature_matrix
+
+
+def _series(length: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 100 + np.cumsum(rng.normal(0, 1.5, length))
+
+
+def _fit(seed: int):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(100, 10, (40, 4))
+    scaler = StandardScaler().fit(X)
+    model = LinearRegression().fit(scaler.transform(X), X @ rng.random(4) + rng.normal(0, 1, 40))
+    return model, scaler
+
+
+class BatchFetcher:
+    def __init__(self, histories):
+        self.histories = histories
+        self.batch_calls = 0
+        self.single_calls = 0
+
+    def get_historical_batch(self, symbols, days=90, max_age_hours=24):
+        self.batch_calls += 1
+        return {symbol: self.histories[symbol] for symbol in symbols if symbol in self.histories}
+
+    def get_historical_data(self, symbol, days=90, max_age_hours=24):
+        self.single_calls += 1
+        return self.histories[symbol]
+
+    def get_quote(self, symbol):
+        return {"symbol": symbol, "price": float(self.histories[symbol]["close"][-1])}
+
+
+class FittedTrainer(ModelTrainer):
+    def __init__(self, models):
+        self.models = models
+        self.loads = 0
+
+    def model_version(self, symbol):
+        return "v1"
+
+    def model_exists(self, symbol):
+        return True
+
+    def load_model(self, symbol):
+        self.loads += 1
+        return self.models[symbol]
+
+
+def _pandas_features(close):
+    """The DataFrame-based indicators ModelTrainer used before indicators.py"""
+    price = pd.Series(close)
+    delta = price.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14, min_periods=1).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
+    rsi = (100 - (100 / (1 + gain / loss))).fillna(50)
+    return [
+        close[-1],
+        price.rolling(window=5, min_periods=1).mean().iloc[-1],
+        price.rolling(window=10, min_periods=1).mean().iloc[-1],
+        rsi.iloc[-1]
+    ]
+
+
+def test_feature_matrix_matches_pandas():
+    closes = [_series(length, seed) for seed, length in enumerate([1, 2, 5, 14, 15, 16, 21, 30])]
+    closes.append(np.full(20, 50.0))          # flat: RSI 50
+    closes.append(np.linspace(10, 30, 20))    # only gains: RSI 100
+    matrix = latest_feature_matrix(closes)
+    for row, close in enumerate(closes):
+        expected = _pandas_features(close)
+        assert np.allclose(matrix[row], expected, rtol=1e-12), (row, matrix[row], expected)
+    print(f"✓ Vectorized features equal the pandas indicators for {len(closes)} series (1 to 30 bars)")
+
+
+def test_stacked_models_match_sklearn():
+    models = [_fit(seed) for seed in range(25)]
+    features = np.random.default_rng(7).normal(100, 10, (25, 4))
+    expected = [model.predict(scaler.transform(features[row:row + 1]))[0] for row, (model, scaler) in enumerate(models)]
+    assert np.allclose(apply_models(models, features), expected)
+    print("✓ Stacked scaler/linear model evaluation equals sklearn predict row by row")
+
+
+def test_predict_many_matches_predict_next_day():
+    symbols = [f"SYM{i}" for i in range(12)]
+    histories = {}
+    for seed, symbol in enumerate(symbols):
+        close = _series(21, seed)
+        dates = [str(day) for day in np.arange("2026-09-14", 21, dtype="datetime64[D]")]
+        histories[symbol] = {"symbol": symbol, "dates": dates, "close": close}
+    models = {symbol: _fit(seed) for seed, symbol in enumerate(symbols)}
+
+    predictor = Predictor.__new__(Predictor)
+    predictor.data_fetcher = BatchFetcher(histories)
+    predictor.model_trainer = FittedTrainer(models)
+    db = CacheDatabase(os.path.join(tempfile.mkdtemp(), "cache.db"))
+    predictor.prediction_cache = PredictionCache(db)
+    predictor.indicator_states = IndicatorStateStore(db)
+
+    result = predictor.predict_many(symbols + ["SYM0", "MISSING"])
+    assert list(result["errors"]) == ["MISSING"]
+    assert list(result["predictions"]) == symbols
+    assert predictor.data_fetcher.batch_calls == 1 and predictor.data_fetcher.single_calls == 0
+    print("✓ One batched history read, unknown symbols reported per symbol")
+
+    # Compare against the single-symbol path (without its cache)
+    db = CacheDatabase(os.path.join(tempfile.mkdtemp(), "cache.db"))
+    predictor.prediction_cache = PredictionCache(db)
+    predictor.indicator_states = IndicatorStateStore(db)
+    for symbol in symbols:
+        single = predictor.predict_next_day(symbol)
+        batch = result["predictions"][symbol]
+        assert np.isclose(single["predicted_price"], batch["predicted_price"])
+        assert np.allclose(list(single["features"].values()), list(batch["features"].values()))
+    print("✓ Batch predictions equal predict_next_day for every symbol")
+
+    # A repeated batch is served from the prediction cache
+    loads = predictor.model_trainer.loads
+    again = predictor.predict_many(symbols)
+    assert predictor.model_trainer.loads == loads
+    assert again["predictions"]["SYM3"]["predicted_price"] == result["predictions"]["SYM3"]["predicted_price"]
+    print("✓ A repeated batch reuses cached forecasts without loading models")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("BATCH PREDICTION TESTS")
+    print("=" * 60)
+    test_feature_matrix_matches_pandas()
+    test_stacked_models_match_sklearn()
+    test_predict_many_matches_predict_next_day()
+    print("\nAll batch prediction tests passed!")
@@ -0,0 +1,100 @@
+"""
+Test the shared SQLite connection layer used by the DataFetcher cache
+"""
+import os
+import tempfile
+import threading
+
+from cache_db import CacheDatabase, get_cache_database
+
+
+def _make_db(tmpdir):
+    db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+    db.execute("CREATE TABLE IF NOT EXISTS cache (symbol TEXT PRIMARY KEY, data TEXT, timestamp REAL)")
+    return db
+
+
+def test_wal_and_thread_connections():
+    """Each thread gets its own WAL-mode connection"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = _make_db(tmpdir)
+        mode = db.fetchone("PRAGMA journal_mode")[0]
+        assert mode == "wal", mode
+        print(f"✓ journal_mode = {mode}")
+
+        main_conn = db.connection()
+        assert db.connection() is main_conn
+
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(db.connection()))
+        thread.start()
+        thread.join()
+        assert seen[0] is not main_conn
+        print("✓ Separate connection per thread")
+        db.close_all()
+
+
+def test_concurrent_writers():
+    """Many threads writing at once all land without lock errors"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = _make_db(tmpdir)
+        errors = []
+
+        def writer(n):
+            try:
+                for i in range(50):
+                    db.execute(
+                        "INSERT OR REPLACE INTO cache (symbol, data, timestamp) VALUES (?, ?, ?)",
+                        (f"T{n}_{i}", "{}", 0.0)
+                    )
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors, errors
+        count = db.fetchone("SELECT COUNT(*) FROM cache")[0]
+        assert count == 8 * 50, count
+        print(f"✓ {count} rows written by 8 threads")
+        db.close_all()
+
+
+def test_batched_transaction():
+    """Writes inside transaction() commit together or not at all"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = _make_db(tmpdir)
+        db.executemany(
+            "INSERT OR REPLACE INTO cache (symbol, data, timestamp) VALUES (?, ?, ?)",
+            [(f"S{i}", "{}", 0.0) for i in range(10)]
+        )
+        assert db.fetchone("SELECT COUNT(*) FROM cache")[0] == 10
+
+        try:
+            with db.transaction() as conn:
+                conn.execute("DELETE FROM cache")
+                with db.transaction():
+                    conn.execute("INSERT INTO cache (symbol, data, timestamp) VALUES ('X', '{}', 0)")
+                raise RuntimeError("abort batch")
+        except RuntimeError:
+            pass
+
+        assert db.fetchone("SELECT COUNT(*) FROM cache")[0] == 10
+        print("✓ Failed batch rolled back as a unit")
+        db.close_all()
+
+
+def test_shared_instance_per_path():
+    """DataFetcher instances pointing at the same file share one pool"""
+    assert get_cache_database("cache.db") is get_cache_database(os.path.abspath("cache.db"))
+    print("✓ One CacheDatabase per path")
+
+
+if __name__ == "__main__":
+    test_wal_and_thread_connections()
+    test_concurrent_writers()
+    test_batched_transaction()
+    test_shared_instance_per_path()
@@ -0,0 +1,96 @@
+"""
+Test cache.db maintenance: TTL sweep, size-bounded eviction and compaction
+"""
+import os
+import tempfile
+import time
+
+from cache_db import CacheDatabase
+from cache_maintenance import CacheMaintenance, CacheNamespace
+from memory_cache import MemoryCache
+
+
+def _make_maintenance(tmpdir, max_bytes=10 * 1024 * 1024, policy="lru"):
+    db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+    db.execute("CREATE TABLE cache (symbol TEXT PRIMARY KEY, data TEXT, timestamp REAL, expires_at REAL)")
+    memory = MemoryCache(max_bytes=1024 * 1024)
+    maintenance = CacheMaintenance(db, max_bytes=max_bytes, policy=policy, memory=memory)
+    maintenance.register(CacheNamespace(
+        "cache",
+        entries_sql="SELECT symbol, length(data) + length(symbol) + 32, timestamp FROM cache",
+        delete_sqls=["DELETE FROM cache WHERE symbol = ?"],
+        expired_sql="SELECT symbol FROM cache WHERE expires_at < ?"
+    ))
+    return db, memory, maintenance
+
+
+def _fill(db, count, payload_bytes, ttl=3600):
+    now = time.time()
+    db.executemany(
+        "INSERT OR REPLACE INTO cache (symbol, data, timestamp, expires_at) VALUES (?, ?, ?, ?)",
+        [(f"SYM{i}", "x" * payload_bytes, now - count + i, now + ttl) for i in range(count)]
+    )
+
+
+def test_sweep_expired_rows():
+    """Rows past expires_at are deleted from SQLite and the memory tier"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db, memory, maintenance = _make_maintenance(tmpdir)
+        _fill(db, 5, 100)
+        db.execute("UPDATE cache SET expires_at = 0 WHERE symbol IN ('SYM0', 'SYM1')")
+        memory.set(("cache", "SYM0"), {"price": 1.0})
+
+        assert maintenance.sweep_expired() == 2
+        assert db.fetchone("SELECT COUNT(*) FROM cache")[0] == 3
+        assert memory.get(("cache", "SYM0")) is None
+        print("✓ Swept 2 expired rows")
+        db.close_all()
+
+
+def test_lru_and_lfu_eviction():
+    """Over budget, the least recently (or least frequently) used entries go first"""
+    for policy in ("lru", "lfu"):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db, _, maintenance = _make_maintenance(tmpdir, policy=policy)
+            _fill(db, 200, 4000)
+            maintenance.max_bytes = maintenance.used_bytes() // 2
+
+            # SYM0 is the oldest entry but the only one read, twice
+            maintenance.record("cache", "SYM0", hit=True)
+            maintenance.record("cache", "SYM0", hit=True)
+            maintenance.record("cache", "SYM7", hit=False)
+            maintenance.flush_access()
+
+            evicted = maintenance.evict()
+            remaining = {row[0] for row in db.fetchall("SELECT symbol FROM cache")}
+            assert evicted > 0 and "SYM0" in remaining, (policy, evicted)
+            assert "SYM1" not in remaining
+            assert "SYM199" in remaining
+
+            stats = maintenance.stats()["namespaces"]["cache"]
+            assert stats["hits"] == 2 and stats["misses"] == 1, stats
+            print(f"✓ {policy.upper()} evicted {evicted} entries, hit rate {stats['hit_rate']}")
+            db.close_all()
+
+
+def test_incremental_vacuum_shrinks_file():
+    """Deleted pages are handed back to the filesystem without a full VACUUM per run"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db, _, maintenance = _make_maintenance(tmpdir)
+        maintenance.enable_incremental_vacuum()
+        assert db.fetchone("PRAGMA auto_vacuum")[0] == 2
+
+        _fill(db, 300, 4000)
+        pages_before = db.fetchone("PRAGMA page_count")[0]
+        db.execute("DELETE FROM cache")
+        assert maintenance.incremental_vacuum() > 0
+        pages_after = db.fetchone("PRAGMA page_count")[0]
+        assert pages_after < pages_before
+        print(f"✓ Pages {pages_before} -> {pages_after}")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    test_sweep_expired_rows()
+    test_lru_and_lfu_eviction()
+    test_incremental_vacuum_shrinks_file()
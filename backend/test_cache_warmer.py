@@ -0,0 +1,149 @@
+"""
+Test the pre-market cache warmer schedule and warm-up run
+"""
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import data_fetcher
+from cache_db import CacheDatabase
+from cache_warmer import CacheWarmer, next_warm_time
+from data_fetcher import DataFetcher
+from market_calendar import calendar_for_symbol
+from provider_health import ProviderHealth, ProviderRouter
+
+
+class _Fetcher:
+    def __init__(self):
+        self.calls = []
+
+    def get_historical_batch(self, symbols, days):
+        self.calls.append(("history", tuple(symbols)))
+        return {symbol: {} for symbol in symbols if symbol != "DELISTED"}
+
+    def get_company_metadata(self, symbols):
+        self.calls.append(("metadata", tuple(symbols)))
+        return {}
+
+    def get_quote(self, symbol, force_refresh=False):
+        assert force_refresh
+        self.calls.append(("quote", symbol))
+        if symbol == "MSFT":
+            raise ValueError("provider down")
+        return {"price": 1.0}
+
+
+class _Predictor:
+    def __init__(self):
+        self.symbols = []
+
+    def predict_next_day(self, symbol):
+        self.symbols.append(symbol)
+        return {"predicted_price": 1.0}
+
+
+def test_next_warm_time():
+    """Runs land just before each local open and skip weekends and holidays"""
+    friday_evening = datetime(2024, 1, 5, 22, 0, tzinfo=timezone.utc)
+    nasdaq = next_warm_time("NASDAQ", friday_evening, lead_minutes=10)
+    assert nasdaq == datetime(2024, 1, 8, 14, 20, tzinfo=timezone.utc)  # Monday 09:20 EST
+
+    before_nse = datetime(2024, 1, 8, 2, 0, tzinfo=timezone.utc)
+    nse = next_warm_time("NSE", before_nse, lead_minutes=10)
+    assert nse == datetime(2024, 1, 8, 3, 35, tzinfo=timezone.utc)  # 09:05 IST the same day
+
+    christmas_eve = datetime(2024, 12, 24, 22, 0, tzinfo=timezone.utc)
+    assert next_warm_time("NASDAQ", christmas_eve, lead_minutes=10) == datetime(2024, 12, 26, 14, 20, tzinfo=timezone.utc)
+
+    summer = next_warm_time("NASDAQ", datetime(2024, 7, 1, 12, 0, tzinfo=timezone.utc), lead_minutes=10)
+    assert summer == datetime(2024, 7, 1, 13, 20, tzinfo=timezone.utc)  # EDT
+    print(f"✓ Next NASDAQ warm-up {nasdaq.isoformat()}, NSE {nse.isoformat()}")
+
+
+def test_warm_covers_universe_and_popular_symbols():
+    """One batch for bars and metadata, then quotes and predictions per symbol"""
+    fetcher, predictor = _Fetcher(), _Predictor()
+    warmer = CacheWarmer(
+        fetcher,
+        predictor,
+        universes={"NASDAQ": ["AAPL", "MSFT", "DELISTED"], "NSE": ["TCS.NS"]},
+        popular_symbols=lambda limit: ["TSLA", "INFY.NS", "AAPL"]
+    )
+    assert warmer.symbols_for("NASDAQ") == ["AAPL", "MSFT", "DELISTED", "TSLA"]
+    assert warmer.next_run(datetime(2024, 1, 8, 2, 0, tzinfo=timezone.utc))[0] == "NSE"
+
+    run = warmer.warm("NASDAQ")
+    assert fetcher.calls[0] == ("history", ("AAPL", "MSFT", "DELISTED", "TSLA"))
+    assert fetcher.calls[1][0] == "metadata"
+    assert sorted(predictor.symbols) == ["AAPL", "MSFT", "TSLA"]
+    assert run["warmed"] == 3 and run["failures"] == {"quote": 1}
+    assert warmer.stats()["last_runs"]["NASDAQ"] is run
+    print(f"✓ Warmed {run['warmed']}/{run['symbols']} symbols, failures {run['failures']}")
+
+
+def test_one_worker_claims_each_run():
+    """Workers sharing cache.db warm each scheduled run once between them"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "cache.db")
+        # One warmer per worker, each with its own connection to the shared file
+        workers = [
+            CacheWarmer(_Fetcher(), _Predictor(), universes={"NASDAQ": ["AAPL"]}, db=CacheDatabase(path))
+            for _ in range(4)
+        ]
+        run_at = datetime(2024, 1, 8, 14, 20, tzinfo=timezone.utc)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            claims = list(pool.map(lambda warmer: warmer.claim("NASDAQ", run_at), workers))
+        assert claims.count(True) == 1
+
+        # The next run and the other exchange are claimed separately
+        assert workers[1].claim("NASDAQ", datetime(2024, 1, 9, 14, 20, tzinfo=timezone.utc))
+        assert workers[2].claim("NSE", run_at)
+        assert not workers[3].claim("NSE", run_at)
+
+        # Without a shared database every warmer runs
+        assert CacheWarmer(_Fetcher(), _Predictor(), universes={"NASDAQ": ["AAPL"]}).claim("NASDAQ", run_at)
+        print(f"✓ 4 workers, claims {claims}: one warm-up per scheduled run")
+
+
+def test_warm_run_replaces_quotes_cached_after_the_close():
+    """A quote from Friday evening is still served Monday 09:20, so the warm run must refetch it"""
+    nasdaq = calendar_for_symbol("AAPL")
+    friday_close = datetime(2024, 1, 5, 22, 0, tzinfo=timezone.utc).timestamp()  # 17:00 EST
+    warm_time = datetime(2024, 1, 8, 14, 20, tzinfo=timezone.utc).timestamp()  # Monday 09:20 EST
+    prices = iter([190.0, 192.5])
+    saved = data_fetcher.providers
+    data_fetcher.providers = ProviderRouter([ProviderHealth("alphavantage"), ProviderHealth("yfinance")])
+    data_fetcher.memory_tier.clear()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fetcher = DataFetcher()
+            fetcher.db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+            fetcher._init_cache_db()
+            fetcher._fetch_quote_alphavantage = lambda symbol: {"symbol": symbol, "price": next(prices)}
+            fetcher.get_historical_batch = lambda symbols, days: {symbol: {} for symbol in symbols}
+            fetcher.get_company_metadata = lambda symbols: {}
+            # The quote TTL as the calendar computes it at the warm time
+            fetcher._quote_max_age_hours = lambda symbol: nasdaq.max_age_seconds(
+                data_fetcher.QUOTE_MAX_AGE_HOURS * 3600, now=warm_time
+            ) / 3600
+
+            assert fetcher.get_quote("AAPL")["price"] == 190.0
+            fetcher.db.execute("UPDATE cache SET timestamp = timestamp - ?", (warm_time - friday_close,))
+            data_fetcher.memory_tier.clear()
+            assert fetcher.get_quote("AAPL")["price"] == 190.0  # Still "fresh" before the open
+
+            warmer = CacheWarmer(fetcher, _Predictor(), universes={"NASDAQ": ["AAPL"]})
+            assert warmer.warm("NASDAQ")["failures"] == {}
+            assert fetcher.get_quote("AAPL")["price"] == 192.5
+        print("✓ The warm run replaces a quote cached after the previous close")
+    finally:
+        data_fetcher.providers = saved
+        data_fetcher.memory_tier.clear()
+
+
+if __name__ == "__main__":
+    test_next_warm_time()
+    test_warm_covers_universe_and_popular_symbols()
+    test_one_worker_claims_each_run()
+    test_warm_run_replaces_quotes_cached_after_the_close()
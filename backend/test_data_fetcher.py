@@ -0,0 +1,410 @@
+"""
+Test DataFetcher's quotes, metadata, history planning and refresh against stubbed providers
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+from bar_store import BarStore, empty_bars
+from cache_db import CacheDatabase
+from data_fetcher import DataFetcher
+from provider_health import ProviderHealth, ProviderRouter
+
+NOW = datetime(2026, 10, 17, 12, 0)
+
+
+class StubHistory:
+    """Provider serving [start, end) slices of one synthetic daily series per symbol"""
+
+    def __init__(self, listed="2024-01-01", until="2026-10-16", failing=False, unlisted=()):
+        self.dates = [str(day) for day in np.arange(listed, np.datetime64(until) + 1, dtype="datetime64[D]")
+                      if np.is_busday(day)]
+        self.close = 100 + np.arange(len(self.dates), dtype=np.float64)
+        self.failing = failing
+        self.unlisted = set(unlisted)  # Left out of batch answers
+        self.calls = []
+
+    def __call__(self, symbol, start_date, end_date=None):
+        self.calls.append((symbol, start_date, end_date))
+        if self.failing:
+            raise ConnectionError("provider down")
+        return self._bars(symbol, start_date, end_date)
+
+    def batch(self, symbols, start_date, end_date=None):
+        """Multi-ticker download: one call, symbols without bars left out"""
+        self.calls.append((tuple(symbols), start_date, end_date))
+        if self.failing:
+            raise ConnectionError("provider down")
+        bars = {symbol: self._bars(symbol, start_date, end_date) for symbol in symbols if symbol not in self.unlisted}
+        return {symbol: rows for symbol, rows in bars.items() if rows["dates"]}
+
+    def _bars(self, symbol, start_date, end_date):
+        index = [i for i, day in enumerate(self.dates) if start_date <= day < (end_date or "9999-12-31")]
+        if not index:
+            return empty_bars(symbol)
+        close = self.close[index]
+        return {
+            "dates": [self.dates[i] for i in index],
+            "open": close - 1, "high": close + 1, "low": close - 2, "close": close, "volume": np.full(len(index), 1e6)
+        }
+
+
+class StubQuotes:
+    """Quote provider returning a new price on every call, optionally after `gate` opens"""
+
+    def __init__(self, source, gate=None):
+        self.source = source
+        self.gate = gate
+        self.calls = []
+
+    def __call__(self, symbol):
+        self.calls.append(symbol)
+        if self.gate is not None:
+            self.gate.wait(5)
+        return {"symbol": symbol, "price": 100.0 + len(self.calls), "source": self.source}
+
+
+class FakeTicker:
+    def __init__(self, market, symbol):
+        self.market = market
+        self.symbol = symbol
+
+    def history(self, period=None, **kwargs):
+        closes = self.market.closes.get(self.symbol, [])
+        index = pd.bdate_range(end="2026-10-16", periods=len(closes))
+        return pd.DataFrame({"Close": closes, "Volume": [1000] * len(closes)}, index=index)
+
+    @property
+    def info(self):
+        self.market.info_calls.append(self.symbol)
+        if self.symbol not in self.market.names:
+            raise ValueError(f"No info for {self.symbol}")
+        return {"longName": self.market.names[self.symbol], "sector": "Technology", "exchange": "NMS"}
+
+
+class FakeYFinance:
+    """Stand-in for the yfinance module: bars per symbol and Ticker.info with a call log"""
+
+    def __init__(self, closes=None, names=None):
+        self.closes = closes or {}
+        self.names = names or {}
+        self.info_calls = []
+
+    def Ticker(self, symbol):
+        return FakeTicker(self, symbol)
+
+
+@contextmanager
+def _fetcher(yfinance=None, alphavantage=None):
+    """DataFetcher on a temporary cache.db, fresh provider health and stubbed history providers"""
+    saved = data_fetcher.providers
+    data_fetcher.providers = ProviderRouter([ProviderHealth("alphavantage"), ProviderHealth("yfinance")])
+    data_fetcher.memory_tier.clear()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fetcher = DataFetcher(now=lambda: NOW)
+        fetcher.db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+        fetcher._init_cache_db()
+        fetcher.bar_store = BarStore(fetcher.db)
+        fetcher._fetch_history_yfinance = yfinance or StubHistory()
+        fetcher._fetch_history_alphavantage = alphavantage or StubHistory(failing=True)
+        # Quote TTLs stretch while the market is closed; keep the plain 15 minutes so ages are deterministic
+        fetcher._quote_max_age_hours = lambda symbol: data_fetcher.QUOTE_MAX_AGE_HOURS
+        try:
+            yield fetcher
+        finally:
+            data_fetcher.providers = saved
+            data_fetcher.memory_tier.clear()
+
+
+@contextmanager
+def _market(fake):
+    """Swap the yfinance client DataFetcher uses"""
+    saved = data_fetcher.market_yf
+    data_fetcher.market_yf = fake
+    try:
+        yield fake
+    finally:
+        data_fetcher.market_yf = saved
+
+
+def _age_quote(fetcher, symbol, seconds):
+    """Backdate a cached quote, as if it had been fetched `seconds` ago"""
+    fetcher.db.execute("UPDATE cache SET timestamp = timestamp - ? WHERE symbol = ?", (seconds, symbol))
+    data_fetcher.memory_tier.delete(("cache", symbol))
+
+
+def _age_series(fetcher, symbol, seconds):
+    """Backdate a stored series' fetched_at so its latest bars count as expired"""
+    fetcher.db.execute("UPDATE bar_meta SET fetched_at = fetched_at - ? WHERE symbol = ?", (seconds, symbol))
+    data_fetcher.memory_tier.delete(("bars", symbol))
+
+
+def _wait_for_refreshes():
+    deadline = time.time() + 5
+    while data_fetcher._pending_refreshes and time.time() < deadline:
+        time.sleep(0.01)
+    assert not data_fetcher._pending_refreshes
+
+
+def test_expired_series_downloads_only_the_tail():
+    """An expired series re-requests its last stored date onwards, and the new bars replace it"""
+    yfinance = StubHistory(until="2026-10-14")
+    with _fetcher(yfinance) as fetcher:
+        first = fetcher.get_historical_data("AAPL", days=90)
+        assert first["dates"][-1] == "2026-10-14"
+
+        # Still fresh: served from the store
+        fetcher.get_historical_data("AAPL", days=90)
+        assert len(yfinance.calls) == 1
+
+        # Two more sessions, and the 14th settled at a different close than the partial bar stored
+        yfinance.__init__(until="2026-10-16")
+        yfinance.close[yfinance.dates.index("2026-10-14")] += 0.5
+        _age_series(fetcher, "AAPL", 30 * 86400)
+        history = fetcher.get_historical_data("AAPL", days=90)
+        assert yfinance.calls == [("AAPL", "2026-10-14", None)]
+        assert history["dates"][-3:] == ["2026-10-14", "2026-10-15", "2026-10-16"]
+        assert len(set(history["dates"])) == len(history["dates"]) == len(first["dates"]) + 2
+        assert history["close"][-3] == first["close"][-1] + 0.5
+        print("✓ Expired series fetch from the last stored date on; the re-fetched bar replaces the stored one")
+
+
+def test_windows_share_one_series():
+    """Shorter windows are sliced, a longer one prepends only the older bars"""
+    yfinance = StubHistory()
+    with _fetcher(yfinance) as fetcher:
+        fetcher.get_historical_data("AAPL", days=90)
+        meta = fetcher.bar_store.get_meta("AAPL")
+        assert meta["covered_from"] == "2026-07-19"
+        assert fetcher._plan_history_segments("AAPL", meta, "2026-09-17", 24) == []
+        assert fetcher._plan_history_segments("AAPL", meta, "2026-01-01", 24) == [("2026-01-01", "2026-07-19")]
+
+        short = fetcher.get_historical_data("AAPL", days=30)
+        assert len(yfinance.calls) == 1
+        assert short["dates"][0] >= "2026-09-17" and short["dates"][-1] == "2026-10-16"
+
+        long = fetcher.get_historical_data("AAPL", days=365)
+        assert yfinance.calls[1:] == [("AAPL", "2025-10-17", "2026-07-19")]
+        assert long["dates"][0] == "2025-10-17" and long["dates"] == sorted(set(long["dates"]))
+        assert np.array_equal(long["close"], yfinance.close[yfinance.dates.index("2025-10-17"):])
+        # A backfill leaves the latest bars' freshness alone
+        assert fetcher.bar_store.get_meta("AAPL")["fetched_at"] == meta["fetched_at"]
+
+        again = fetcher.get_historical_data("AAPL", days=30)
+        assert len(yfinance.calls) == 2 and again["dates"] == short["dates"]
+        print("✓ Shorter windows sliced from the stored series, longer ones prepend only the missing range")
+
+
+def test_batch_groups_symbols_by_missing_range():
+    """Symbols missing the same range share one batch download; what it misses falls back per symbol"""
+    yfinance = StubHistory()
+    batch = StubHistory(unlisted={"MSFT"})
+    with _fetcher(yfinance) as fetcher:
+        fetcher._fetch_history_batch_yfinance = batch.batch
+        fetcher.get_historical_data("AAPL", days=30)
+        yfinance.calls.clear()
+
+        results = fetcher.get_historical_batch(["AAPL", "MSFT", "GOOG", "MSFT"], days=90)
+        assert sorted(batch.calls) == sorted([
+            (("AAPL",), "2026-07-19", "2026-09-17"),
+            (("MSFT", "GOOG"), "2026-07-19", None)
+        ])
+        # MSFT was missing from the batch answer, so it went through get_historical_data
+        assert yfinance.calls == [("MSFT", "2026-07-19", None)]
+        assert sorted(results) == ["AAPL", "GOOG", "MSFT"]
+        for history in results.values():
+            assert history["dates"][0] == "2026-07-20" and history["dates"][-1] == "2026-10-16"
+
+        batch.calls.clear()
+        fetcher.get_historical_batch(["AAPL", "MSFT", "GOOG"], days=90)
+        assert batch.calls == []
+        print("✓ Batch downloads grouped by missing range, per-symbol fallback for what the batch missed")
+
+
+def test_stale_quotes_are_served_while_one_refresh_runs():
+    """Expired quotes within QUOTE_MAX_STALE_MINUTES come back flagged while one background refresh runs"""
+    gate = threading.Event()
+    alphavantage = StubQuotes("alphavantage", gate=gate)
+    with _fetcher() as fetcher:
+        fetcher._fetch_quote_alphavantage = alphavantage
+        gate.set()
+        first = fetcher.get_quote("AAPL", allow_stale=True)
+        assert first["price"] == 101.0 and "stale" not in first
+
+        gate.clear()
+        _age_quote(fetcher, "AAPL", 20 * 60)
+        stale = [fetcher.get_quote("AAPL", allow_stale=True) for _ in range(5)]
+        assert all(quote["stale"] and quote["price"] == 101.0 for quote in stale)
+        assert 20 * 60 <= stale[0]["stale_age_seconds"] < 20 * 60 + 5
+        gate.set()
+        _wait_for_refreshes()
+        assert alphavantage.calls == ["AAPL", "AAPL"]
+        fresh = fetcher.get_quote("AAPL", allow_stale=True)
+        assert fresh["price"] == 102.0 and "stale" not in fresh
+        print("✓ Stale quotes flagged with their age while a single background refresh runs")
+
+        # Past QUOTE_MAX_STALE_MINUTES (or without stale-while-revalidate) the caller waits for upstream
+        _age_quote(fetcher, "AAPL", (data_fetcher.settings.QUOTE_MAX_STALE_MINUTES + 1) * 60)
+        assert fetcher.get_quote("AAPL", allow_stale=True) == {**fresh, "price": 103.0}
+        _age_quote(fetcher, "AAPL", 20 * 60)
+        assert fetcher.get_quote("AAPL", allow_stale=False) == {**fresh, "price": 104.0}
+        assert alphavantage.calls == ["AAPL"] * 4
+        print("✓ Quotes older than QUOTE_MAX_STALE_MINUTES fetched synchronously")
+
+
+def test_yfinance_quote_comes_from_bars():
+    """The yfinance quote is built from recent bars: the previous close is the prior bar"""
+    with _fetcher() as fetcher, _market(FakeYFinance(closes={"AAPL": [95.0, 100.0, 102.0], "NEW": [50.0]})):
+        quote = fetcher._fetch_quote_yfinance("AAPL")
+        assert quote == {
+            "symbol": "AAPL", "price": 102.0, "change": 2.0, "change_percent": "2.00%",
+            "volume": 1000, "latest_trading_day": "2026-10-16", "source": "yfinance"
+        }
+        listed_today = fetcher._fetch_quote_yfinance("NEW")
+        assert listed_today["price"] == 50.0 and listed_today["change"] == 0.0
+        assert fetcher._fetch_quote_yfinance("GONE") is None
+        print("✓ yfinance quotes: change against the prior bar, none for a single bar, None without bars")
+
+
+def test_company_metadata_cache():
+    """Metadata is fetched once per symbol in bulk, then served until it is older than the TTL"""
+    market = FakeYFinance(names={"AAPL": "Apple Inc.", "MSFT": "Microsoft Corporation"})
+    with _fetcher() as fetcher, _market(market):
+        metadata = fetcher.get_company_metadata(["AAPL", "MSFT", "AAPL", "GONE"])
+        assert sorted(market.info_calls) == ["AAPL", "GONE", "MSFT"]
+        assert sorted(metadata) == ["AAPL", "MSFT"] and metadata["AAPL"]["name"] == "Apple Inc."
+
+        # Served from RAM, then from cache.db in a fresh worker; the unknown symbol is retried
+        market.info_calls.clear()
+        assert fetcher.get_company_metadata(["AAPL", "MSFT"]) == metadata
+        data_fetcher.memory_tier.clear()
+        assert fetcher.get_company_metadata(["AAPL", "MSFT", "GONE"]) == metadata
+        assert market.info_calls == ["GONE"]
+
+        market.info_calls.clear()
+        fetcher.db.execute("UPDATE company_metadata SET fetched_at = fetched_at - 7200 WHERE symbol = 'MSFT'")
+        data_fetcher.memory_tier.clear()
+        assert fetcher.get_company_metadata(["AAPL", "MSFT"], max_age_hours=1) == metadata
+        assert market.info_calls == ["MSFT"]
+        print("✓ Company metadata fetched in bulk, cached in RAM and cache.db, refetched past its TTL")
+
+
+def test_async_quote_falls_back_to_yfinance():
+    """get_quote_async moves on to yfinance when Alpha Vantage fails or has no quote"""
+    with _fetcher() as fetcher:
+        fetcher._fetch_quote_alphavantage_async = lambda symbol: asyncio.sleep(0, result=None)
+        yfinance = StubQuotes("yfinance")
+        fetcher._fetch_quote_yfinance = yfinance
+        quote = asyncio.run(fetcher.get_quote_async("NEW"))
+        assert quote["source"] == "yfinance" and yfinance.calls == ["NEW"]
+
+        async def over_quota(symbol):
+            raise data_fetcher.ProviderError("Alpha Vantage: rate limit")
+
+        fetcher._fetch_quote_alphavantage_async = over_quota
+        quote = asyncio.run(fetcher.get_quote_async("AAPL"))
+        assert quote["source"] == "yfinance" and yfinance.calls == ["NEW", "AAPL"]
+        assert data_fetcher.providers["alphavantage"].snapshot()["kinds"]["quote"]["samples"] == 2
+
+        # Cached now: neither provider is asked again
+        assert asyncio.run(fetcher.get_quote_async("AAPL")) == quote
+        assert yfinance.calls == ["NEW", "AAPL"]
+        print("✓ Async quotes fall back to yfinance (off the event loop) and are cached")
+
+
+def test_sync_and_async_quotes_share_one_fetch():
+    """get_quote_async joins a get_quote already fetching the same symbol, and the other way round"""
+    gate = threading.Event()
+    alphavantage = StubQuotes("alphavantage", gate=gate)
+    with _fetcher() as fetcher:
+        fetcher._fetch_quote_alphavantage = alphavantage
+        async_calls = []
+
+        async def alphavantage_async(symbol):
+            async_calls.append(symbol)
+            await asyncio.sleep(0.05)
+            return {"symbol": symbol, "price": 200.0, "source": "alphavantage"}
+
+        fetcher._fetch_quote_alphavantage_async = alphavantage_async
+        quotes = []
+        thread = threading.Thread(target=lambda: quotes.append(fetcher.get_quote("AAPL")))
+        thread.start()
+        while not alphavantage.calls:
+            time.sleep(0.01)
+
+        async def join():
+            joined = asyncio.ensure_future(fetcher.get_quote_async("AAPL"))
+            await asyncio.sleep(0.05)
+            gate.set()
+            return await joined
+
+        assert asyncio.run(join()) is not None
+        thread.join()
+        assert alphavantage.calls == ["AAPL"] and async_calls == []
+
+        async def lead():
+            leading = asyncio.ensure_future(fetcher.get_quote_async("MSFT"))
+            await asyncio.sleep(0)
+            return await asyncio.gather(leading, asyncio.to_thread(fetcher.get_quote, "MSFT"))
+
+        leading, following = asyncio.run(lead())
+        assert leading == following and following["price"] == 200.0
+        assert alphavantage.calls == ["AAPL"] and async_calls == ["MSFT"]
+        print("✓ Sync and async quote requests for one symbol share a single upstream call")
+
+
+def test_backfill_before_listing_is_not_repeated():
+    """A longer window than the listing history asks upstream for the older range only once"""
+    yfinance, alphavantage = StubHistory(listed="2026-08-03"), StubHistory(listed="2026-08-03")
+    with _fetcher(yfinance, alphavantage) as fetcher:
+        history = fetcher.get_historical_data("IPO", days=90)
+        assert history["dates"][0] == "2026-08-03"
+        assert fetcher.bar_store.get_meta("IPO")["covered_from"] == "2026-07-19"
+
+        for _ in range(3):
+            history = fetcher.get_historical_data("IPO", days=365)
+            assert history["dates"][0] == "2026-08-03"
+        # yfinance answered the backfill with no bars, Alpha Vantage was tried once, then the range counts as covered
+        assert yfinance.calls == [("IPO", "2026-07-19", None), ("IPO", "2025-10-17", "2026-07-19")]
+        assert alphavantage.calls == [("IPO", "2025-10-17", "2026-07-19")]
+        assert fetcher.bar_store.get_meta("IPO")["covered_from"] == "2025-10-17"
+        print("✓ Empty backfill before the listing date recorded as covered, not re-requested")
+
+
+def test_failed_backfill_is_retried():
+    """A provider outage is not mistaken for 'no older bars'"""
+    yfinance = StubHistory(listed="2026-08-03")
+    with _fetcher(yfinance) as fetcher:
+        fetcher.get_historical_data("IPO", days=90)
+        yfinance.failing = True
+        assert fetcher.get_historical_data("IPO", days=365)["dates"][0] == "2026-08-03"
+        assert fetcher.bar_store.get_meta("IPO")["covered_from"] == "2026-07-19"
+        yfinance.failing = False
+        fetcher.get_historical_data("IPO", days=365)
+        assert fetcher.bar_store.get_meta("IPO")["covered_from"] == "2025-10-17"
+        print("✓ Failed backfills are retried on the next request")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("DATA FETCHER TESTS")
+    print("=" * 60)
+    test_expired_series_downloads_only_the_tail()
+    test_windows_share_one_series()
+    test_backfill_before_listing_is_not_repeated()
+    test_failed_backfill_is_retried()
+    test_batch_groups_symbols_by_missing_range()
+    test_stale_quotes_are_served_while_one_refresh_runs()
+    test_yfinance_quote_comes_from_bars()
+    test_company_metadata_cache()
+    test_async_quote_falls_back_to_yfinance()
+    test_sync_and_async_quotes_share_one_fetch()
+    print("\nAll data fetcher tests passed!")
@@ -0,0 +1,42 @@
+"""
+Test the pooled aiohttp client across event loops
+"""
+import asyncio
+import threading
+
+from http_client import AsyncHTTPClient
+
+
+def test_session_replaced_per_event_loop():
+    """A new event loop gets a new session, and the previous one is closed"""
+    client = AsyncHTTPClient()
+    first = asyncio.run(client.session())
+    second = asyncio.run(client.session())
+    assert second is not first and first.closed and not second.closed
+    print("✓ Session from a finished loop closed when the next loop replaces it")
+
+    # A session whose loop still runs in another thread is closed on that loop
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+    try:
+        third = asyncio.run_coroutine_threadsafe(client.session(), other).result(5)
+        assert second.closed and not third.closed
+        fourth = asyncio.run(client.session())
+        assert third.closed and not fourth.closed
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(5)
+        other.close()
+
+    asyncio.run(client.close())
+    assert fourth.closed
+    print("✓ Session from a loop running elsewhere closed on its own loop")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("HTTP CLIENT TESTS")
+    print("=" * 60)
+    test_session_replaced_per_event_loop()
+    print("\nAll HTTP client tests passed!")
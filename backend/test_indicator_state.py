@@ -0,0 +1,109 @@
+"""
+Test the streaming indicator state: constant-time updates that match a full recompute
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from cache_db import CacheDatabase
+from indicator_state import IndicatorState, IndicatorStateStore
+from memory_cache import MemoryCache
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    dates = [str(day) for day in np.arange("2020-01-01", n, dtype="datetime64[D]")]
+    return dates, closes
+
+
+def test_streaming_matches_full_recompute():
+    dates, closes = _series(600)
+    state = IndicatorState("AAPL")
+    for i, (date, close) in enumerate(zip(dates, closes)):
+        state.update(date, close)
+        assert state.verify(closes[:i + 1]) == {}, i
+    print("✓ Bar-by-bar state equals sma/rsi over the whole series at every bar (incl. the first 14)")
+
+    # Windows without losses (or without any change) must read exactly 100 (or 50), not drift
+    steady = IndicatorState("STEADY")
+    for i, date in enumerate(dates[:60]):
+        steady.update(date, 50.1 + 0.3 * min(i, 30))
+        if i == 29:
+            assert steady.features()["rsi_14"] == 100.0
+    assert steady.features()["rsi_14"] == 50.0
+    print("✓ Windows without losses stay at RSI 100 (flat ones at 50) despite running sums")
+
+
+def test_ticks_replace_the_forming_bar():
+    dates, closes = _series(30, seed=1)
+    state = IndicatorState.from_bars("AAPL", dates, closes)
+    before = state.features()
+
+    live = state.preview(dates[-1], closes[-1] * 1.03)
+    assert state.features() == before
+    ticked = state.copy()
+    ticked.update(dates[-1], closes[-1] * 1.03)
+    assert ticked.features() == live
+    assert ticked.verify(np.append(closes[:-1], closes[-1] * 1.03)) == {}
+    print("✓ A tick on the last bar's date previews a replaced close without touching the state")
+
+    next_day = "2020-02-01"
+    ticked = state.copy()
+    ticked.update(next_day, 101.0)
+    assert ticked.last_date == next_day and ticked.bars == state.bars + 1
+    assert ticked.features() == state.preview(next_day, 101.0)
+    assert ticked.verify(np.append(closes, 101.0)) == {}
+    print("✓ A tick on a new date previews an appended bar")
+
+    try:
+        state.update("2019-12-31", 99.0)
+        assert False, "an older bar must be rejected"
+    except ValueError:
+        pass
+
+
+def test_store_syncs_incrementally():
+    dates, closes = _series(60, seed=2)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "cache.db")
+        store = IndicatorStateStore(CacheDatabase(path), MemoryCache(1024 * 1024))
+        history = {"dates": dates[:40], "close": closes[:40]}
+        store.sync("AAPL", history)
+        assert store.stats() == {"updates": 0, "rebuilds": 1}
+
+        # Unchanged history: nothing to apply
+        store.sync("AAPL", history)
+        assert store.stats() == {"updates": 0, "rebuilds": 1}
+
+        # Three new bars in a sliding 30-bar window: the last known bar plus three are applied
+        state = store.sync("AAPL", {"dates": dates[13:43], "close": closes[13:43]})
+        assert store.stats() == {"updates": 4, "rebuilds": 1}
+        assert state.verify(closes[:43]) == {}
+        print("✓ New bars are applied to the stored state, not recomputed")
+
+        # Another worker reads it back from SQLite
+        other = IndicatorStateStore(CacheDatabase(path), MemoryCache(1024 * 1024))
+        assert other.get("AAPL").to_dict() == state.to_dict()
+        print("✓ States persist in cache.db")
+
+        # A back-adjusted history (2:1 split) no longer matches the buffered closes
+        adjusted = closes[:45] / 2
+        state = store.sync("AAPL", {"dates": dates[15:45], "close": adjusted[15:]})
+        assert store.stats()["rebuilds"] == 2
+        assert state.verify(adjusted) == {}
+        print("✓ A revised history rebuilds the state from the bars")
+
+        store.invalidate("AAPL")
+        assert store.get("AAPL") is None
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("INDICATOR STATE TESTS")
+    print("=" * 60)
+    test_streaming_matches_full_recompute()
+    test_ticks_replace_the_forming_bar()
+    test_store_syncs_incrementally()
+    print("\nAll indicator state tests passed!")
@@ -0,0 +1,126 @@
+"""
+Test the NumPy indicators against the pandas expressions they replace, on series and padded panels
+"""
+import numpy as np
+import pandas as pd
+
+import indicators
+
+
+def _prices(length: int, seed: int, start: float = 100.0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return start * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+
+
+def pandas_rsi(close, period=14):
+    delta = pd.Series(close).diff()
+    gain = delta.where(delta > 0, 0).rolling(window=period, min_periods=1).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period, min_periods=1).mean()
+    return (100 - (100 / (1 + gain / loss))).fillna(50).to_numpy()
+
+
+def pandas_reference(close, high, low):
+    price = pd.Series(close)
+    ema_12 = price.ewm(span=12, adjust=False).mean()
+    macd_line = ema_12 - price.ewm(span=26, adjust=False).mean()
+    signal_line = macd_line.ewm(span=9, adjust=False).mean()
+    middle, std = price.rolling(20).mean(), price.rolling(20).std()
+    previous_close = price.shift()
+    true_range = pd.concat([
+        pd.Series(high) - pd.Series(low),
+        (pd.Series(high) - previous_close).abs(),
+        (pd.Series(low) - previous_close).abs()
+    ], axis=1).max(axis=1)
+    return {
+        "sma_5": price.rolling(window=5, min_periods=1).mean().to_numpy(),
+        "sma_10": price.rolling(window=10, min_periods=1).mean().to_numpy(),
+        "ema_12": ema_12.to_numpy(),
+        "rsi_14": pandas_rsi(close),
+        "macd": macd_line.to_numpy(),
+        "macd_signal": signal_line.to_numpy(),
+        "macd_hist": (macd_line - signal_line).to_numpy(),
+        "bb_middle": middle.to_numpy(),
+        "bb_upper": (middle + 2 * std).to_numpy(),
+        "bb_lower": (middle - 2 * std).to_numpy(),
+        "atr_14": true_range.ewm(alpha=1 / 14, adjust=False).mean().to_numpy(),
+    }
+
+
+def numpy_indicators(close, high, low):
+    macd_line, signal_line, histogram = indicators.macd(close)
+    middle, upper, lower = indicators.bollinger_bands(close)
+    return {
+        "sma_5": indicators.sma(close, 5),
+        "sma_10": indicators.sma(close, 10),
+        "ema_12": indicators.ema(close, span=12),
+        "rsi_14": indicators.rsi(close, 14),
+        "macd": macd_line,
+        "macd_signal": signal_line,
+        "macd_hist": histogram,
+        "bb_middle": middle,
+        "bb_upper": upper,
+        "bb_lower": lower,
+        "atr_14": indicators.atr(high, low, close, 14),
+    }
+
+
+def _assert_same(actual, expected, name):
+    assert actual.shape == expected.shape, name
+    assert np.array_equal(np.isnan(actual), np.isnan(expected)), name
+    assert np.allclose(actual, expected, rtol=1e-10, atol=1e-10, equal_nan=True), (name, np.nanmax(np.abs(actual - expected)))
+
+
+def test_series_match_pandas():
+    for length in (1, 2, 13, 14, 15, 30, 90, 2520):
+        close = _prices(length, length)
+        high, low = close * 1.01, close * 0.985
+        expected = pandas_reference(close, high, low)
+        actual = numpy_indicators(close, high, low)
+        for name in expected:
+            _assert_same(actual[name], expected[name], f"{name} ({length} bars)")
+    print("✓ SMA, EMA, RSI, MACD, Bollinger and ATR match pandas for 1 to 2520 bars")
+
+
+def test_edge_cases():
+    flat = np.full(40, 1234.5)
+    assert np.all(indicators.sma(flat, 10) == 1234.5)
+    assert np.all(indicators.rsi(flat) == 50)
+    assert np.all(indicators.rolling_std(flat, 20)[19:] == 0)
+    assert np.all(indicators.rsi(np.arange(1.0, 30.0))[1:] == 100)
+    print("✓ Flat series: exact SMA, RSI 50, zero band width; rising series: RSI 100")
+
+    # NaNs inside a series are skipped the way pandas skips them
+    gappy = _prices(40, 3)
+    gappy[[7, 20, 21]] = np.nan
+    _assert_same(indicators.sma(gappy, 5), pd.Series(gappy).rolling(5, min_periods=1).mean().to_numpy(), "sma with gaps")
+    _assert_same(indicators.rsi(gappy), pandas_rsi(gappy), "rsi with gaps")
+    _assert_same(indicators.rolling_std(gappy, 5), pd.Series(gappy).rolling(5).std().to_numpy(), "std with gaps")
+    assert indicators.sma(np.empty(0), 5).shape == (0,)
+    print("✓ Gaps and empty series handled like pandas")
+
+
+def test_padded_panel_rows_equal_series():
+    lengths = [300, 250, 40, 15, 1]
+    series = [_prices(length, seed) for seed, length in enumerate(lengths)]
+    panel = np.full((len(series), max(lengths)), np.nan)
+    for row, close in enumerate(series):
+        panel[row, panel.shape[1] - len(close):] = close
+
+    panel_result = numpy_indicators(panel, panel * 1.01, panel * 0.985)
+    for row, close in enumerate(series):
+        expected = numpy_indicators(close, close * 1.01, close * 0.985)
+        padding = panel.shape[1] - len(close)
+        for name, values in panel_result.items():
+            assert np.all(np.isnan(values[row, :padding])), name
+            _assert_same(values[row, padding:], expected[name], f"{name} row {row}")
+    print(f"✓ Each row of a NaN-padded {panel.shape[0]}x{panel.shape[1]} panel equals its own series")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("INDICATOR TESTS")
+    print("=" * 60)
+    test_series_match_pandas()
+    test_edge_cases()
+    test_padded_panel_rows_equal_series()
+    print("\nAll indicator tests passed!")
@@ -0,0 +1,119 @@
+"""
+Test intraday bar storage, rollup and retention
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from cache_db import CacheDatabase
+from intraday_store import IntradayStore, rollup
+
+
+def _minute_bars(session_open, minutes, symbol="AAPL"):
+    timestamps = session_open + 60 * np.arange(minutes, dtype=np.int64)
+    close = 100 + np.arange(minutes, dtype=np.float64)
+    return {
+        "symbol": symbol,
+        "interval": "1m",
+        "timestamps": timestamps,
+        "open": close - 0.5,
+        "high": close + 1,
+        "low": close - 1,
+        "close": close,
+        "volume": np.full(minutes, 10.0)
+    }
+
+
+def test_rollup_anchors_at_session_open():
+    """15m bars start at the session open and aggregate OHLCV correctly"""
+    session_open = 1704205800  # 2024-01-02 14:30 UTC, the NASDAQ open
+    bars = _minute_bars(session_open, 40)
+    rolled = rollup(bars, "15m")
+
+    assert rolled["timestamps"].tolist() == [session_open, session_open + 900, session_open + 1800]
+    assert rolled["open"].tolist() == [99.5, 114.5, 129.5]
+    assert rolled["close"].tolist() == [114.0, 129.0, 139.0]  # last bucket is partial
+    assert rolled["high"].tolist() == [115.0, 130.0, 140.0]
+    assert rolled["low"].tolist() == [99.0, 114.0, 129.0]
+    assert rolled["volume"].tolist() == [150.0, 150.0, 100.0]
+
+    # A 09:15 IST session (03:45 UTC) buckets from 03:45, not from the clock hour
+    nse_open = 1704167100
+    hourly = rollup(_minute_bars(nse_open, 75, symbol="RELIANCE.NS"), "1h")
+    assert hourly["timestamps"].tolist() == [nse_open, nse_open + 3600]
+    print(f"✓ Rolled 40 1m bars into {len(rolled['timestamps'])} 15m bars")
+
+
+def test_rollup_ignores_where_retained_bars_start():
+    """A window starting mid-session still buckets from the exchange open"""
+    session_open = 1704205800  # 2024-01-02 09:30 ET
+    first = session_open + 35 * 60  # retention cut the first 35 minutes
+    bars = _minute_bars(first, 90)
+    rolled = rollup(bars, "30m")
+    assert rolled["timestamps"].tolist() == [session_open + 1800 * k for k in range(1, 5)]
+    assert rolled["volume"].tolist() == [250.0, 300.0, 300.0, 50.0]  # 10:05-10:30 is partial
+
+    # The same minutes rolled from a full session give the same buckets (closes count from 100 per series)
+    full = rollup(_minute_bars(session_open, 125), "30m")
+    assert full["timestamps"].tolist()[1:] == rolled["timestamps"].tolist()
+    assert (full["close"][1:] - 35).tolist() == rolled["close"].tolist()
+
+    # NSE opens at 09:15 IST; a window from 11:02 IST still lines up with 09:15
+    nse_open = 1704167100
+    hourly = rollup(_minute_bars(nse_open + 107 * 60, 120, symbol="TCS.NS"), "1h")
+    assert hourly["timestamps"].tolist() == [nse_open + 3600, nse_open + 7200, nse_open + 10800]
+    print("✓ Rollup buckets come from market_calendar's open, not the first stored bar")
+
+
+def test_source_interval_and_round_trip():
+    """Requests are served from the coarsest stored interval that covers them"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+        store = IntradayStore(db, {"1m": 5, "5m": 60})
+        assert store.source_interval("1m", 1) == "1m"
+        assert store.source_interval("15m", 1) == "5m"
+        assert store.source_interval("2m", 30) == "1m"  # 5m does not divide 2m
+        assert store.source_interval("1h", 30) == "5m"
+
+        bars = _minute_bars(1704205800, 30)
+        store.write_bars("AAPL", "1m", bars, covered_from=1704205800, fetched_at=time.time())
+        # A later tail fetch overwrites the partial last bar and extends the series
+        tail = _minute_bars(1704205800 + 29 * 60, 3)
+        store.write_bars("AAPL", "1m", tail, covered_from=tail["timestamps"][0], fetched_at=time.time())
+
+        stored = store.read_bars("AAPL", "1m")
+        assert len(stored["timestamps"]) == 32
+        assert stored["close"][29] == 100.0
+        meta = store.get_meta("AAPL", "1m")
+        assert meta["covered_from"] == 1704205800 and meta["last_ts"] == 1704205800 + 31 * 60
+        print(f"✓ Stored {len(stored['timestamps'])} bars, meta {meta['covered_from']}..{meta['last_ts']}")
+        db.close_all()
+
+
+def test_prune_by_retention():
+    """Each interval keeps only its retention window"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = CacheDatabase(os.path.join(tmpdir, "cache.db"))
+        store = IntradayStore(db, {"1m": 5, "5m": 60})
+        now = time.time()
+        old = _minute_bars(int(now - 10 * 86400), 10)
+        recent = _minute_bars(int(now - 3600), 10)
+        for bars in (old, recent):
+            store.write_bars("AAPL", "1m", bars, covered_from=int(bars["timestamps"][0]), fetched_at=now)
+        store.write_bars("AAPL", "5m", old, covered_from=int(old["timestamps"][0]), fetched_at=now)
+
+        assert store.prune(now) == 10
+        assert len(store.read_bars("AAPL", "1m")["timestamps"]) == 10
+        assert len(store.read_bars("AAPL", "5m")["timestamps"]) == 10
+        assert store.get_meta("AAPL", "1m")["covered_from"] == int(now - 5 * 86400)
+        print("✓ Pruned 10 expired 1m bars, kept 5m bars inside their 60 day window")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    test_rollup_anchors_at_session_open()
+    test_rollup_ignores_where_retained_bars_start()
+    test_source_interval_and_round_trip()
+    test_prune_by_retention()
@@ -0,0 +1,55 @@
+"""
+Test exchange trading calendars and closed-market cache lifetimes
+"""
+from datetime import date, datetime, timezone
+
+from market_calendar import calendar_for_symbol, nyse_holidays
+
+
+def _ts(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_holidays_and_next_trading_day():
+    """Weekends and each exchange's own holidays are skipped"""
+    assert date(2024, 3, 29) in nyse_holidays(2024)  # Good Friday
+    assert date(2022, 6, 20) in nyse_holidays(2022)  # Juneteenth on Sunday, observed Monday
+    assert date(2021, 12, 31) not in nyse_holidays(2021)  # Saturday New Year's Day is not observed
+
+    nasdaq = calendar_for_symbol("AAPL")
+    nse = calendar_for_symbol("RELIANCE.NS")
+    assert calendar_for_symbol("RELIANCE.BO") is nse
+    assert nasdaq.next_trading_day(date(2024, 11, 27)) == date(2024, 11, 29)  # Thanksgiving
+    assert nse.next_trading_day(date(2025, 10, 20)) == date(2025, 10, 23)  # Diwali
+    assert nse.next_trading_day(date(2024, 8, 14)) == date(2024, 8, 16)
+    assert nasdaq.next_trading_day(date(2024, 8, 14)) == date(2024, 8, 15)
+    print("✓ Next trading days skip weekends and exchange holidays")
+
+
+def test_cache_lifetime_while_closed():
+    """Data fetched after the close stays valid until the next open"""
+    nasdaq = calendar_for_symbol("AAPL")
+    ttl = 900
+
+    # Tuesday 2024-01-09 11:00 ET: session running, normal TTL
+    assert nasdaq.max_age_seconds(ttl, _ts(2024, 1, 9, 16, 0)) == ttl
+    assert nasdaq.seconds_until_open(_ts(2024, 1, 9, 16, 0)) == 0
+
+    # Saturday noon ET: valid back to Friday 16:15 ET
+    saturday = _ts(2024, 1, 13, 17, 0)
+    assert nasdaq.max_age_seconds(ttl, saturday) == saturday - _ts(2024, 1, 12, 21, 15)
+    # Monday 2024-01-15 is MLK Day, so the next open is Tuesday 09:30 ET
+    assert nasdaq.next_session_open(saturday) == datetime(2024, 1, 16, 14, 30, tzinfo=timezone.utc)
+    assert nasdaq.seconds_until_open(saturday) == _ts(2024, 1, 16, 14, 30) - saturday
+
+    # Right after the close, before the settle window: still the short TTL against the prior close
+    nse = calendar_for_symbol("TCS.NS")
+    just_closed = _ts(2024, 1, 9, 10, 5)  # 15:35 IST
+    assert nse.is_open(just_closed)
+    assert nse.max_age_seconds(ttl, just_closed) == ttl
+    print(f"✓ Weekend max age {nasdaq.max_age_seconds(ttl, saturday) / 3600:.1f}h")
+
+
+if __name__ == "__main__":
+    test_holidays_and_next_trading_day()
+    test_cache_lifetime_while_closed()
@@ -0,0 +1,172 @@
+"""
+Test offline record/replay of market data fixtures
+"""
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+from bar_store import BarStore
+from cache_db import CacheDatabase
+from indicator_state import IndicatorStateStore
+from market_replay import FaultInjector, FixtureStore, ReplayHTTP, ReplayYFinance, build_market_data_clients
+from model_registry import get_model_registry
+from model_trainer import ModelTrainer
+from prediction_cache import PredictionCache
+from predictor import Predictor
+from provider_health import ProviderError
+
+
+def _frame(start, periods, tz="America/New_York"):
+    index = pd.bdate_range(start, periods=periods, tz=tz)
+    close = 100 + np.arange(periods, dtype=np.float64)
+    return pd.DataFrame(
+        {"Open": close - 1, "High": close + 1, "Low": close - 2, "Close": close, "Volume": 1e6},
+        index=index
+    )
+
+
+def test_history_round_trip():
+    """Recorded bars replay by range, by period and as a batch download"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = FixtureStore(tmpdir)
+        store.save_history("AAPL", _frame("2024-01-01", 20))
+        store.save_history("AAPL", _frame("2024-01-22", 10))  # overlapping re-recording merges
+        store.save_history("MSFT", _frame("2024-01-01", 5))
+        replay = ReplayYFinance(store, FaultInjector())
+
+        hist = replay.Ticker("AAPL").history(start="2024-01-08", end="2024-01-15")
+        assert hist.index.strftime("%Y-%m-%d").tolist() == [
+            "2024-01-08", "2024-01-09", "2024-01-10", "2024-01-11", "2024-01-12"
+        ]
+        assert len(store.load_history("AAPL")) == 25
+
+        # period counts back from the last recorded session, not from today
+        assert len(replay.Ticker("AAPL").history(period="5d")) == 5
+        assert len(replay.Ticker("UNKNOWN").history(period="5d")) == 0
+
+        data = replay.download(["AAPL", "MSFT", "UNKNOWN"], start="2024-01-01", end="2024-02-01")
+        assert set(data.columns.get_level_values(0)) == {"AAPL", "MSFT"}
+        assert data["MSFT"]["Close"].dropna().tolist() == [100.0, 101.0, 102.0, 103.0, 104.0]
+        print(f"✓ Replayed {len(hist)} bars, batch of {len(data.columns.levels[0])} tickers")
+
+
+def test_intraday_history_round_trip():
+    """Intraday fixtures are kept per interval in UTC and replay by start time"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = FixtureStore(tmpdir)
+        index = pd.date_range("2024-01-02 09:30", periods=12, freq="5min", tz="America/New_York")
+        store.save_history("AAPL", pd.DataFrame({"Close": np.arange(12.0), "Volume": 1.0}, index=index), "5m")
+        replay = ReplayYFinance(store, FaultInjector())
+
+        hist = replay.Ticker("AAPL").history(start=pd.Timestamp("2024-01-02 15:00", tz="UTC"), interval="5m")
+        assert hist.index[0] == pd.Timestamp("2024-01-02 15:00")
+        assert hist["Close"].tolist() == [6.0, 7.0, 8.0, 9.0, 10.0, 11.0]
+        assert len(store.load_history("AAPL")) == 0  # kept apart from the daily fixture
+        print(f"✓ Replayed {len(hist)} 5m bars")
+
+
+def test_alphavantage_responses():
+    """Stored bodies replay sync and async; unrecorded symbols look empty"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = FixtureStore(tmpdir)
+        store.save_response("TIME_SERIES_DAILY", "IBM", {"Time Series (Daily)": {"2024-01-02": {"4. close": "1"}}})
+        store.save_response("TIME_SERIES_DAILY", "IBM", {"Time Series (Daily)": {"2024-01-03": {"4. close": "2"}}})
+        http = ReplayHTTP(store, FaultInjector())
+
+        body = http.get("https://www.alphavantage.co/query", params={"function": "TIME_SERIES_DAILY", "symbol": "IBM"}).json()
+        assert sorted(body["Time Series (Daily)"]) == ["2024-01-02", "2024-01-03"]
+        status, body = asyncio.run(http.get_json("https://www.alphavantage.co/query", {"function": "GLOBAL_QUOTE", "symbol": "IBM"}))
+        assert status == 200 and body == {}
+        print("✓ Alpha Vantage fixtures replayed")
+
+
+def test_fault_injection_is_seeded():
+    """The same seed fails the same calls, with the configured latency"""
+    def outcomes(seed):
+        faults = FaultInjector(latency_ms=1, error_rate=0.3, seed=seed)
+        results = []
+        for i in range(50):
+            try:
+                faults.before_call(str(i))
+                results.append(True)
+            except ProviderError:
+                results.append(False)
+        return results
+
+    first = outcomes(7)
+    assert first == outcomes(7)
+    assert 5 < first.count(False) < 25
+    print(f"✓ {first.count(False)}/50 simulated failures, reproducible")
+
+
+def _replay_predictor(workdir, now=None):
+    """Predictor on an isolated cache.db and model dir, reading through a replaying DataFetcher"""
+    os.makedirs(workdir, exist_ok=True)
+    db = CacheDatabase(os.path.join(workdir, "cache.db"))
+    fetcher = data_fetcher.DataFetcher(now=now)
+    fetcher.db = db
+    fetcher._init_cache_db()
+    fetcher.bar_store = BarStore(db)
+
+    trainer = ModelTrainer.__new__(ModelTrainer)
+    trainer.model_dir = os.path.join(workdir, "models")
+    os.makedirs(trainer.model_dir)
+    trainer.registry = get_model_registry(trainer.model_dir)
+
+    predictor = Predictor.__new__(Predictor)
+    predictor.data_fetcher = fetcher
+    predictor.model_trainer = trainer
+    predictor.prediction_cache = PredictionCache(db)
+    predictor.indicator_states = IndicatorStateStore(db)
+    return predictor
+
+
+def test_aged_fixtures_replay_through_predictor():
+    """Fixtures that ended months ago still serve history and predictions in replay mode"""
+    frame = _frame(pd.Timestamp(datetime.now().date() - timedelta(days=330)), 160)
+    last_session = pd.Timestamp(frame.index[-1].date())
+    with tempfile.TemporaryDirectory() as fixture_dir, tempfile.TemporaryDirectory() as workdir:
+        FixtureStore(fixture_dir).save_history("RPLY", frame)
+        clients = build_market_data_clients("replay", fixture_dir, None, None, None)
+        saved = data_fetcher.market_yf, data_fetcher.market_http, data_fetcher.market_async_http
+        data_fetcher.market_yf, data_fetcher.market_http, data_fetcher.market_async_http = clients[:3]
+        data_fetcher.memory_tier.delete(("bars", "RPLY"))
+        data_fetcher.memory_tier.delete(("cache", "RPLY"))
+        try:
+            now = clients[3]
+            assert now().date() == (last_session + pd.Timedelta(days=1)).date()
+
+            predictor = _replay_predictor(workdir, now=now)
+            history = predictor.data_fetcher.get_historical_data("RPLY", days=30)
+            assert history["dates"][-1] == last_session.strftime("%Y-%m-%d")
+            assert 20 <= len(history["dates"]) <= 23
+
+            prediction = predictor.predict_next_day("RPLY")
+            assert prediction["current_price"] == frame["Close"].iloc[-1]
+            print(f"✓ Fixtures ending {last_session.date()} replayed through Predictor: {prediction['predicted_price']:.2f}")
+
+            # The real clock would look for bars after the recording ended
+            stale = _replay_predictor(os.path.join(workdir, "live"), now=datetime.now)
+            data_fetcher.memory_tier.delete(("bars", "RPLY"))
+            try:
+                stale.data_fetcher.get_historical_data("RPLY", days=30)
+                assert False, "a 30-day window from today has no recorded bars"
+            except ValueError:
+                pass
+        finally:
+            data_fetcher.market_yf, data_fetcher.market_http, data_fetcher.market_async_http = saved
+            data_fetcher.memory_tier.delete(("bars", "RPLY"))
+            data_fetcher.memory_tier.delete(("cache", "RPLY"))
+
+
+if __name__ == "__main__":
+    test_history_round_trip()
+    test_intraday_history_round_trip()
+    test_alphavantage_responses()
+    test_fault_injection_is_seeded()
+    test_aged_fixtures_replay_through_predictor()
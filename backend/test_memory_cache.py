@@ -0,0 +1,76 @@
+"""
+Test the in-process LRU + TTL memory tier
+"""
+import time
+
+import numpy as np
+
+from memory_cache import MemoryCache, estimate_size
+
+
+def test_hits_misses_and_max_age():
+    """Entries are served until the caller's max age or the entry TTL runs out"""
+    cache = MemoryCache(max_bytes=1_000_000)
+    cache.set("AAPL", {"price": 190.0}, stored_at=time.time() - 600)
+
+    assert cache.get("AAPL", max_age_seconds=900) == {"price": 190.0}
+    assert cache.get("AAPL", max_age_seconds=300) is None
+    assert cache.get("MSFT") is None
+
+    cache.set("TSLA", {"price": 250.0}, ttl_seconds=0.05)
+    time.sleep(0.1)
+    assert cache.get("TSLA") is None
+
+    stats = cache.stats()
+    # The entry too old for max_age_seconds=300 was not served, so it is a miss
+    assert stats["hits"] == 1 and stats["misses"] == 3, stats
+    assert stats["expirations"] == 1, stats
+    print(f"✓ Stats: {stats}")
+
+
+def test_lru_eviction_by_bytes():
+    """Least recently used entries go first once the byte budget is exceeded"""
+    entry_size = estimate_size(np.zeros(1000))
+    cache = MemoryCache(max_bytes=entry_size * 3)
+    for symbol in ["A", "B", "C"]:
+        cache.set(symbol, np.zeros(1000))
+    cache.get("A")  # A becomes most recent, B is now the oldest
+    cache.set("D", np.zeros(1000))
+
+    assert cache.get("B") is None
+    assert cache.get("A") is not None
+    assert cache.get("D") is not None
+    assert cache.current_bytes <= cache.max_bytes
+    assert cache.evictions == 1
+    print(f"✓ Evicted LRU entry, {cache.current_bytes} / {cache.max_bytes} bytes used")
+
+
+def test_too_old_entry_is_a_miss():
+    """Hits and misses follow what the caller got back, not just whether the key exists"""
+    cache = MemoryCache(max_bytes=1_000_000)
+    cache.set("AAPL", {"price": 190.0}, stored_at=time.time() - 600)
+
+    assert cache.get_entry("AAPL", max_age_seconds=60) is None
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 1
+    value, stored_at = cache.get_entry("AAPL", max_age_seconds=3600)
+    assert value == {"price": 190.0}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    print("✓ Entries older than the caller's max age count as misses and stay cached")
+
+
+def test_oversized_value_replaces_the_old_one():
+    """A value too large to cache still drops the key's previous value"""
+    cache = MemoryCache(max_bytes=estimate_size(np.zeros(1000)))
+    cache.set("AAPL", np.zeros(10))
+    cache.set("AAPL", np.zeros(10_000))
+
+    assert cache.get("AAPL") is None
+    assert cache.current_bytes == 0 and cache.stats()["entries"] == 0
+    print("✓ An oversized set removes the stale entry instead of leaving it to be served")
+
+
+if __name__ == "__main__":
+    test_hits_misses_and_max_age()
+    test_lru_eviction_by_bytes()
+    test_too_old_entry_is_a_miss()
+    test_oversized_value_replaces_the_old_one()
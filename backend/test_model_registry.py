@@ -0,0 +1,50 @@
+"""
+Test the resident model registry: hits without disk access, reloads after retraining, LRU bound
+"""
+import os
+import pickle
+import tempfile
+import time
+
+from model_registry import ModelRegistry
+
+
+def _write(registry, symbol, model, scaler="scaler"):
+    model_path, scaler_path = registry.paths(symbol)
+    for path, obj in ((model_path, model), (scaler_path, scaler)):
+        with open(path, "wb") as f:
+            pickle.dump(obj, f)
+
+
+def test_hits_reloads_and_eviction():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        registry = ModelRegistry(tmpdir, max_models=2, check_interval_seconds=0.05)
+        assert registry.get("AAPL") is None
+
+        _write(registry, "AAPL", "v1")
+        assert registry.get("AAPL") == ("v1", "scaler")
+        # Within the check interval the files are not even looked at
+        os.remove(registry.paths("AAPL")[1])
+        assert registry.get("AAPL") == ("v1", "scaler")
+        time.sleep(0.06)
+        assert registry.get("AAPL") is None
+        print("✓ Served from memory inside the check interval, dropped once the files vanished")
+
+        # Another worker retrains: new files are picked up on the next check
+        _write(registry, "AAPL", "v1")
+        registry.get("AAPL")
+        _write(registry, "AAPL", "v2-retrained")
+        time.sleep(0.06)
+        assert registry.get("AAPL")[0] == "v2-retrained"
+        assert registry.stats()["reloads"] == 1
+
+        for symbol in ("MSFT", "TSLA"):
+            _write(registry, symbol, symbol)
+            registry.get(symbol)
+        stats = registry.stats()
+        assert stats["models"] == 2 and stats["evictions"] == 1
+        print(f"✓ Reloaded after retraining; LRU bound kept {stats['models']} models")
+
+
+if __name__ == "__main__":
+    test_hits_reloads_and_eviction()
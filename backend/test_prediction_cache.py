@@ -0,0 +1,56 @@
+"""
+Test the versioned prediction cache: hits for the same bar and model, misses after a new bar or retrain
+"""
+import os
+import tempfile
+
+from cache_db import CacheDatabase
+from memory_cache import MemoryCache
+from prediction_cache import PredictionCache
+
+FORECAST = {"predicted_price": 101.5, "features": {"sma_5": 100.0, "sma_10": 99.0, "rsi_14": 55.0}}
+
+
+def test_key_changes_invalidate():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = PredictionCache(CacheDatabase(os.path.join(tmpdir, "cache.db")), MemoryCache(1024 * 1024))
+        assert cache.get("AAPL", "2026-10-16", 100.0, "v1") is None
+
+        cache.put("AAPL", "2026-10-16", 100.0, "v1", FORECAST)
+        assert cache.get("AAPL", "2026-10-16", 100.0, "v1") == FORECAST
+        print("✓ Same bar and model version: served from the cache")
+
+        assert cache.get("AAPL", "2026-10-19", 102.0, "v1") is None
+        assert cache.get("AAPL", "2026-10-16", 100.4, "v1") is None
+        print("✓ A new bar, or the forming bar moving, is a miss")
+
+        assert cache.get("AAPL", "2026-10-16", 100.0, "v2") is None
+        print("✓ A retrained model is a miss")
+
+        cache.invalidate("AAPL")
+        assert cache.get("AAPL", "2026-10-16", 100.0, "v1") is None
+        assert cache.stats() == {"hits": 1, "misses": 5}
+
+
+def test_shared_through_sqlite():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "cache.db")
+        worker_a = PredictionCache(CacheDatabase(path), MemoryCache(1024 * 1024))
+        worker_b = PredictionCache(CacheDatabase(path), MemoryCache(1024 * 1024))
+
+        worker_a.put("TCS.NS", "2026-10-16", 3500.0, "v1", FORECAST)
+        assert worker_b.get("TCS.NS", "2026-10-16", 3500.0, "v1") == FORECAST
+
+        # worker_b's memory still holds v1 when worker_a stores the forecast of a retrained model
+        worker_a.put("TCS.NS", "2026-10-16", 3500.0, "v2", dict(FORECAST, predicted_price=3600.0))
+        assert worker_b.get("TCS.NS", "2026-10-16", 3500.0, "v2")["predicted_price"] == 3600.0
+        print("✓ Forecasts computed by one worker are reused by another")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("PREDICTION CACHE TESTS")
+    print("=" * 60)
+    test_key_changes_invalidate()
+    test_shared_through_sqlite()
+    print("\nAll prediction cache tests passed!")
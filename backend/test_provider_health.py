@@ -0,0 +1,131 @@
+"""
+Test provider rate limiting, circuit breaking and adaptive ordering
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_db import CacheDatabase
+from provider_health import CircuitBreaker, ProviderHealth, ProviderRouter, TokenBucket
+
+
+def test_token_bucket_limits_bursts():
+    """A provider only gets `capacity` calls at once, then one per refill interval"""
+    health = ProviderHealth("alphavantage", buckets=[TokenBucket(rate=20, capacity=2)])
+    assert health.acquire() and health.acquire()
+    assert not health.acquire()
+    time.sleep(0.06)
+    assert health.acquire()
+    assert health.rate_limited == 1
+    print(f"✓ Rate limited after burst: {health.snapshot()}")
+
+
+def test_breaker_opens_and_recovers():
+    """Consecutive failures open the breaker; one trial call after the timeout closes it"""
+    health = ProviderHealth("alphavantage", failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        assert health.acquire()
+        health.record("quote", False, 0.1)
+    assert health.breaker.state == CircuitBreaker.OPEN
+    assert not health.acquire()
+
+    time.sleep(0.06)
+    assert health.acquire()  # half-open trial
+    assert not health.acquire()  # only one trial at a time
+    health.record("quote", True, 0.1)
+    assert health.breaker.state == CircuitBreaker.CLOSED
+    assert health.acquire()
+    print(f"✓ Breaker recovered: {health.snapshot()}")
+
+
+def test_router_prefers_healthy_provider():
+    """Default order holds until a provider starts failing or gets slow"""
+    router = ProviderRouter([
+        ProviderHealth("alphavantage", failure_threshold=3),
+        ProviderHealth("yfinance")
+    ])
+    assert router.order(["alphavantage", "yfinance"], "quote") == ["alphavantage", "yfinance"]
+
+    router["alphavantage"].record("quote", False, 0.3)
+    router["yfinance"].record("quote", True, 0.2)
+    assert router.order(["alphavantage", "yfinance"], "quote") == ["yfinance", "alphavantage"]
+
+    for _ in range(2):
+        router["alphavantage"].record("quote", False, 0.3)
+    assert router["alphavantage"].breaker.state == CircuitBreaker.OPEN
+    assert router.order(["alphavantage", "yfinance"], "quote")[0] == "yfinance"
+    print(f"✓ Order adapted: {router.snapshot()}")
+
+
+def test_unsampled_provider_keeps_default_order():
+    """One success of the default provider must not promote a provider that was never tried"""
+    router = ProviderRouter([ProviderHealth("alphavantage"), ProviderHealth("yfinance")])
+    for _ in range(5):
+        router["yfinance"].record("history", True, 0.8)
+    assert router.order(["yfinance", "alphavantage"], "history") == ["yfinance", "alphavantage"]
+    assert router.order(["alphavantage", "yfinance"], "quote") == ["alphavantage", "yfinance"]
+    print("✓ Unsampled providers stay in their default position")
+
+    # Fast quotes say nothing about history downloads
+    router["alphavantage"].record("quote", True, 0.05)
+    router["yfinance"].record("quote", True, 0.5)
+    assert router.order(["yfinance", "alphavantage"], "history") == ["yfinance", "alphavantage"]
+    assert router.order(["yfinance", "alphavantage"], "quote") == ["alphavantage", "yfinance"]
+    assert router.snapshot()["yfinance"]["kinds"]["history"]["samples"] == 5
+    print("✓ Quote and history latency are ranked separately")
+
+
+def test_workers_share_one_quota():
+    """Workers on one cache.db spend from a single per-day allowance, not one each"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "cache.db")
+        # One ProviderHealth per worker process, each with its own connection
+        workers = [
+            ProviderHealth("alphavantage", buckets=[TokenBucket(25 / 86400, 25)], db=CacheDatabase(path))
+            for _ in range(4)
+        ]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            granted = list(pool.map(lambda i: workers[i % 4].acquire(), range(40)))
+        assert sum(granted) == 25
+        assert sum(worker.rate_limited for worker in workers) == 15
+
+        # A worker started later sees the spent quota too
+        late = ProviderHealth("alphavantage", buckets=[TokenBucket(25 / 86400, 25)], db=CacheDatabase(path))
+        assert not late.acquire()
+        print(f"✓ 4 workers got {sum(granted)} of 40 calls from a 25/day key")
+
+
+def test_demoted_provider_is_probed():
+    """A provider ranked last gets one call per probe interval so it can win its place back"""
+    router = ProviderRouter([ProviderHealth("alphavantage"), ProviderHealth("yfinance")], probe_interval=0.05)
+    router["alphavantage"].record("quote", True, 2.0)
+    router["yfinance"].record("quote", True, 0.2)
+    assert router.order(["alphavantage", "yfinance"], "quote") == ["yfinance", "alphavantage"]
+
+    time.sleep(0.06)
+    assert router.order(["alphavantage", "yfinance"], "quote") == ["alphavantage", "yfinance"]
+    # One probe per interval, not every caller until it answers
+    assert router.order(["alphavantage", "yfinance"], "quote") == ["yfinance", "alphavantage"]
+
+    # The probe shows it recovered
+    for _ in range(20):
+        router["alphavantage"].record("quote", True, 0.05)
+    router["yfinance"].record("quote", True, 0.2)  # Recently called, so not due for a probe itself
+    assert router.order(["alphavantage", "yfinance"], "quote") == ["alphavantage", "yfinance"]
+
+    # Providers with an open breaker are left to the breaker's own trial calls
+    for _ in range(3):
+        router["alphavantage"].record("quote", False, 0.05)
+    time.sleep(0.06)
+    assert router.order(["alphavantage", "yfinance"], "quote") == ["yfinance", "alphavantage"]
+    print("✓ Demoted provider probed once per interval and promoted again after recovering")
+
+
+if __name__ == "__main__":
+    test_token_bucket_limits_bursts()
+    test_breaker_opens_and_recovers()
+    test_router_prefers_healthy_provider()
+    test_unsampled_provider_keeps_default_order()
+    test_workers_share_one_quota()
+    test_demoted_provider_is_probed()
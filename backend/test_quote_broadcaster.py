@@ -0,0 +1,70 @@
+"""
+Test live quote fan-out: shared pollers, late joiners and latest-wins coalescing
+"""
+import asyncio
+
+from quote_broadcaster import QuoteBroadcaster, QuoteSubscriber
+
+
+def test_one_poller_per_symbol():
+    """Many subscribers share one fetch per interval; the poller stops with the last one"""
+    async def scenario():
+        prices = {"AAPL": 100.0}
+        calls = []
+
+        async def fetch(symbol):
+            calls.append(symbol)
+            prices[symbol] += 1
+            return {"symbol": symbol, "price": prices[symbol]}
+
+        broadcaster = QuoteBroadcaster(fetch, interval_seconds=0.01)
+        subscribers = [QuoteSubscriber() for _ in range(20)]
+        for subscriber in subscribers:
+            broadcaster.subscribe(subscriber, "AAPL")
+        await asyncio.sleep(0.05)
+
+        batches = [await subscriber.next_batch() for subscriber in subscribers]
+        assert all(batch[-1]["data"]["price"] == batches[0][-1]["data"]["price"] for batch in batches)
+        # Nobody read while several polls ran: each outbox still holds a single, latest quote
+        assert all(len(batch) == 1 for batch in batches)
+        assert len(calls) < 10 and broadcaster.stats()["symbols"] == 1
+
+        late = QuoteSubscriber()
+        broadcaster.subscribe(late, "AAPL")
+        assert (await late.next_batch())[0]["type"] == "quote"
+
+        for subscriber in subscribers + [late]:
+            broadcaster.remove(subscriber)
+        await asyncio.sleep(0)
+        stats = broadcaster.stats()
+        assert stats["symbols"] == 0 and stats["subscriptions"] == 0
+        await broadcaster.close()
+        return len(calls), subscribers[0].coalesced
+
+    fetches, coalesced = asyncio.run(scenario())
+    print(f"✓ 20 subscribers served by {fetches} fetches, {coalesced} stale quotes coalesced per slow client")
+
+
+def test_errors_and_limits():
+    """Fetch failures are pushed once; subscriptions are capped per client"""
+    async def scenario():
+        async def fetch(symbol):
+            raise ValueError(f"Unable to fetch quote for {symbol}")
+
+        broadcaster = QuoteBroadcaster(fetch, interval_seconds=0.01, max_symbols_per_client=2)
+        subscriber = QuoteSubscriber()
+        assert broadcaster.subscribe(subscriber, "BAD1") and broadcaster.subscribe(subscriber, "BAD2")
+        assert not broadcaster.subscribe(subscriber, "BAD3")
+        await asyncio.sleep(0.05)
+        batch = await subscriber.next_batch()
+        assert sorted(message["symbol"] for message in batch) == ["BAD1", "BAD2"]
+        assert all(message["type"] == "error" for message in batch) and subscriber.coalesced == 0
+        await broadcaster.close()
+
+    asyncio.run(scenario())
+    print("✓ Errors reported once per symbol, third subscription rejected")
+
+
+if __name__ == "__main__":
+    test_one_poller_per_symbol()
+    test_errors_and_limits()
@@ -0,0 +1,131 @@
+"""
+Test single-flight coalescing of concurrent upstream fetches
+"""
+import asyncio
+import threading
+import time
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    """Ten threads asking for the same key trigger one fetch"""
+    flights = SingleFlight()
+    calls = []
+    results = []
+    started = threading.Barrier(10)
+
+    def slow_fetch(symbol):
+        calls.append(symbol)
+        time.sleep(0.2)
+        return {"symbol": symbol, "price": 123.0}
+
+    def worker():
+        started.wait()
+        results.append(flights.do(("quote", "AAPL"), slow_fetch, "AAPL"))
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1, calls
+    assert len(results) == 10
+    assert all(r is results[0] for r in results)
+    assert flights.in_flight() == 0
+    print(f"✓ 10 callers, {len(calls)} upstream call, {flights.coalesced} coalesced")
+
+
+def test_errors_reach_every_waiter():
+    """A failed fetch raises in every coalesced caller, and the next call retries"""
+    flights = SingleFlight()
+    errors = []
+    started = threading.Barrier(4)
+
+    def failing_fetch():
+        time.sleep(0.1)
+        raise ValueError("Unable to fetch quote for XYZ")
+
+    def worker():
+        started.wait()
+        try:
+            flights.do("XYZ", failing_fetch)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(errors) == 4
+    assert flights.do("XYZ", lambda: "ok") == "ok"
+    print("✓ Error propagated to all waiters, key released afterwards")
+
+
+def test_nested_call_same_key_does_not_deadlock():
+    """The leading thread can re-enter its own key"""
+    flights = SingleFlight()
+    result = flights.do("AAPL", lambda: flights.do("AAPL", lambda: 42))
+    assert result == 42
+    print("✓ Re-entrant call completed")
+
+
+def test_coroutines_and_threads_share_calls():
+    """Async callers join a thread's fetch and threads join a coroutine's, results and errors alike"""
+    flights = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch(symbol):
+        calls.append(("thread", symbol))
+        release.wait(5)
+        return {"symbol": symbol, "price": 123.0}
+
+    async def async_fetch(symbol):
+        calls.append(("coroutine", symbol))
+        await asyncio.sleep(0.1)
+        if symbol == "XYZ":
+            raise ValueError(f"Unable to fetch quote for {symbol}")
+        return {"symbol": symbol, "price": 321.0}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("AAPL", slow_fetch, "AAPL")))
+    leader.start()
+    while not calls:
+        time.sleep(0.01)
+
+    async def join_thread():
+        joined = asyncio.ensure_future(flights.do_async("AAPL", async_fetch, "AAPL"))
+        await asyncio.sleep(0.05)
+        assert not joined.done()  # Waiting without blocking the loop
+        release.set()
+        return await joined
+
+    joined = asyncio.run(join_thread())
+    leader.join()
+    assert joined is results[0] and calls == [("thread", "AAPL")]
+    print("✓ A coroutine joins a thread's in-flight fetch")
+
+    async def join_coroutine(symbol):
+        leading = asyncio.ensure_future(flights.do_async(symbol, async_fetch, symbol))
+        await asyncio.sleep(0)
+        following = asyncio.to_thread(flights.do, symbol, slow_fetch, symbol)
+        return await asyncio.gather(leading, following, return_exceptions=True)
+
+    leading, following = asyncio.run(join_coroutine("MSFT"))
+    assert following is leading and leading["price"] == 321.0
+    errors = asyncio.run(join_coroutine("XYZ"))
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert calls[1:] == [("coroutine", "MSFT"), ("coroutine", "XYZ")]
+    assert flights.in_flight() == 0 and flights.executions == 3 and flights.coalesced == 3
+    print("✓ Threads join a coroutine's in-flight fetch, errors included")
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_one_execution()
+    test_errors_reach_every_waiter()
+    test_nested_call_same_key_does_not_deadlock()
+    test_coroutines_and_threads_share_calls()
@@ -2,12 +2,11 @@
 Top Stocks Recommender for Aggressive Trading
 Identifies high-volume, volatile stocks suitable for intraday trading
 """
-import yfinance as yf
-import pandas as pd
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
 import json
 import os
+from data_fetcher import DataFetcher
 
 class TopStocksRecommender:
     """Recommend top stocks for aggressive/intraday trading"""
@@ -34,6 +33,7 @@ class TopStocksRecommender:
     def __init__(self):
         self.cache_file = 'top_stocks_cache.json'
         self.cache_duration = 3600  # 1 hour cache
+        self.data_fetcher = DataFetcher()
     
     def get_top_aggressive_stocks(self, limit: int = 10, region: str = 'US') -> List[Dict]:
         """
@@ -55,9 +55,19 @@ class TopStocksRecommender:
         stocks_data = []
         watchlist = self.INTRADAY_WATCHLIST.get(region, self.INTRADAY_WATCHLIST['US'])
         
+        # One grouped download for the whole watchlist instead of a request per symbol
+        histories = self.data_fetcher.get_historical_batch(
+            watchlist, days=10, max_age_hours=self.cache_duration / 3600
+        )
+        
+        # Company names come from the long-lived metadata cache, filled in bulk
+        metadata = self.data_fetcher.get_company_metadata(list(histories))
+        
         for symbol in watchlist:
+            if symbol not in histories:
+                continue
             try:
-                stock_info = self._analyze_stock(symbol)
+                stock_info = self._analyze_stock(symbol, histories[symbol], metadata.get(symbol))
                 if stock_info:
                     stocks_data.append(stock_info)
             except Exception as e:
@@ -72,32 +82,43 @@ class TopStocksRecommender:
         
         return stocks_data[:limit]
     
-    def _analyze_stock(self, symbol: str) -> Dict:
+    def _analyze_stock(
+        self,
+        symbol: str,
+        history: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict:
         """Analyze a stock for intraday trading suitability"""
         try:
-            # Fetch data
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period='5d', interval='1d')
-            
-            if hist.empty or len(hist) < 3:
+            # Fetch data (last 5 sessions)
+            if history is None:
+                history = self.data_fetcher.get_historical_data(
+                    symbol, days=10, max_age_hours=self.cache_duration / 3600
+                )
+            close = history['close'][-5:]
+            high = history['high'][-5:]
+            low = history['low'][-5:]
+            volume = history['volume'][-5:]
+            
+            if len(close) < 3:
                 return None
             
             # Calculate metrics
-            current_price = hist['Close'].iloc[-1]
-            prev_close = hist['Close'].iloc[-2]
+            current_price = close[-1]
+            prev_close = close[-2]
             change_pct = ((current_price - prev_close) / prev_close) * 100
             
             # Volume analysis
-            avg_volume = hist['Volume'].mean()
-            today_volume = hist['Volume'].iloc[-1]
+            avg_volume = volume.mean()
+            today_volume = volume[-1]
             volume_surge = ((today_volume - avg_volume) / avg_volume) * 100 if avg_volume > 0 else 0
             
             # Volatility (average daily range)
-            hist['daily_range'] = ((hist['High'] - hist['Low']) / hist['Low']) * 100
-            avg_volatility = hist['daily_range'].mean()
+            daily_range = ((high - low) / low) * 100
+            avg_volatility = daily_range.mean()
             
             # Momentum (3-day change)
-            momentum = ((current_price - hist['Close'].iloc[0]) / hist['Close'].iloc[0]) * 100
+            momentum = ((current_price - close[0]) / close[0]) * 100
             
             # Trading score (weighted combination)
             trading_score = (
@@ -119,8 +140,9 @@ class TopStocksRecommender:
                 signal = 'SELL'
             
             # Get company info
-            info = stock.info
-            company_name = info.get('longName', info.get('shortName', symbol))
+            if metadata is None:
+                metadata = self.data_fetcher.get_company_metadata([symbol]).get(symbol, {})
+            company_name = metadata.get('name', symbol)
             
             return {
                 'symbol': symbol,
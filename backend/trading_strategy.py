@@ -62,6 +62,26 @@ class TradingStrategy:
                 symbol, current_price, predicted_price, budget, rsi, technical_signal
             )
     
+    def calculate_position_from_context(self, context, strategy_type: str, budget: float) -> Dict:
+        """
+        calculate_position fed from an AnalysisContext, reusing its quote, prediction and signal
+        
+        Args:
+            context: AnalysisContext of the symbol being analyzed
+            strategy_type: 'aggressive', 'balanced' or 'long_term' (also picks the signal thresholds)
+            budget: Available budget for this trade
+        """
+        prediction = context.prediction()
+        return self.calculate_position(
+            symbol=context.symbol,
+            strategy_type=strategy_type,
+            current_price=context.quote()['price'],
+            predicted_price=prediction['predicted_price'],
+            budget=budget,
+            rsi=prediction['features']['rsi_14'],
+            technical_signal=context.signal(strategy_type)['signal']
+        )
+    
     def _calculate_intraday_position(
         self,
         symbol: str,